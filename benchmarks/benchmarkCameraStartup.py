@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Time how long a fresh process takes to get the DECam camera geometry,
+the way each ``pipetask -j N`` worker does.
+
+Each measurement runs in a new Python process, so nothing is shared through
+in-process caches.  The camera is built from a copy of ``decam/camGeom``
+without its build-time persisted camera, and is read:
+
+* ``build``: by building it from ``camera.py`` and the amp info tables;
+* ``cacheCold``: with an empty ``OBS_DECAM_CAMERA_CACHE_DIR``, which builds
+  it and also writes it to the cache;
+* ``cacheWarm``: from a cache that an earlier process populated;
+* ``persisted``: from a camera persisted next to the definition, as done at
+  build time.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from lsst.utils import getPackageDir
+
+WORKER = """
+import sys, time
+start = time.perf_counter()
+from lsst.obs.decam import DarkEnergyCamera
+imported = time.perf_counter()
+camera = DarkEnergyCamera._getCameraFromPath(sys.argv[1])
+done = time.perf_counter()
+print(imported - start, done - imported)
+"""
+
+
+def runWorker(path, cacheDir=None):
+    """Return the import and camera-load times of a new process."""
+    env = dict(os.environ)
+    env.pop("OBS_DECAM_CAMERA_CACHE_DIR", None)
+    if cacheDir is not None:
+        env["OBS_DECAM_CAMERA_CACHE_DIR"] = cacheDir
+    output = subprocess.run([sys.executable, "-c", WORKER, path], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    importTime, loadTime = (float(value) for value in output.split()[-2:])
+    return importTime, loadTime
+
+
+def summarize(times):
+    loads = [load for _, load in times]
+    return {"import": statistics.median(t for t, _ in times), "load": statistics.median(loads),
+            "loadMin": min(loads), "loadMax": max(loads)}
+
+
+def benchmark(repeat=5):
+    """Time camera loading in new processes.
+
+    Parameters
+    ----------
+    repeat : `int`, optional
+        Number of processes to time for each case.
+
+    Returns
+    -------
+    results : `dict`
+        Median import and camera-load times of each case, in seconds.
+    """
+    source = os.path.join(getPackageDir("obs_decam"), "decam", "camGeom")
+    results = {}
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, "camGeom")
+        shutil.copytree(source, path, ignore=shutil.ignore_patterns("persistedCamera.*"))
+
+        results["build"] = summarize([runWorker(path) for _ in range(repeat)])
+
+        coldTimes = []
+        for i in range(repeat):
+            cacheDir = os.path.join(tempdir, f"cold{i}")
+            coldTimes.append(runWorker(path, cacheDir))
+        results["cacheCold"] = summarize(coldTimes)
+        results["cacheWarm"] = summarize([runWorker(path, os.path.join(tempdir, "cold0"))
+                                          for _ in range(repeat)])
+
+        subprocess.run([sys.executable, "-c",
+                        "import sys; from lsst.obs.decam.cameraCache import writePersistedCamera;"
+                        "writePersistedCamera(sys.argv[1])", path], check=True)
+        results["persisted"] = summarize([runWorker(path) for _ in range(repeat)])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DECam camera loading in new processes.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Processes per case.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    results = benchmark(repeat=cmd.repeat)
+    for row in results.values():
+        row["speedup"] = results["build"]["load"]/row["load"]
+    print(f"{'case':>10} {'import':>10} {'load':>10} {'min':>10} {'max':>10} {'speedup':>10}"
+          "   (ms, median; speedup of load over build)")
+    for case, row in results.items():
+        print(f"{case:>10} " + " ".join(f"{row[key]*1e3:10.1f}" for key in ("import", "load", "loadMin",
+                                                                            "loadMax"))
+              + f" {row['speedup']:10.2f}")
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
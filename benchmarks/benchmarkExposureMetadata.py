@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Compare translating the headers of every detector of a DECam raw in full
+with `lsst.obs.decam.exposureInfo.readExposureMetadata`, which translates
+the exposure-level properties once per file.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import astro_metadata_translator
+from astro_metadata_translator import DecamTranslator, ObservationInfo
+
+import lsst.afw.fits
+from lsst.obs.decam.exposureInfo import MAX_SCIENCE_CCDNUM, readExposureMetadata
+
+
+def timeCall(func, repeat):
+    """Return the median wall-clock time of ``repeat`` calls to ``func``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def readHeaders(filename):
+    """Read the merged header of every science detector with afw."""
+    headers = []
+    fitsData = lsst.afw.fits.Fits(filename, "r")
+    try:
+        for hdu in range(1, fitsData.countHdus()):
+            fitsData.setHdu(hdu)
+            header = fitsData.readMetadata()
+            if header.get("CCDNUM", MAX_SCIENCE_CCDNUM + 1) <= MAX_SCIENCE_CCDNUM:
+                headers.append(header)
+    finally:
+        fitsData.closeFile()
+    return headers
+
+
+def translateFull(filename, headers):
+    """Fix up and translate every header in full, as ingest used to."""
+    infos = []
+    for header in headers:
+        header = header.deepCopy()
+        astro_metadata_translator.fix_header(header)
+        infos.append(ObservationInfo(header, translator_class=DecamTranslator, pedantic=False,
+                                     filename=filename))
+    return infos
+
+
+def benchmark(filename, repeat=5):
+    """Time the two ways of getting the metadata of every detector.
+
+    Parameters
+    ----------
+    filename : `str`
+        DECam raw file.
+    repeat : `int`, optional
+        Number of times to repeat each measurement.
+
+    Returns
+    -------
+    results : `dict`
+        Median times, in seconds, of reading the headers, translating them
+        in full, and of `readExposureMetadata` (which also reads the
+        headers) followed by building each detector's ``ObservationInfo``.
+    """
+    headers = readHeaders(filename)
+    full = translateFull(filename, headers)
+    exposure = list(readExposureMetadata(filename))
+    if exposure != full:
+        raise RuntimeError("The two translations differ.")
+    results = {
+        "filename": filename,
+        "nDetectors": len(headers),
+        "read": timeCall(lambda: readHeaders(filename), repeat),
+        "translateFull": timeCall(lambda: translateFull(filename, headers), repeat),
+        "exposureMetadata": timeCall(lambda: list(readExposureMetadata(filename)), repeat),
+    }
+    results["full"] = results["read"] + results["translateFull"]
+    results["speedup"] = results["full"]/results["exposureMetadata"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-detector and per-exposure translation "
+                                                 "of the metadata of a DECam raw.")
+    parser.add_argument(dest="filename", help="DECam raw file.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Repeats per measurement.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    results = benchmark(cmd.filename, repeat=cmd.repeat)
+    print(f"{results['nDetectors']} science detectors in {results['filename']}")
+    print(f"read headers with afw:            {results['read']*1e3:9.1f} ms")
+    print(f"fix up and translate each header: {results['translateFull']*1e3:9.1f} ms")
+    print(f"readExposureMetadata:             {results['exposureMetadata']*1e3:9.1f} ms")
+    print(f"speedup over reading and translating each header: {results['speedup']:.1f}x")
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,200 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the fused DECam ISR fast path against the standard ISR on
+synthetic DECam CCDs.
+
+Each method is timed in a new process, in which the growth of the peak
+resident set size while running ISR, and the peak of the allocations seen
+by `tracemalloc` (which include numpy arrays, but not afw images), are also
+measured.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.geom
+import lsst.pipe.base as pipeBase
+from lsst.ip.isr import CrosstalkCalib, Defects, Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.fastIsr import DecamFastIsrConfig, DecamFastIsrTask
+from lsst.utils import getPackageDir
+
+
+def makeConfig(fastPath):
+    """Return the DECam ISR config.
+    """
+    config = DecamFastIsrConfig()
+    config.load(os.path.join(getPackageDir("obs_decam"), "config", "isr.py"))
+    config.doFastPath = fastPath
+    return config
+
+
+def makeInputs(detectorId=10, seed=11):
+    """Make a synthetic raw DECam CCD and its calibrations.
+
+    Returns
+    -------
+    inputs : `dict`
+        The ``ccdExposure``, ``bias``, ``flat``, ``linearizer``,
+        ``crosstalk``, ``defects`` and ``fringes`` arguments of
+        `DecamFastIsrTask.run`.
+    """
+    rng = np.random.Generator(np.random.MT19937(seed))
+    detector = DarkEnergyCamera().getCamera()[detectorId]
+    rawBox = lsst.geom.Box2I()
+    for amp in detector:
+        rawBox.include(amp.getRawBBox())
+    raw = lsst.afw.image.ExposureI(rawBox)
+    raw.setDetector(detector)
+    raw.setFilter(lsst.afw.image.FilterLabel(band="r", physical="r DECam SDSS c0002 6415.0 1480.0"))
+    array = raw.image.array
+    for amp in detector:
+        box = amp.getRawBBox()
+        rows = np.arange(box.getHeight())[:, np.newaxis]
+        level = 1500.0 + 20.0*rng.random() + 3.0*np.sin(rows/300.0)
+        array[box.getMinY():box.getMaxY() + 1, box.getMinX():box.getMaxX() + 1] = np.rint(
+            level + rng.normal(0.0, 1.5, size=(box.getHeight(), box.getWidth())))
+        dataBox = amp.getRawDataBBox()
+        data = array[dataBox.getMinY():dataBox.getMaxY() + 1, dataBox.getMinX():dataBox.getMaxX() + 1]
+        data += np.rint(rng.normal(3000.0, 60.0, size=data.shape)).astype(data.dtype)
+        stars = rng.integers(0, data.size, size=200)
+        data.flat[stars] += rng.integers(1000, 60000, size=stars.size).astype(data.dtype)
+
+    bbox = detector.getBBox()
+    bias = lsst.afw.image.ExposureF(bbox)
+    bias.image.array[:] = rng.normal(2.0, 0.5, size=bias.image.array.shape)
+    flat = lsst.afw.image.ExposureF(bbox)
+    y, x = np.indices(flat.image.array.shape)
+    flat.image.array[:] = 1.0 + 0.05*(x/x.max() - 0.5) - 0.03*(y/y.max() - 0.5)
+    flat.variance.array[:] = 1e-6
+
+    adu = np.arange(70000, dtype=np.float32)
+    table = np.stack([1e-6*adu**1.5, -2e-7*adu**1.6]).astype(np.float32)
+    linearizer = Linearizer(table=table)
+    for i, amp in enumerate(detector):
+        linearizer.ampNames.append(amp.getName())
+        linearizer.linearityType[amp.getName()] = "LookupTable"
+        linearizer.linearityCoeffs[amp.getName()] = np.array([i, 0])
+        linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+    linearizer.hasLinearity = True
+
+    crosstalk = CrosstalkCalib(detector=detector)
+    crosstalk.hasCrosstalk = True
+    crosstalk.nAmp = len(detector)
+    crosstalk.coeffs = np.array([[0.0, 3e-4], [-5e-4, 0.0]])
+    crosstalk.interChip = {}
+    defects = Defects()
+    defects.append(lsst.geom.Box2I(lsst.geom.Point2I(100, 200), lsst.geom.Extent2I(2, 400)))
+    return dict(ccdExposure=raw, bias=bias, flat=flat, linearizer=linearizer, crosstalk=crosstalk,
+                defects=defects, fringes=pipeBase.Struct(fringes=None))
+
+
+def runIsr(fastPath, inputs):
+    return DecamFastIsrTask(config=makeConfig(fastPath)).run(**inputs).exposure
+
+
+def worker(fastPath, repeat):
+    """Time ISR; run in a new process."""
+    inputs = makeInputs()
+    runIsr(fastPath, inputs)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        runIsr(fastPath, inputs)
+        times.append(time.perf_counter() - start)
+    return {"time": statistics.median(times), "times": times}
+
+
+def memoryWorker(fastPath):
+    """Measure the peak memory of ISR; run in a new process, as the peak
+    resident set size never goes down.
+    """
+    inputs = makeInputs()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    runIsr(fastPath, inputs)
+    _, tracedPeak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kB on Linux.
+    return {"peakRssGrowthMB": (after - before)/1024, "tracemallocPeakMB": tracedPeak/2**20}
+
+
+def runInProcess(args):
+    output = subprocess.run([sys.executable, __file__] + args, check=True, capture_output=True,
+                            text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def benchmark(repeat=3):
+    """Compare the fast path with the standard ISR.
+
+    Returns
+    -------
+    results : `dict`
+        For each method, the median time in seconds and the peak memory
+        growth; and the largest differences between the outputs.
+    """
+    results = {}
+    for name, flag in (("standard", "--standard"), ("fast", "--fast")):
+        results[name] = runInProcess(["--worker", flag, "-r", str(repeat)])
+        results[name].update(runInProcess(["--memory-worker", flag]))
+    results["speedup"] = results["standard"]["time"]/results["fast"]["time"]
+
+    inputs = makeInputs()
+    standard = runIsr(False, inputs)
+    fast = runIsr(True, inputs)
+    results["maxImageDifference"] = float(np.max(np.abs(fast.image.array - standard.image.array)))
+    results["maxVarianceRelativeDifference"] = float(np.max(np.abs(fast.variance.array/standard.variance.array
+                                                                   - 1.0)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Timed runs of each method.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--memory-worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--fast", dest="fastPath", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--standard", dest="fastPath", action="store_false", help=argparse.SUPPRESS)
+    cmd = parser.parse_args()
+
+    if cmd.worker:
+        print(json.dumps(worker(cmd.fastPath, cmd.repeat)))
+    elif cmd.memory_worker:
+        print(json.dumps(memoryWorker(cmd.fastPath)))
+    else:
+        results = benchmark(repeat=cmd.repeat)
+        print(json.dumps(results, indent=2))
+        if cmd.output:
+            with open(cmd.output, "w") as f:
+                json.dump(results, f, indent=2)
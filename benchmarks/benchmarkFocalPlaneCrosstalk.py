@@ -0,0 +1,155 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark focal-plane crosstalk correction against correcting one
+detector at a time.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.geom
+from lsst.ip.isr import CrosstalkCalib
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.focalPlaneCrosstalk import FocalPlaneCrosstalk
+from lsst.utils import getPackageDir
+
+
+def readCuratedCrosstalk(camera, detectorIds):
+    """Read the curated crosstalk calibrations of some detectors."""
+    calibs = {}
+    crosstalkDir = os.path.join(getPackageDir("obs_decam_data"), "decam", "crosstalk")
+    for detectorId in detectorIds:
+        name = camera[detectorId].getName().lower()
+        filenames = sorted(glob.glob(os.path.join(crosstalkDir, name, "*.yaml")))
+        if filenames:
+            calibs[detectorId] = CrosstalkCalib.readText(filenames[-1])
+    return calibs
+
+
+def makeExposures(camera, detectorIds, rng):
+    """Make untrimmed exposures of random raw-like pixels."""
+    exposures = {}
+    for detectorId in detectorIds:
+        detector = camera[detectorId]
+        bbox = lsst.geom.Box2I()
+        for amp in detector:
+            bbox.include(amp.getRawBBox())
+        exposure = lsst.afw.image.ExposureF(bbox)
+        exposure.image.array[:] = rng.normal(1000.0, 30.0, size=exposure.image.array.shape)
+        exposure.setDetector(detector)
+        exposures[detectorId] = exposure
+    return exposures
+
+
+def copyExposures(exposures):
+    return {detectorId: exposure.clone() for detectorId, exposure in exposures.items()}
+
+
+def correctPerDetector(camera, calibs, exposures, originals):
+    """Correct each detector with `lsst.ip.isr.CrosstalkCalib`, as ISR does
+    one detector per quantum: the intra-chip terms, then the inter-chip
+    terms from each source detector.
+    """
+    for detectorId, exposure in exposures.items():
+        calib = calibs.get(detectorId)
+        if calib is None or not calib.hasCrosstalk:
+            continue
+        calib.subtractCrosstalk(exposure, crosstalkCoeffs=calib.coeffs, minPixelToMask=np.inf)
+        for sourceName, coeffs in (calib.interChip or {}).items():
+            source = originals.get(camera[sourceName].getId()) if sourceName in camera else None
+            if source is not None:
+                calib.subtractCrosstalk(exposure, sourceExposure=source, crosstalkCoeffs=coeffs,
+                                        minPixelToMask=np.inf)
+
+
+def timeCall(func, repeat, setup):
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark(nDetectors=8, repeat=3, seed=5):
+    """Time correcting ``nDetectors`` detectors both ways.
+
+    Returns
+    -------
+    results : `dict`
+        Median times, in seconds, the number of crosstalk terms and the
+        largest difference between the corrected images.
+    """
+    camera = DarkEnergyCamera().getCamera()
+    detectorIds = sorted(detector.getId() for detector in camera)[:nDetectors]
+    rng = np.random.Generator(np.random.MT19937(seed))
+    originals = makeExposures(camera, detectorIds, rng)
+    calibs = readCuratedCrosstalk(camera, detectorIds)
+
+    start = time.perf_counter()
+    crosstalk = FocalPlaneCrosstalk.fromCrosstalkCalibs(camera, calibs)
+    buildTime = time.perf_counter() - start
+
+    def setupFocalPlane():
+        return ({detectorId: exposure.image for detectorId, exposure in copyExposures(originals).items()},)
+
+    def setupPerDetector():
+        return camera, calibs, copyExposures(originals), originals
+
+    results = {
+        "detectors": len(detectorIds),
+        "terms": len(crosstalk),
+        "build": buildTime,
+        "focalPlane": timeCall(crosstalk.apply, repeat, setupFocalPlane),
+        "perDetector": timeCall(correctPerDetector, repeat, setupPerDetector),
+    }
+
+    images = setupFocalPlane()[0]
+    crosstalk.apply(images)
+    exposures = copyExposures(originals)
+    correctPerDetector(camera, calibs, exposures, originals)
+    results["maxDifference"] = max(float(np.max(np.abs(images[detectorId].array
+                                                       - exposures[detectorId].image.array)))
+                                   for detectorId in detectorIds)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--detectors", type=int, default=8,
+                        help="Number of detectors to correct (each uses about 100 MB per copy).")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Timed runs of each method.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    results = benchmark(nDetectors=cmd.detectors, repeat=cmd.repeat)
+    print(json.dumps(results, indent=2))
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
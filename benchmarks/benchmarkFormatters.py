@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""Benchmark the DECam raw and Community Pipeline calibration formatters on
+synthesized DECam-like multi-extension FITS files.
+
+No test data are needed: files with the DECam HDU layout (in the usual and
+in a shuffled order, with and without tile compression) are written to a
+temporary directory, and the results are written as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+import astropy.io.fits
+import numpy as np
+
+import lsst.daf.butler
+import lsst.obs.decam
+from lsst.obs.decam.rawFormatter import detector_to_hdu
+
+
+def timeCall(func, repeat, setup=None):
+    """Return the median wall-clock time of ``repeat`` calls to ``func``,
+    calling ``setup`` (untimed) before each.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def makePrimaryHDU(expnum):
+    """Make a primary HDU with the cards needed to identify a DECam
+    exposure.
+    """
+    hdu = astropy.io.fits.PrimaryHDU()
+    header = hdu.header
+    header["INSTRUME"] = "DECam"
+    header["TELESCOP"] = "CTIO 4.0-m telescope"
+    header["OBSERVAT"] = "CTIO"
+    header["EXPNUM"] = expnum
+    header["OBSID"] = f"ct4m20150227t{expnum % 1000000:06d}"
+    header["DATE-OBS"] = "2015-02-27T01:27:18.000000"
+    header["MJD-OBS"] = 57080.06062500
+    header["OBSTYPE"] = "object"
+    header["EXPTIME"] = 30.0
+    header["FILTER"] = "g DECam SDSS c0001 4720.0 1520.0"
+    return hdu
+
+
+def writeFile(filename, detectors, shape, dtype, compressed, rng, expnum=412000):
+    """Write a DECam-like multi-extension FITS file.
+
+    Parameters
+    ----------
+    filename : `str`
+        The file to write.
+    detectors : `list` [`int`]
+        The detector (``CCDNUM``) in each HDU, in file order.
+    shape : `tuple` [`int`, `int`]
+        Shape of each image.
+    dtype : `type`
+        Pixel type.
+    compressed : `bool`
+        Tile-compress the images?
+    rng : `numpy.random.Generator`
+        Source of the pixel values.
+    expnum : `int`, optional
+        Exposure number to put in the primary header.
+    """
+    hdus = [makePrimaryHDU(expnum)]
+    for detector in detectors:
+        if np.dtype(dtype).kind == "f":
+            data = rng.normal(1.0, 0.01, size=shape).astype(dtype)
+        else:
+            data = rng.normal(2000, 5, size=shape).astype(dtype)
+        if compressed:
+            hdu = astropy.io.fits.CompImageHDU(data, compression_type="RICE_1")
+        else:
+            hdu = astropy.io.fits.ImageHDU(data)
+        hdu.header["CCDNUM"] = detector
+        hdu.header["DETPOS"] = f"S{detector}"
+        hdus.append(hdu)
+    astropy.io.fits.HDUList(hdus).writeto(filename, overwrite=True)
+
+
+def makeRef(detector, datasetType):
+    """Make a dataset reference for one detector."""
+    dataId = lsst.daf.butler.DataCoordinate.standardize(
+        instrument="DECam", detector=detector, universe=datasetType.dimensions.universe
+    )
+    return lsst.daf.butler.DatasetRef(datasetType, dataId, "benchmark")
+
+
+class FormatterBenchmark:
+    """Time reads of one file through a formatter.
+
+    Parameters
+    ----------
+    filename : `str`
+        The file to read.
+    formatterClass : `type`
+        The formatter to read it with.
+    detectors : `list` [`int`]
+        The detectors in the file.
+    repeat : `int`
+        Number of times to repeat each measurement.
+    """
+
+    def __init__(self, filename, formatterClass, detectors, repeat):
+        self.filename = filename
+        self.formatterClass = formatterClass
+        self.detectors = detectors
+        self.repeat = repeat
+        self._touches = 0
+
+        universe = lsst.daf.butler.DimensionUniverse()
+        self.storageClass = lsst.daf.butler.StorageClassFactory().getStorageClass("ExposureI")
+        self.datasetType = lsst.daf.butler.DatasetType("raw", ("instrument", "detector"), self.storageClass,
+                                                       universe=universe)
+        directory, name = os.path.split(filename)
+        self.location = lsst.daf.butler.Location(directory, name)
+
+    def makeFormatter(self, detector):
+        descriptor = lsst.daf.butler.FileDescriptor(self.location, self.storageClass)
+        return self.formatterClass(descriptor, ref=makeRef(detector, self.datasetType))
+
+    def touch(self):
+        """Change the modification time of the file, which invalidates every
+        per-file cache (HDU index, seek table, header fix-ups).
+        """
+        self._touches += 1
+        stat = os.stat(self.filename)
+        mtime = stat.st_mtime_ns + self._touches*1000
+        os.utime(self.filename, ns=(stat.st_atime_ns, mtime))
+
+    def read(self, detector, component):
+        return self.makeFormatter(detector).read(component=component)
+
+    def run(self, sampleDetectors, focalPlane=True):
+        """Run all the measurements.
+
+        Parameters
+        ----------
+        sampleDetectors : `list` [`int`]
+            Detectors to time single-detector reads of.
+        focalPlane : `bool`, optional
+            Also time reading every detector in the file?
+
+        Returns
+        -------
+        results : `dict`
+            Median times, in seconds.
+        """
+        results = {"metadataCold": {}, "metadataWarm": {}, "image": {}}
+        for detector in sampleDetectors:
+            # Cold: nothing is known about the file, so a detector that is not
+            # at its usual HDU has to be found by scanning.
+            results["metadataCold"][detector] = timeCall(lambda: self.read(detector, "metadata"),
+                                                         self.repeat, setup=self.touch)
+            self.read(detector, "metadata")
+            results["metadataWarm"][detector] = timeCall(lambda: self.read(detector, "metadata"),
+                                                         self.repeat)
+            results["image"][detector] = timeCall(lambda: self.read(detector, "image"), self.repeat)
+
+        if focalPlane:
+            def readAll():
+                for detector in self.detectors:
+                    self.read(detector, "metadata")
+                    self.read(detector, "image")
+            results["focalPlane"] = timeCall(readAll, self.repeat, setup=self.touch)
+
+            if self.formatterClass is lsst.obs.decam.DarkEnergyCameraRawFormatter:
+                def readAllSinglePass():
+                    reader = lsst.obs.decam.DarkEnergyCameraRawReader(self.filename)
+                    for _ in reader.readDetectors():
+                        pass
+                results["focalPlaneSinglePass"] = timeCall(readAllSinglePass, self.repeat, setup=self.touch)
+        return results
+
+
+def benchmark(directory, shape=(1046, 540), nDetectors=62, repeat=3, focalPlane=True, seed=42):
+    """Write the synthetic files and time reading them.
+
+    Parameters
+    ----------
+    directory : `str`
+        Directory to write the synthetic files to.
+    shape : `tuple` [`int`, `int`], optional
+        Shape of each detector image.
+    nDetectors : `int`, optional
+        Number of science detectors in each file.
+    repeat : `int`, optional
+        Number of times to repeat each measurement.
+    focalPlane : `bool`, optional
+        Also time reading every detector in each file?
+    seed : `int`, optional
+        Seed for the pixel values and the shuffled HDU order.
+
+    Returns
+    -------
+    results : `dict`
+        The configuration and results of the benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    usual = sorted((d for d in detector_to_hdu if d <= nDetectors), key=detector_to_hdu.get)
+    shuffled = list(usual)
+    random.Random(seed).shuffle(shuffled)
+    # The first, a middle and the last detector, in the usual order.
+    sample = [usual[0], usual[len(usual)//2], usual[-1]]
+
+    results = {
+        "config": {"shape": list(shape), "nDetectors": len(usual), "repeat": repeat, "seed": seed,
+                   "python": platform.python_version(), "machine": platform.machine(),
+                   "environment": {k: v for k, v in os.environ.items() if k.startswith("OBS_DECAM_")}},
+        "raw": {},
+        "calib": {},
+    }
+    for order, detectors in (("usual", usual), ("shuffled", shuffled)):
+        for compressed in (True, False):
+            name = f"raw-{order}-{'fz' if compressed else 'uncompressed'}"
+            filename = os.path.join(directory, f"{name}.fits" + (".fz" if compressed else ""))
+            writeFile(filename, detectors, shape, np.int32, compressed, rng)
+            bench = FormatterBenchmark(filename, lsst.obs.decam.DarkEnergyCameraRawFormatter, detectors,
+                                       repeat)
+            results["raw"][name] = bench.run(sample, focalPlane=focalPlane)
+
+    # Community Pipeline calibrations have detector=HDU.
+    calibDetectors = list(range(1, nDetectors + 1))
+    for compressed in (True, False):
+        name = f"flat-{'fz' if compressed else 'uncompressed'}"
+        filename = os.path.join(directory, f"{name}.fits" + (".fz" if compressed else ""))
+        writeFile(filename, calibDetectors, shape, np.float32, compressed, rng)
+        bench = FormatterBenchmark(filename, lsst.obs.decam.DarkEnergyCameraCPCalibFormatter,
+                                   calibDetectors, repeat)
+        results["calib"][name] = bench.run([1, nDetectors//2, nDetectors], focalPlane=focalPlane)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the DECam formatters on synthetic files.")
+    parser.add_argument("-o", "--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("-d", "--directory",
+                        help="Directory for the synthetic files (default: a temporary directory).")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Repeats per measurement.")
+    parser.add_argument("-n", "--ndetectors", type=int, default=62, help="Number of detectors per file.")
+    parser.add_argument("--shape", type=int, nargs=2, default=(1046, 540), metavar=("NY", "NX"),
+                        help="Shape of each detector image; a real DECam raw is 4146 2160.")
+    parser.add_argument("--no-focal-plane", action="store_true",
+                        help="Do not time reading every detector of each file.")
+    cmd = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        results = benchmark(cmd.directory or tempdir, shape=tuple(cmd.shape), nDetectors=cmd.ndetectors,
+                            repeat=cmd.repeat, focalPlane=not cmd.no_focal_plane)
+
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Compare reading DECam raw HDUs through afw with reading them through a
+byte-offset seek table.
+"""
+import argparse
+import statistics
+import time
+
+import lsst.afw.fits
+import lsst.afw.image
+from lsst.obs.decam.seekTable import FitsSeekTable
+
+
+def timeCall(func, repeat):
+    """Return the median wall-clock time of ``repeat`` calls to ``func``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark(filename, repeat=5, images=False):
+    """Time per-HDU header (and optionally image) reads.
+
+    Parameters
+    ----------
+    filename : `str`
+        DECam raw file to read.
+    repeat : `int`, optional
+        Number of times to repeat each measurement.
+    images : `bool`, optional
+        Also time image reads?
+
+    Returns
+    -------
+    results : `dict`
+        Build time of the seek table and of an afw scan of all headers, and
+        per-HDU read times for both paths.
+    """
+    def afwScan():
+        fitsData = lsst.afw.fits.Fits(filename, "r")
+        for i in range(1, fitsData.countHdus()):
+            fitsData.setHdu(i)
+            fitsData.readMetadata()
+        fitsData.closeFile()
+
+    table = FitsSeekTable.fromFile(filename)
+    results = {
+        "filename": filename,
+        "nHdus": len(table),
+        "afwScan": timeCall(afwScan, repeat),
+        "seekTableBuild": timeCall(lambda: FitsSeekTable.fromFile(filename), repeat),
+        "hdus": [],
+    }
+    for hdu in range(1, len(table)):
+        row = {
+            "hdu": hdu,
+            "afwMetadata": timeCall(lambda: lsst.afw.fits.readMetadata(filename, hdu), repeat),
+            "seekMetadata": timeCall(lambda: table.readMetadata(hdu), repeat),
+        }
+        if images:
+            row["afwImage"] = timeCall(lambda: lsst.afw.image.ImageI(filename, hdu), repeat)
+            row["seekImage"] = timeCall(lambda: table.readImage(hdu), repeat)
+        results["hdus"].append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark afw and seek-table reads of DECam raw HDUs.")
+    parser.add_argument(dest="filename", help="DECam raw file.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Repeats per measurement.")
+    parser.add_argument("-i", "--images", action="store_true", help="Also time image reads.")
+    cmd = parser.parse_args()
+
+    results = benchmark(cmd.filename, repeat=cmd.repeat, images=cmd.images)
+    print(f"{results['nHdus']} HDUs in {results['filename']}")
+    print(f"scan all headers with afw: {results['afwScan']*1e3:8.2f} ms")
+    print(f"build seek table:          {results['seekTableBuild']*1e3:8.2f} ms")
+    columns = [key for key in results["hdus"][0] if key != "hdu"]
+    print("HDU " + " ".join(f"{column:>14}" for column in columns) + "   (ms)")
+    for row in results["hdus"]:
+        print(f"{row['hdu']:3d} " + " ".join(f"{row[column]*1e3:14.3f}" for column in columns))
@@ -0,0 +1,105 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the whole-CCD lookup-table linearization against
+`lsst.ip.isr.Linearizer.applyLinearity` on a synthetic DECam CCD.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+import lsst.afw.image
+from lsst.ip.isr import Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.linearize import LookupTableLinearizer
+
+
+def makeInputs(detectorId=10, seed=13):
+    """Make a DECam-like lookup-table linearizer and an image of a CCD."""
+    rng = np.random.Generator(np.random.MT19937(seed))
+    detector = DarkEnergyCamera().getCamera()[detectorId]
+    adu = np.arange(70000, dtype=np.float32)
+    linearizer = Linearizer(table=np.stack([1e-6*adu**1.5, -2e-7*adu**1.6]).astype(np.float32))
+    for i, amp in enumerate(detector):
+        linearizer.ampNames.append(amp.getName())
+        linearizer.linearityType[amp.getName()] = "LookupTable"
+        linearizer.linearityCoeffs[amp.getName()] = np.array([i, 0])
+        linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+    linearizer.hasLinearity = True
+    image = lsst.afw.image.ImageF(detector.getBBox())
+    image.array[:] = rng.normal(3000.0, 60.0, size=image.array.shape)
+    stars = rng.integers(0, image.array.size, size=2000)
+    image.array.flat[stars] += rng.uniform(1000.0, 70000.0, size=stars.size).astype(np.float32)
+    return detector, linearizer, image
+
+
+def timeCall(func, image, repeat):
+    times = []
+    for _ in range(repeat):
+        copy = image.clone()
+        start = time.perf_counter()
+        func(copy)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), copy
+
+
+def benchmark(threads=(1, 2, 4), repeat=5):
+    """Time linearizing a CCD both ways.
+
+    Returns
+    -------
+    results : `dict`
+        Median times, in seconds, of the generic linearization and of the
+        whole-CCD linearization with each number of threads, and the largest
+        difference between their outputs.
+    """
+    detector, linearizer, image = makeInputs()
+    results = {}
+    results["generic"], expected = timeCall(lambda im: linearizer.applyLinearity(im, detector=detector),
+                                            image, repeat)
+    start = time.perf_counter()
+    lookupTable = LookupTableLinearizer(linearizer, detector)
+    results["setup"] = time.perf_counter() - start
+    maxDifference = 0.0
+    for nThreads in threads:
+        results[f"threads{nThreads}"], output = timeCall(lambda im: lookupTable.apply(im, nThreads=nThreads),
+                                                         image, repeat)
+        maxDifference = max(maxDifference, float(np.max(np.abs(output.array - expected.array))))
+    results["maxDifference"] = maxDifference
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-t", "--threads", type=int, nargs="+", default=[1, 2, 4],
+                        help="Numbers of threads to time the whole-CCD linearization with.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Timed runs of each method.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    results = benchmark(threads=cmd.threads, repeat=cmd.repeat)
+    print(json.dumps(results, indent=2))
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
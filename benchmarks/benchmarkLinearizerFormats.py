@@ -0,0 +1,134 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the size and load time of YAML and binary curated linearizers.
+
+By default, linearizers like those made by
+``curated_calib_origin/makeLinearizer.py`` are synthesized; with
+``--yaml-dir``, the YAML linearizers found there are converted instead.
+Load times are with the files in the page cache.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from lsst.ip.isr import Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.binaryLinearizer import readBinaryLinearizer, writeBinaryLinearizer
+
+
+def makeLinearizers(directory, tableLength=65536, seed=2):
+    """Write a synthetic YAML linearizer for each detector."""
+    rng = np.random.Generator(np.random.MT19937(seed))
+    filenames = []
+    for detector in DarkEnergyCamera().getCamera():
+        adu = np.arange(tableLength)
+        table = np.stack([rng.normal(1e-3, 1e-4)*adu*(adu/tableLength)**2 for _ in range(2)])
+        linearizer = Linearizer(table=table.astype(np.float32))
+        for i, amp in enumerate(detector):
+            linearizer.ampNames.append(amp.getName())
+            linearizer.linearityType[amp.getName()] = "LookupTable"
+            linearizer.linearityCoeffs[amp.getName()] = np.array([i, 0])
+            linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+            linearizer.fitParams[amp.getName()] = np.array([])
+            linearizer.fitParamsErr[amp.getName()] = np.array([])
+            linearizer.fitChiSq[amp.getName()] = np.nan
+            linearizer.fitResiduals[amp.getName()] = np.array([])
+            linearizer.linearFit[amp.getName()] = np.array([])
+        linearizer.updateMetadata(detector=detector, CALIBDATE="1970-01-01T00:00:00", setCalibId=True)
+        linearizer.hasLinearity = True
+        filename = os.path.join(directory, f"{detector.getName().lower()}.yaml")
+        linearizer.writeText(filename)
+        filenames.append(filename)
+    return filenames
+
+
+def timeLoads(load, filenames, repeat):
+    """Return the median time to load all the files, including touching
+    every table entry.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for filename in filenames:
+            float(np.sum(load(filename).tableData))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def benchmark(yamlFiles, directory, repeat=3):
+    """Convert YAML linearizers to binary and compare the two forms.
+
+    Returns
+    -------
+    results : `dict`
+        Total sizes in bytes and median load times in seconds of all the
+        linearizers, in each form.
+    """
+    binaryFiles = []
+    for i, filename in enumerate(yamlFiles):
+        # Curated linearizers are named by date, in one directory per
+        # detector, so the names are not unique.
+        binaryFile = os.path.join(directory, f"{i:03d}.npy")
+        writeBinaryLinearizer(Linearizer.readText(filename), binaryFile)
+        binaryFiles.append(binaryFile)
+
+    for yamlFile, binaryFile in zip(yamlFiles, binaryFiles):
+        if not np.array_equal(Linearizer.readText(yamlFile).tableData,
+                              readBinaryLinearizer(binaryFile).tableData):
+            raise RuntimeError(f"Binary form of {yamlFile} differs.")
+
+    return {
+        "files": len(yamlFiles),
+        "yamlBytes": sum(os.path.getsize(f) for f in yamlFiles),
+        "binaryBytes": sum(os.path.getsize(f) + os.path.getsize(f.replace(".npy", ".json"))
+                           for f in binaryFiles),
+        "yamlLoad": timeLoads(Linearizer.readText, yamlFiles, repeat),
+        "binaryLoad": timeLoads(readBinaryLinearizer, binaryFiles, repeat),
+        "binaryLoadNoMmap": timeLoads(lambda f: readBinaryLinearizer(f, mmap=False), binaryFiles, repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--yaml-dir", help="Directory tree of YAML linearizers to convert.")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Timed loads of each form.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        if cmd.yaml_dir:
+            yamlFiles = sorted(glob.glob(os.path.join(cmd.yaml_dir, "**", "*.yaml"), recursive=True))
+        else:
+            yamlFiles = makeLinearizers(tempdir)
+        outputDir = os.path.join(tempdir, "binary")
+        os.makedirs(outputDir)
+        results = benchmark(yamlFiles, outputDir, repeat=cmd.repeat)
+    print(json.dumps(results, indent=2))
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
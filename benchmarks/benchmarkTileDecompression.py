@@ -0,0 +1,105 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the multi-threaded decompression of fpack-compressed raws
+against afw on each number of threads.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import astropy.io.fits
+import numpy as np
+
+import lsst.afw.image
+from lsst.obs.decam.tileDecompression import TileDecompressor
+
+
+def writeRaw(filename, nHdus=8, shape=(4146, 2160), seed=17):
+    """Write a raw-like file of ``RICE_1``-compressed HDUs, one row per
+    tile, as fpack writes DECam raws.
+    """
+    rng = np.random.Generator(np.random.MT19937(seed))
+    hdus = [astropy.io.fits.PrimaryHDU()]
+    for _ in range(nHdus):
+        data = rng.normal(3000.0, 50.0, size=shape).astype(np.uint16)
+        data[::97, ::13] = 65535
+        hdus.append(astropy.io.fits.CompImageHDU(data, compression_type="RICE_1", tile_shape=(1, shape[1])))
+    astropy.io.fits.HDUList(hdus).writeto(filename, overwrite=True)
+
+
+def timeCall(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), output
+
+
+def benchmark(filename=None, threads=(1, 2, 4), repeat=5):
+    """Time reading every image HDU of a raw both ways.
+
+    Returns
+    -------
+    results : `dict`
+        Median times, in seconds, of reading the images with afw and with
+        `TileDecompressor` on each number of threads, whether the images
+        were the same, and the number of CPUs the process may run on.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if filename is None:
+            filename = os.path.join(tmpdir, "raw.fits.fz")
+            writeRaw(filename)
+        with astropy.io.fits.open(filename) as hduList:
+            hdus = [i for i, hdu in enumerate(hduList) if i > 0 and hdu.is_image]
+        results = {"cpus": len(os.sched_getaffinity(0)), "hdus": len(hdus)}
+        results["afw"], expected = timeCall(
+            lambda: [lsst.afw.image.ImageI(filename, hdu) for hdu in hdus], repeat)
+        identical = True
+        for nThreads in threads:
+            decompressor = TileDecompressor(nThreads)
+            results[f"threads{nThreads}"], images = timeCall(
+                lambda: decompressor.readImages(filename, hdus), repeat)
+            identical &= all(np.array_equal(image.array, reference.array)
+                             for image, reference in zip(images, expected))
+        results["identical"] = identical
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("rawFile", nargs="?",
+                        help="Raw to read; a synthetic one is written if not given.")
+    parser.add_argument("-t", "--threads", type=int, nargs="+", default=[1, 2, 4],
+                        help="Numbers of decompression threads to time.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Timed runs of each method.")
+    parser.add_argument("-o", "--output", help="Also write the JSON results to this file.")
+    cmd = parser.parse_args()
+
+    results = benchmark(cmd.rawFile, threads=cmd.threads, repeat=cmd.repeat)
+    print(json.dumps(results, indent=2))
+    if cmd.output:
+        with open(cmd.output, "w") as f:
+            json.dump(results, f, indent=2)
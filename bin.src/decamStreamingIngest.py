@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Watch a directory and ingest DECam raws into a butler repository as they
+arrive.
+
+Set ``OBS_DECAM_METRICS`` to a file name to get the per-file ingest latency
+(and the other DECam I/O metrics) as JSON when the service stops.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from lsst.daf.butler import Butler
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.streamingIngest import StreamingIngester
+
+
+async def main(cmd):
+    butler = Butler(cmd.repo, writeable=True)
+    if cmd.register:
+        DarkEnergyCamera().register(butler.registry)
+    ingester = StreamingIngester(butler, cmd.directory, pattern=cmd.pattern, run=cmd.run,
+                                 transfer=cmd.transfer, pollInterval=cmd.poll_interval,
+                                 settleTime=cmd.settle_time, queueSize=cmd.queue_size)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, ingester.stop)
+    await ingester.serve(maxFiles=cmd.max_files)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("repo", help="Butler repository to ingest into.")
+    parser.add_argument("directory", help="Drop directory to watch.")
+    parser.add_argument("--run", help="Run to ingest into (default: the DECam raw run).")
+    parser.add_argument("--pattern", default="*.fits*", help="Pattern of the file names to ingest.")
+    parser.add_argument("--transfer", default="direct", help="Ingest transfer mode.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls.")
+    parser.add_argument("--settle-time", type=float, default=2.0,
+                        help="Seconds a file must be unchanged for before it is ingested.")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Maximum number of landed files waiting to be ingested.")
+    parser.add_argument("--max-files", type=int, help="Stop after this many files.")
+    parser.add_argument("--register", action="store_true", help="Register the instrument first.")
+    cmd = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(cmd))
@@ -0,0 +1,76 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Build or update a Parquet index of the metadata of DECam raws, and select
+raw files from it.
+
+With ``--add``, the given files (and the raws in the given directories) are
+added to the index; new and changed files are read, the others are not.
+The files matching the selection options are then printed, one per line.
+"""
+import argparse
+import glob
+import logging
+import os
+
+from lsst.obs.decam.metadataIndex import MetadataIndex
+
+
+def expandPaths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from glob.glob(os.path.join(path, "**", "*.fits*"), recursive=True)
+        else:
+            yield path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("index", help="Directory of the index.")
+    parser.add_argument("--add", nargs="+", default=[], metavar="PATH",
+                        help="Raw files, or directories of raws, to add to the index.")
+    parser.add_argument("--prune", action="store_true", help="Remove files that no longer exist.")
+    parser.add_argument("-j", "--processes", type=int, default=1, help="Processes to read headers with.")
+    parser.add_argument("--band", nargs="+", help="Select these bands.")
+    parser.add_argument("--physical-filter", nargs="+", help="Select these physical filters.")
+    parser.add_argument("--science-program", nargs="+", help="Select these proposal ids.")
+    parser.add_argument("--object", nargs="+", help="Select these object names.")
+    parser.add_argument("--observation-type", nargs="+", help="Select these observation types.")
+    parser.add_argument("--exposure-time", nargs=2, type=float, metavar=("MIN", "MAX"),
+                        help="Select this range of exposure times, in seconds.")
+    parser.add_argument("--airmass", nargs=2, type=float, metavar=("MIN", "MAX"),
+                        help="Select this range of airmasses.")
+    parser.add_argument("--mjd", nargs=2, type=float, metavar=("MIN", "MAX"),
+                        help="Select this range of start times (TAI MJD).")
+    parser.add_argument("--detector", nargs="+", type=int, help="Select files containing these detectors.")
+    cmd = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = MetadataIndex(cmd.index)
+    if cmd.add or cmd.prune:
+        count = index.update(expandPaths(cmd.add), processes=cmd.processes, prune=cmd.prune)
+        logging.info("Read %d files; %d files are indexed.", count, len(index.exposures))
+    criteria = {name: getattr(cmd, name) for name in ("band", "physical_filter", "science_program", "object",
+                                                      "observation_type", "exposure_time", "airmass", "mjd")
+                if getattr(cmd, name) is not None}
+    if criteria or cmd.detector or not (cmd.add or cmd.prune):
+        for filename in index.query(detector=cmd.detector, **criteria):
+            print(filename)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+#
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Build the DECam camera geometry and persist it, so that
+`lsst.obs.decam.DarkEnergyCamera.getCamera` can read it instead of
+building it.
+"""
+import argparse
+import os
+
+from lsst.obs.decam.cameraCache import writePersistedCamera
+from lsst.utils import getPackageDir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?", default=None,
+                        help="Camera geometry directory (default: decam/camGeom in obs_decam).")
+    cmd = parser.parse_args()
+
+    path = cmd.path or os.path.join(getPackageDir("obs_decam"), "decam", "camGeom")
+    camera = writePersistedCamera(path)
+    print(f"Persisted {len(camera)} detectors of {camera.getName()} in {path}.")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+"""Build all the DECam curated calibrations from the files in this
+directory, converting only those whose inputs have changed.
+
+The camera is built once, and shared by all the converters; the outputs of
+each product are made and written on a pool of threads, one task per
+detector, and each file is written atomically.  The SHA-256 of each
+product's input file and converter script, the ``lsst.obs.decam`` modules
+they use, the camera geometry sources and the ``ip_isr`` version is
+recorded in a manifest in the output directory, and products whose hash
+has not changed (and whose outputs all exist) are skipped.  Outputs that a
+product no longer writes, and those of products whose inputs have gone, are
+deleted.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os.path
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lsst.ip.isr
+import lsst.obs.decam
+from lsst.obs.decam.cameraCache import hashCameraSources
+from lsst.obs.decam.fileUtils import writeAtomic
+from lsst.utils import getPackageDir
+
+import makeCrosstalkDecam
+import makeLinearizer
+import make_des_standard_atmosphere
+import make_des_throughput
+
+# Version of the build; bump to rebuild everything when the way the outputs
+# are written changes.
+BUILD_VERSION = 1
+
+MANIFEST = ".curatedCalibs.json"
+
+ORIGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def hashHelperModules():
+    """Return a hash of the source of the ``lsst.obs.decam`` modules that
+    have been imported, which include all those the converters use.
+
+    ``version.py`` is left out, as it changes with every commit.
+    """
+    digest = hashlib.sha256()
+    for name, module in sorted(sys.modules.items()):
+        if not (name == "lsst.obs.decam" or name.startswith("lsst.obs.decam.")):
+            continue
+        filename = getattr(module, "__file__", None)
+        if filename is None or name == "lsst.obs.decam.version":
+            continue
+        digest.update(f"{name}\0".encode())
+        with open(filename, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def hashDependencies():
+    """Return a hash of what the outputs depend on besides the inputs and
+    converters: the ``lsst.obs.decam`` modules they use, the camera geometry
+    and the version of ``ip_isr``, which serializes the calibrations.
+    """
+    camGeom = os.path.join(getPackageDir("obs_decam"), "decam", "camGeom")
+    ipIsrVersion = getattr(lsst.ip.isr, "__version__", "unknown")
+    return hashlib.sha256(f"{hashHelperModules()}\0{hashCameraSources(camGeom)}\0"
+                          f"{ipIsrVersion}".encode()).hexdigest()
+
+
+def hashProduct(inputFile, converter, dependencies):
+    """Return a hash of the input file of a product, the script that
+    converts it, and ``dependencies``, from `hashDependencies`.
+    """
+    digest = hashlib.sha256(f"{BUILD_VERSION}\0{os.path.basename(inputFile)}\0{dependencies}\0".encode())
+    for filename in (inputFile, converter.__file__):
+        with open(filename, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _writeTable(table, filename):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    writeAtomic(filename, lambda tempName: table.write(tempName, format="ascii.ecsv", overwrite=True))
+    return [filename]
+
+
+def linearizerTasks(fromFile, camera, outputDir):
+    """Return the tasks that write the linearizer of each detector."""
+    tables = makeLinearizer.readLinearityTables(fromFile)
+    if len(tables) != len(camera):
+        raise RuntimeError(f"{fromFile} has {len(tables)} tables for {len(camera)} detectors.")
+
+    def task(detector, lsstTable):
+        outDir = os.path.join(outputDir, "CALIB", "linearity", detector.getName().lower())
+        os.makedirs(outDir, exist_ok=True)
+        return makeLinearizer.writeLinearizer(
+            makeLinearizer.makeDetectorLinearizer(lsstTable, detector, camera), outDir)
+
+    return [lambda detector=detector, lsstTable=lsstTable: task(detector, lsstTable)
+            for detector, lsstTable in zip(camera, tables)]
+
+
+def crosstalkTasks(crosstalkInfile, camera, outputDir):
+    """Return the tasks that write the crosstalk calibration of each
+    detector.
+    """
+    def task(dataDict):
+        outDir = os.path.join(outputDir, "crosstalk", dataDict["DETECTOR_NAME"].lower())
+        os.makedirs(outDir, exist_ok=True)
+        filename = os.path.join(outDir, "1970-01-01T00:00:00.yaml")
+        writeAtomic(filename, makeCrosstalkDecam.makeCrosstalkCalib(dataDict).writeText)
+        return [filename]
+
+    return [lambda dataDict=dataDict: task(dataDict)
+            for dataDict in makeCrosstalkDecam.readFile(crosstalkInfile, camera=camera).values()]
+
+
+def throughputTasks(desfile, camera, outputDir):
+    """Return the tasks that write the system throughput of each detector
+    in one band.
+    """
+    band = os.path.basename(desfile).split("_")[0]
+    tables, physicalFilter = make_des_throughput.read_transmission_file(desfile, band, camera=camera)
+
+    def task(detName, table):
+        return _writeTable(table, os.path.join(outputDir, "transmission_system", detName.lower(),
+                                               physicalFilter.lower(), f"{table.meta['CALIBDATE']}.ecsv"))
+
+    return [lambda detName=detName, table=table: task(detName, table) for detName, table in tables.items()]
+
+
+def atmosphereTasks(desfile, camera, outputDir):
+    """Return the task that writes the standard atmosphere."""
+    table = make_des_standard_atmosphere.read_transmission_file(desfile, camera=camera)
+    return [lambda: _writeTable(table, os.path.join(outputDir, "transmission_atmosphere",
+                                                    f"{table.meta['CALIBDATE']}.ecsv"))]
+
+
+def findProducts(linearity=None, crosstalk=None, throughputs=None, atmosphere=None):
+    """Return the products to build, from the given input files or those in
+    this directory.
+
+    Returns
+    -------
+    products : `list` [`tuple`]
+        The ``(input file, converter script module, task function)`` of each
+        product.
+    """
+    def find(pattern):
+        return sorted(glob.glob(os.path.join(ORIGIN_DIR, pattern)))
+
+    if linearity is None:
+        # Only the latest version of the linearity table is converted.
+        linearity = (find("linearity_table_v*.fits") or [None])[-1]
+    if crosstalk is None:
+        crosstalk = (find("DECam_xtalk_*.txt") or [None])[-1]
+    if throughputs is None:
+        throughputs = find("*_band_per_detector_throughput.fits")
+    if atmosphere is None:
+        atmosphere = (find("des_atm_std.fits") or [None])[-1]
+
+    products = []
+    if linearity is not None:
+        products.append((linearity, makeLinearizer, linearizerTasks))
+    if crosstalk is not None:
+        products.append((crosstalk, makeCrosstalkDecam, crosstalkTasks))
+    products.extend((desfile, make_des_throughput, throughputTasks) for desfile in throughputs)
+    if atmosphere is not None:
+        products.append((atmosphere, make_des_standard_atmosphere, atmosphereTasks))
+    return products
+
+
+def removeOutputs(outputDir, names, verbose=False):
+    """Delete outputs of an earlier build.
+
+    Parameters
+    ----------
+    outputDir : `str`
+        Directory the curated calibrations are written to.
+    names : iterable [`str`]
+        The outputs to delete, relative to ``outputDir``.
+    verbose : `bool`, optional
+        Print the files deleted.
+    """
+    for name in sorted(names):
+        filename = os.path.join(outputDir, name)
+        if os.path.exists(filename):
+            os.remove(filename)
+            if verbose:
+                print(f"  removed {filename}")
+
+
+def build(products, outputDir, threads=4, force=False, verbose=False, prune=False):
+    """Build the products whose inputs have changed since the last build.
+
+    Parameters
+    ----------
+    products : `list` [`tuple`]
+        The products, from `findProducts`.
+    outputDir : `str`
+        Directory to write the curated calibrations to.
+    threads : `int`, optional
+        Number of threads to write the outputs of each product with.
+    force : `bool`, optional
+        Rebuild all the products.
+    verbose : `bool`, optional
+        Print the files written and deleted.
+    prune : `bool`, optional
+        Delete the outputs of products in the manifest that are not in
+        ``products``; only set this if ``products`` are all the products.
+
+    Returns
+    -------
+    built : `list` [`str`]
+        The input files of the products that were built.
+    """
+    manifestFile = os.path.join(outputDir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifestFile):
+        with open(manifestFile) as f:
+            manifest = json.load(f)
+
+    def writeManifest(tempName):
+        with open(tempName, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    dependencies = hashDependencies()
+    camera = None
+    built = []
+    with ThreadPoolExecutor(threads) as executor:
+        for inputFile, converter, makeTasks in products:
+            key = os.path.basename(inputFile)
+            productHash = hashProduct(inputFile, converter, dependencies)
+            previous = manifest.get(key, {})
+            previousOutputs = previous.get("outputs", [])
+            if (not force and previous.get("hash") == productHash
+                    and all(os.path.exists(os.path.join(outputDir, name)) for name in previousOutputs)):
+                print(f"{key}: unchanged")
+                continue
+
+            start = time.perf_counter()
+            if camera is None:
+                camera = lsst.obs.decam.DarkEnergyCamera().getCamera()
+            outputs = []
+            for filenames in executor.map(lambda task: task(), makeTasks(inputFile, camera, outputDir)):
+                outputs.extend(filenames)
+            if verbose:
+                for filename in outputs:
+                    print(f"  {filename}")
+            print(f"{key}: wrote {len(outputs)} files in {time.perf_counter() - start:.1f} s")
+
+            outputs = sorted(os.path.relpath(name, outputDir) for name in outputs)
+            removeOutputs(outputDir, set(previousOutputs) - set(outputs), verbose=verbose)
+            manifest[key] = {"hash": productHash, "outputs": outputs}
+            # Record each product as it is built, so that an interrupted
+            # build does not redo it.
+            os.makedirs(outputDir, exist_ok=True)
+            writeAtomic(manifestFile, writeManifest)
+            built.append(inputFile)
+
+    if prune:
+        keys = {os.path.basename(inputFile) for inputFile, _, _ in products}
+        # A new version of an input (e.g. of the linearity table) may write
+        # the same files as the one it replaces.
+        kept = {name for key in keys if key in manifest for name in manifest[key]["outputs"]}
+        stale = sorted(set(manifest) - keys)
+        for key in stale:
+            removeOutputs(outputDir, set(manifest.pop(key)["outputs"]) - kept, verbose=verbose)
+            print(f"{key}: removed")
+        if stale:
+            writeAtomic(manifestFile, writeManifest)
+    return built
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--linearity", help="DECam linearity FITS file; default linearity_table_v*.fits.")
+    parser.add_argument("--crosstalk", help="DECam crosstalk file; default DECam_xtalk_*.txt.")
+    parser.add_argument("--throughput", nargs="+", dest="throughputs",
+                        help="DES system throughput files, named BAND_*.fits; default "
+                             "*_band_per_detector_throughput.fits.")
+    parser.add_argument("--atmosphere", help="DES standard atmosphere file; default des_atm_std.fits.")
+    parser.add_argument("-o", "--output", default=os.path.join(getPackageDir("obs_decam"), "decam"),
+                        help="Directory to write the curated calibrations to.")
+    parser.add_argument("-j", "--threads", type=int, default=4, help="Threads to write outputs with.")
+    parser.add_argument("-f", "--force", action="store_true", help="Rebuild unchanged products.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the files written and deleted.")
+    cmd = parser.parse_args()
+
+    products = findProducts(linearity=cmd.linearity, crosstalk=cmd.crosstalk, throughputs=cmd.throughputs,
+                            atmosphere=cmd.atmosphere)
+    # Only prune the outputs of other products if all were looked for here.
+    prune = not (cmd.linearity or cmd.crosstalk or cmd.throughputs or cmd.atmosphere)
+    build(products, cmd.output, threads=cmd.threads, force=cmd.force, verbose=cmd.verbose, prune=prune)
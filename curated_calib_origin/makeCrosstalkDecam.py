@@ -17,19 +17,36 @@ def getCrosstalkDir():
     return os.path.join(getPackageDir('obs_decam'), 'decam', 'crosstalk')
 
 
-def makeDetectorCrosstalk(dataDict, force=False):
-    """Generate and write CrosstalkCalib from dictionary.
+def makeCrosstalkCalib(dataDict):
+    """Make a CrosstalkCalib from a dictionary.
 
     Parameters
     ----------
     dataDict : `dict`
         Dictionary from ``readFile`` containing crosstalk definition.
+
+    Returns
+    -------
+    calib : `lsst.ip.isr.CrosstalkCalib`
+        The crosstalk calibration.
     """
-    dataDict['coeffs'] = dataDict['coeffs'].transpose()
+    dataDict = dict(dataDict, coeffs=dataDict['coeffs'].transpose())
 
     decamCT = ipIsr.crosstalk.CrosstalkCalib.fromDict(dataDict)
     # Supply a date prior to all data, to ensure universal use.
     decamCT.updateMetadata(setDate=False, CALIBDATE='1970-01-01T00:00:00')
+    return decamCT
+
+
+def makeDetectorCrosstalk(dataDict, force=False):
+    """Generate and write CrosstalkCalib from dictionary.
+
+    Parameters
+    ----------
+    dataDict : `dict`
+        Dictionary from ``readFile`` containing crosstalk definition.
+    """
+    decamCT = makeCrosstalkCalib(dataDict)
 
     detName = dataDict['DETECTOR_NAME']
     outDir = os.path.join(getCrosstalkDir(), detName.lower())
@@ -42,13 +59,105 @@ def makeDetectorCrosstalk(dataDict, force=False):
     decamCT.writeText(f"{outDir}/1970-01-01T00:00:00.yaml")
 
 
-def readFile(crosstalkInfile):
+# Lookup of the amp letter of a detector/amp code (e.g. ``ccd25A``), by
+# its character code, to the amp index.
+AMP_INDEX = np.full(128, -1, dtype=np.int64)
+AMP_INDEX[ord('A')] = 0
+AMP_INDEX[ord('B')] = 1
+
+
+def parseDetAmpCodes(codes):
+    """Convert detector/amp codes to detector numbers and amp indices.
+
+    Parameters
+    ----------
+    codes : `numpy.ndarray` [`str`]
+        Codes of the form ``ccdNNA`` or ``ccdNNB``.
+
+    Returns
+    -------
+    detNums : `numpy.ndarray` [`int`]
+        Detector (``ccdNN``) numbers.
+    ampIndices : `numpy.ndarray` [`int`]
+        Amp indices (0 for A, 1 for B).
+
+    Raises
+    ------
+    RuntimeError :
+        Raised if a code is not of the expected form.
+    """
+    codes = np.asarray(codes, dtype=str)
+    # Converting to 'U6' would silently truncate longer codes.
+    tooLong = np.char.str_len(codes) > 6
+    if np.any(tooLong):
+        raise RuntimeError(f"Unknown amp: {codes[np.argmax(tooLong)]}")
+    codes = codes.astype('U6')
+    # The characters of each code, as an (nCodes, 6) array of code points.
+    chars = codes.view(np.uint32).reshape(len(codes), 6)
+    digits = chars[:, 3:5].astype(np.int64) - ord('0')
+    ampIndices = AMP_INDEX[np.minimum(chars[:, 5], len(AMP_INDEX) - 1)]
+    bad = ((ampIndices < 0) | np.any((digits < 0) | (digits > 9), axis=1)
+           | np.any(chars[:, :3] != np.array([ord(c) for c in 'ccd'], dtype=np.uint32), axis=1))
+    if np.any(bad):
+        raise RuntimeError(f"Unknown amp: {codes[np.argmax(bad)]}")
+    return digits[:, 0]*10 + digits[:, 1], ampIndices
+
+
+def readCrosstalkTensor(crosstalkInfile):
+    """Read a DECam crosstalk table into a dense coefficient tensor.
+
+    Parameters
+    ----------
+    crosstalkInfile : `str`
+        File containing crosstalk coefficient information.
+
+    Returns
+    -------
+    coeffs : `numpy.ndarray` [`float`]
+        Coefficients, indexed by (victim detector number, victim amp,
+        source detector number, source amp).
+    listed : `numpy.ndarray` [`bool`]
+        Whether the table lists any coefficient for each (victim detector
+        number, source detector number) pair.
+    pairs : `numpy.ndarray` [`int`]
+        The listed (victim detector number, source detector number) pairs,
+        in order of first appearance in the table.
+
+    Raises
+    ------
+    RuntimeError :
+        Raised if an amp is not known.
+    """
+    table = np.loadtxt(crosstalkInfile, comments='#', usecols=(0, 1, 2), ndmin=1,
+                       dtype=[('victim', 'U8'), ('source', 'U8'), ('coeff', 'f8')])
+    victimDets, victimAmps = parseDetAmpCodes(table['victim'])
+    sourceDets, sourceAmps = parseDetAmpCodes(table['source'])
+    nDet = max(victimDets.max(initial=0), sourceDets.max(initial=0)) + 1
+
+    # As when reading line by line, later entries replace earlier ones.
+    keys = ((victimDets*2 + victimAmps)*nDet + sourceDets)*2 + sourceAmps
+    _, lastReversed = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - lastReversed
+    coeffs = np.zeros((nDet, 2, nDet, 2))
+    coeffs[victimDets[last], victimAmps[last], sourceDets[last], sourceAmps[last]] = table['coeff'][last]
+    listed = np.zeros((nDet, nDet), dtype=bool)
+    listed[victimDets, sourceDets] = True
+    _, first = np.unique(victimDets*nDet + sourceDets, return_index=True)
+    first.sort()
+    pairs = np.stack([victimDets[first], sourceDets[first]], axis=1)
+    return coeffs, listed, pairs
+
+
+def readFile(crosstalkInfile, camera=None):
     """Construct crosstalk dictionary-of-dictionaries from crosstalkInfile.
 
     Parameters
     ----------
     crosstalkInfile : `str`
         File containing crosstalk coefficient information.
+    camera : `lsst.afw.cameraGeom.Camera`, optional
+        The DECam camera, if already built; otherwise the detector names
+        and ids are read without building it.
 
     Results
     -------
@@ -61,76 +170,42 @@ def readFile(crosstalkInfile):
     RuntimeError :
         Raised if the detector is not known.
     """
-    instrument = lsst.obs.decam.DarkEnergyCamera()
-    camera = instrument.getCamera()
-
-    ampIndexMap = {'A': 0, 'B': 1}
-    detMap = {}
-    detSerialMap = {}
-    for detector in camera:
-        detMap[f"ccd{detector.getId():02d}"] = detector.getName()
-        detSerialMap[detector.getName()] = detector.getId()
-    detMap['ccd61'] = 'N30'
-    detSerialMap['N30'] = 61
+    # Only the detector names and ids are needed, which does not need the
+    # detectors to be built.
+    if camera is None:
+        camera = lsst.obs.decam.DarkEnergyCamera.getLazyCamera()
+        detMap = dict(zip(camera.getIdIter(), camera.getNameIter()))
+    else:
+        detMap = {detector.getId(): detector.getName() for detector in camera}
+    detMap[61] = 'N30'
+
+    coeffs, listed, pairs = readCrosstalkTensor(crosstalkInfile)
+    unknown = set(pairs.flatten().tolist()) - set(detMap)
+    if unknown:
+        raise RuntimeError(f"Unknown detector: ccd{min(unknown):02d}")
 
     outDict = dict()
-    with open(crosstalkInfile) as f:
-        for line in f:
-            li = line.strip()
-            if not li.startswith('#'):
-                elem = li.split()
-
-                victimDetAmp = elem[0]
-                sourceDetAmp = elem[1]
-                coeff = float(elem[2])
-
-                if 'A' in victimDetAmp:
-                    victimAmp = 'A'
-                elif 'B' in victimDetAmp:
-                    victimAmp = 'B'
-                else:
-                    raise RuntimeError(f"Unknown amp: {victimDetAmp}")
-
-                if 'A' in sourceDetAmp:
-                    sourceAmp = 'A'
-                elif 'B' in sourceDetAmp:
-                    sourceAmp = 'B'
-                else:
-                    raise RuntimeError(f"Unknown amp: {sourceDetAmp}")
-
-                victimDet = victimDetAmp.replace(victimAmp, "")
-                sourceDet = sourceDetAmp.replace(sourceAmp, "")
-                victimDet = detMap[victimDet]
-                sourceDet = detMap[sourceDet]
-
-                victimAmp = ampIndexMap[victimAmp]
-                sourceAmp = ampIndexMap[sourceAmp]
-
-                if victimDet not in outDict:
-                    outDict[victimDet] = dict()
-                    outDict[victimDet]['metadata'] = PropertyList()
-                    outDict[victimDet]['metadata']['OBSTYPE'] = 'CROSSTALK'
-                    outDict[victimDet]['metadata']['INSTRUME'] = 'DECam'
-                    outDict[victimDet]['interChip'] = dict()
-                    outDict[victimDet]['crosstalkShape'] = (2, 2)
-                    outDict[victimDet]['hasCrosstalk'] = True
-                    outDict[victimDet]['nAmp'] = 2
-                    if 'coeffs' not in outDict[victimDet]:
-                        # shape=outDict[victimDet]['crosstalkShape'])
-                        outDict[victimDet]['coeffs'] = np.zeros_like([], shape=(2, 2))
-
-                if sourceDet == victimDet:
-                    outDict[victimDet]['metadata']['DETECTOR_NAME'] = victimDet
-                    outDict[victimDet]['metadata']['DETECTOR_SERIAL'] = detSerialMap[victimDet]
-                    outDict[victimDet]['metadata']['DETECTOR'] = detSerialMap[victimDet]
-                    outDict[victimDet]['DETECTOR_NAME'] = victimDet
-                    outDict[victimDet]['DETECTOR_SERIAL'] = detSerialMap[victimDet]
-                    outDict[victimDet]['DETECTOR'] = detSerialMap[victimDet]
-                    outDict[victimDet]['coeffs'][victimAmp][sourceAmp] = coeff
-                else:
-                    if sourceDet not in outDict[victimDet]['interChip']:
-                        outDict[victimDet]['interChip'][sourceDet] = np.zeros_like([], shape=(2, 2))
-                    outDict[victimDet]['interChip'][sourceDet][victimAmp][sourceAmp] = coeff
+    for victimNum, sourceNum in pairs.tolist():
+        victimDet = detMap[victimNum]
+        if victimDet not in outDict:
+            outDict[victimDet] = dict()
+            outDict[victimDet]['metadata'] = PropertyList()
+            outDict[victimDet]['metadata']['OBSTYPE'] = 'CROSSTALK'
+            outDict[victimDet]['metadata']['INSTRUME'] = 'DECam'
+            outDict[victimDet]['interChip'] = dict()
+            outDict[victimDet]['crosstalkShape'] = (2, 2)
+            outDict[victimDet]['hasCrosstalk'] = True
+            outDict[victimDet]['nAmp'] = 2
+            outDict[victimDet]['coeffs'] = coeffs[victimNum, :, victimNum, :].copy()
+            if listed[victimNum, victimNum]:
+                outDict[victimDet]['metadata']['DETECTOR_NAME'] = victimDet
+                outDict[victimDet]['metadata']['DETECTOR_SERIAL'] = victimNum
+                outDict[victimDet]['metadata']['DETECTOR'] = victimNum
+                outDict[victimDet]['DETECTOR_NAME'] = victimDet
+                outDict[victimDet]['DETECTOR_SERIAL'] = victimNum
+                outDict[victimDet]['DETECTOR'] = victimNum
+        if sourceNum != victimNum:
+            outDict[victimDet]['interChip'][detMap[sourceNum]] = coeffs[victimNum, :, sourceNum, :].copy()
     return outDict
 
 
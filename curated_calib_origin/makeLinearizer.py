@@ -10,10 +10,115 @@ import astropy.io.fits as fits
 
 import lsst.obs.decam
 from lsst.ip.isr import Linearizer
+from lsst.obs.decam.fileUtils import writeAtomic
 from lsst.utils import getPackageDir
 
 
-def makeLinearizerDecam(fromFile, force=False, verbose=False):
+CALIB_DATE = '1970-01-01T00:00:00'
+
+
+def getLinearizerDir(detector):
+    """Get the directory in the obs package to write a detector's
+    linearizers to.
+    """
+    return os.path.join(getPackageDir('obs_decam'), 'decam', 'CALIB', 'linearity',
+                        detector.getName().lower())
+
+
+def readLinearityTables(fromFile, verbose=False):
+    """Read the DECam linearity FITS table of each CCD as an LSST lookup
+    table.
+
+    Parameters
+    ----------
+    fromFile : `str`
+        Filename to read linearity data from.
+    verbose : `bool`, optional
+        Control message verbosity.
+
+    Returns
+    -------
+    tables : `list` [`numpy.ndarray`]
+        The (amp, ADU) lookup table of offsets of each CCD, in CCD number
+        order.
+
+    Raises
+    ------
+    RuntimeError :
+        Raised if the ADU values are not contiguous.
+    """
+    tables = []
+    with fits.open(fromFile) as hdus:
+        for ccdind, hdu in enumerate(hdus[1:]):  # HDU 0 has no data
+            fromData = hdu.data
+            assert len(fromData.dtype) == 3
+            lsstTable = np.zeros((2, len(fromData)), dtype=np.float32)
+            uncorr = fromData["ADU"]
+            if not np.allclose(uncorr, np.arange(len(fromData))):
+                raise RuntimeError("ADU data not a range of integers starting at 0")
+            for i, ampName in enumerate("AB"):
+                # convert DECam replacement table to LSST offset table
+                if verbose:
+                    print("ccdnum=%s: DECam table for %s=%s..." % (ccdind + 1, ampName,
+                                                                   fromData["ADU_LINEAR_" + ampName][0:5]))
+                lsstTable[i, :] = fromData["ADU_LINEAR_" + ampName] - uncorr
+                if verbose:
+                    print("ccdnum=%s: LSST  table for %s=%s..." % (ccdind + 1, ampName, lsstTable[i, 0:5]))
+            tables.append(lsstTable)
+    return tables
+
+
+def makeDetectorLinearizer(lsstTable, detector, camera):
+    """Make the gen3 Linearizer of a detector from its lookup table.
+
+    Parameters
+    ----------
+    lsstTable : `numpy.ndarray`
+        The (amp, ADU) lookup table of offsets, from `readLinearityTables`.
+    detector : `lsst.afw.cameraGeom.Detector`
+        The detector.
+    camera : `lsst.afw.cameraGeom.Camera`
+        The camera.
+
+    Returns
+    -------
+    linearizer : `lsst.ip.isr.Linearizer`
+        The linearizer.
+    """
+    myLinearity = Linearizer(table=lsstTable)
+    for i, ampName in enumerate("AB"):
+        myLinearity.ampNames.append(ampName)
+        myLinearity.linearityType[ampName] = 'LookupTable'
+        myLinearity.linearityCoeffs[ampName] = np.array([i, 0])
+        myLinearity.linearityBBox[ampName] = detector.getAmplifiers()[i].getBBox()
+        myLinearity.fitParams[ampName] = np.array([])
+        myLinearity.fitParamsErr[ampName] = np.array([])
+        myLinearity.fitChiSq[ampName] = np.nan
+        myLinearity.fitResiduals[ampName] = np.array([])
+        myLinearity.linearFit[ampName] = np.array([])
+    myLinearity.updateMetadata(camera=camera, detector=detector,
+                               CALIBDATE=CALIB_DATE, setCalibId=True)
+    myLinearity.hasLinearity = True
+    return myLinearity
+
+
+def writeLinearizer(myLinearity, outDir):
+    """Write a linearizer as YAML.
+
+    The curated calibration reader takes the name of every file in
+    ``outDir`` as a validity date, so nothing else is written there.
+
+    Returns
+    -------
+    filenames : `list` [`str`]
+        The files written.
+    """
+    yamlFile = os.path.join(outDir, CALIB_DATE + ".yaml")
+    writeAtomic(yamlFile, myLinearity.writeText)
+    return [yamlFile]
+
+
+def makeLinearizerDecam(fromFile, force=False, verbose=False, camera=None):
     """Convert the specified DECam linearity FITS table to standard LSST format
 
     Parameters
@@ -24,6 +129,8 @@ def makeLinearizerDecam(fromFile, force=False, verbose=False):
         Overwrite existing outputs?
     verbose : `bool`, optional
         Control message verbosity.
+    camera : `lsst.afw.cameraGeom.Camera`, optional
+        The DECam camera; built if not given.
 
     Raises
     ------
@@ -52,56 +159,23 @@ def makeLinearizerDecam(fromFile, force=False, verbose=False):
     """
     print("Making DECam linearizers from %r" % (fromFile,))
 
-    instrument = lsst.obs.decam.DarkEnergyCamera()
-    camera = instrument.getCamera()
+    if camera is None:
+        camera = lsst.obs.decam.DarkEnergyCamera().getCamera()
 
-    fromHDUs = fits.open(fromFile)[1:]  # HDU 0 has no data
-    assert len(fromHDUs) == len(camera)
-    for ccdind, (detector, hdu) in enumerate(zip(camera, fromHDUs)):
-        ccdnum = ccdind + 1
+    tables = readLinearityTables(fromFile, verbose=verbose)
+    assert len(tables) == len(camera)
+    for ccdind, (detector, lsstTable) in enumerate(zip(camera, tables)):
         if verbose:
-            print("ccdnum=%s; detector=%s" % (ccdnum, detector.getName()))
-        fromData = hdu.data
-        assert len(fromData.dtype) == 3
-        lsstTable = np.zeros((2, len(fromData)), dtype=np.float32)
-        uncorr = fromData["ADU"]
-        if not np.allclose(uncorr, np.arange(len(fromData))):
-            raise RuntimeError("ADU data not a range of integers starting at 0")
-        for i, ampName in enumerate("AB"):
-            # convert DECam replacement table to LSST offset table
-            if verbose:
-                print("DECam table for %s=%s..." % (ampName, fromData["ADU_LINEAR_" + ampName][0:5],))
-            lsstTable[i, :] = fromData["ADU_LINEAR_" + ampName] - uncorr
-            if verbose:
-                print("LSST  table for %s=%s..." % (ampName, lsstTable[i, 0:5],))
-
-        # Generate gen3 files into local directory.
-        myLinearity = Linearizer(table=lsstTable)
-        for i, ampName in enumerate("AB"):
-            myLinearity.ampNames.append(ampName)
-            myLinearity.linearityType[ampName] = 'LookupTable'
-            myLinearity.linearityCoeffs[ampName] = np.array([i, 0])
-            myLinearity.linearityBBox[ampName] = detector.getAmplifiers()[i].getBBox()
-            myLinearity.fitParams[ampName] = np.array([])
-            myLinearity.fitParamsErr[ampName] = np.array([])
-            myLinearity.fitChiSq[ampName] = np.nan
-            myLinearity.fitResiduals[ampName] = np.array([])
-            myLinearity.linearFit[ampName] = np.array([])
-        calibDate = '1970-01-01T00:00:00'
-        myLinearity.updateMetadata(camera=camera, detector=detector,
-                                   CALIBDATE=calibDate, setCalibId=True)
-        myLinearity.hasLinearity = True
-
-        outDir = os.path.join(getPackageDir('obs_decam'), 'decam', 'CALIB', 'linearity',
-                              detector.getName().lower())
+            print("ccdnum=%s; detector=%s" % (ccdind + 1, detector.getName()))
+        myLinearity = makeDetectorLinearizer(lsstTable, detector, camera)
+
+        outDir = getLinearizerDir(detector)
         if os.path.exists(outDir) and not force:
             print("Output directory %r exists; use --force to replace" % (outDir, ))
             sys.exit(1)
         else:
             os.makedirs(outDir, exist_ok=True)
-
-        filename = calibDate + ".yaml"
-        myLinearity.writeText(os.path.join(outDir, filename))
+        writeLinearizer(myLinearity, outDir)
 
     print("Wrote %s linearizers" % (ccdind+1,))
 
@@ -24,13 +24,15 @@ def get_transmission_dir():
     return os.path.join(getPackageDir("obs_decam"), "decam", "transmission_atmosphere")
 
 
-def read_transmission_file(filename):
+def read_transmission_file(filename, camera=None):
     """Read a transmission file and return a table.
 
     Parameters
     ----------
     filename : `str`
         Filename to read.
+    camera : `lsst.afw.cameraGeom.Camera`, optional
+        The DECam camera; built if not given.
 
     Returns
     -------
@@ -39,7 +41,8 @@ def read_transmission_file(filename):
     """
     input_table = astropy.io.fits.getdata(filename)
 
-    camera = DarkEnergyCamera().getCamera()
+    if camera is None:
+        camera = DarkEnergyCamera().getCamera()
 
     tput_table = astropy.table.Table(
         data={
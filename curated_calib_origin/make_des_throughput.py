@@ -25,7 +25,7 @@ def get_transmission_dir():
     return os.path.join(getPackageDir("obs_decam"), "decam", "transmission_system")
 
 
-def read_transmission_file(filename, band):
+def read_transmission_file(filename, band, camera=None):
     """Read a transmission file and get a dict of tables.
 
     Parameters
@@ -34,6 +34,8 @@ def read_transmission_file(filename, band):
         Filename to read.
     band : `str`
         Name of band.
+    camera : `lsst.afw.cameraGeom.Camera`, optional
+        The DECam camera; built if not given.
 
     Returns
     -------
@@ -45,7 +47,8 @@ def read_transmission_file(filename, band):
     """
     input_table = astropy.io.fits.getdata(filename)
 
-    camera = DarkEnergyCamera().getCamera()
+    if camera is None:
+        camera = DarkEnergyCamera().getCamera()
 
     physical_filter = None
     for filter_def in DECAM_FILTER_DEFINITIONS:
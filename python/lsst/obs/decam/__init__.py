@@ -2,3 +2,5 @@ from .version import *
 
 from ._instrument import *
 from .rawFormatter import *
+from .rawReader import *
+from .rawIngest import *
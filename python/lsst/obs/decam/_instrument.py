@@ -28,9 +28,11 @@ import os
 from functools import lru_cache
 
 from astro_metadata_translator import DecamTranslator
-from lsst.afw.cameraGeom import makeCameraFromPath, CameraConfig
+from lsst.daf.butler.registry import ConflictingDefinitionError
 from lsst.obs.base import Instrument, VisitSystem
 from lsst.obs.decam.decamFilters import DECAM_FILTER_DEFINITIONS
+from lsst.obs.decam.cameraCache import loadCamera
+from lsst.obs.decam.lazyCamera import LazyCamera
 
 from lsst.utils.introspection import get_full_type_name
 from lsst.utils import getPackageDir
@@ -55,18 +57,36 @@ class DarkEnergyCamera(Instrument):
         path = os.path.join(getPackageDir("obs_decam"), self.policyName, "camGeom")
         return self._getCameraFromPath(path)
 
+    @classmethod
+    def getLazyCamera(cls):
+        """Return the camera geometry, building each detector only when it
+        is first needed.
+
+        Returns
+        -------
+        camera : `lsst.obs.decam.lazyCamera.LazyCamera`
+            The camera geometry; indexing it by detector id or name builds
+            only that detector, and anything else builds the full camera.
+        """
+        path = os.path.join(getPackageDir("obs_decam"), cls.policyName, "camGeom")
+        return cls._getLazyCameraFromPath(path)
+
+    @staticmethod
+    @lru_cache()
+    def _getLazyCameraFromPath(path):
+        return LazyCamera(path)
+
     @staticmethod
     @lru_cache()
     def _getCameraFromPath(path):
         """Return the camera geometry given solely the path to the location
-        of that definition."""
-        config = CameraConfig()
-        config.load(os.path.join(path, "camera.py"))
-        return makeCameraFromPath(
-            cameraConfig=config,
-            ampInfoPath=path,
-            shortNameFunc=lambda name: name.replace(" ", "_"),
-        )
+        of that definition.
+
+        A persisted camera is used if one was built from the current
+        definition (see `lsst.obs.decam.cameraCache.loadCamera`); otherwise
+        the camera is built from the config and amp info tables.
+        """
+        return loadCamera(path)
 
     def register(self, registry, update=False):
         camera = self.getCamera()
@@ -80,7 +100,8 @@ class DarkEnergyCamera(Instrument):
             # encoding decodable by humans (and consistent with its previous
             # Gen2 definition).  There are other checks (database constraints)
             # that ensure any ingested raws have "real" detector values, and
-            # those are based on the detector records added in the loop below.
+            # those are based on the detector records added in bulk by
+            # _registerDetectors below.
             registry.syncDimensionData(
                 "instrument",
                 {
@@ -92,22 +113,92 @@ class DarkEnergyCamera(Instrument):
                 update=update
             )
 
-            for detector in camera:
-                registry.syncDimensionData(
-                    "detector",
-                    {
-                        "instrument": self.getName(),
-                        "id": detector.getId(),
-                        "full_name": detector.getName(),
-                        "name_in_raft": detector.getName()[1:],
-                        "raft": detector.getName()[0],
-                        "purpose": str(detector.getType()).split(".")[-1],
-                    },
-                    update=update
-                )
+            self._registerDetectors(registry, camera, update=update)
 
             self._registerFilters(registry, update=update)
 
+    def _registerDetectors(self, registry, camera, update=False):
+        """Register all the detectors of the camera in bulk.
+
+        This has the same result as calling ``syncDimensionData`` for each
+        detector, but the existing records are fetched in a single query
+        and only the missing or changed ones are written, in at most two
+        batched inserts.  Detectors inserted concurrently by another
+        process are checked against the camera like existing ones.
+
+        Parameters
+        ----------
+        registry : `lsst.daf.butler.Registry`
+            The registry to add the detectors to.
+        camera : `lsst.afw.cameraGeom.Camera`
+            The camera geometry.
+        update : `bool`, optional
+            If `True`, update detector records that differ from the camera;
+            otherwise raise.
+
+        Raises
+        ------
+        lsst.daf.butler.registry.ConflictingDefinitionError
+            Raised if ``update`` is `False` and an existing detector record
+            differs from the camera.
+        """
+        records = [
+            {
+                "instrument": self.getName(),
+                "id": detector.getId(),
+                "full_name": detector.getName(),
+                "name_in_raft": detector.getName()[1:],
+                "raft": detector.getName()[0],
+                "purpose": str(detector.getType()).split(".")[-1],
+            }
+            for detector in camera
+        ]
+        missing, changed = self._compareDetectors(registry, records)
+        if missing:
+            # Another process may be registering the same detectors; skip
+            # any it has inserted since they were queried, and check them
+            # like the others.
+            registry.insertDimensionData("detector", *missing, skip_existing=True)
+            _, raced = self._compareDetectors(registry, missing)
+            changed.extend(raced)
+        if changed and not update:
+            ids = [record["id"] for record in changed]
+            raise ConflictingDefinitionError(
+                f"Existing definitions of {self.getName()} detectors {ids} differ from the camera; "
+                "use update=True to replace them."
+            )
+        if changed:
+            registry.insertDimensionData("detector", *changed, replace=True)
+
+    def _compareDetectors(self, registry, records):
+        """Compare detector records with those in a registry.
+
+        Parameters
+        ----------
+        registry : `lsst.daf.butler.Registry`
+            The registry.
+        records : `list` [`dict`]
+            The detector records.
+
+        Returns
+        -------
+        missing : `list` [`dict`]
+            The records that are not in the registry.
+        changed : `list` [`dict`]
+            The records that differ from those in the registry.
+        """
+        existing = {record.id: record.toDict()
+                    for record in registry.queryDimensionRecords("detector", instrument=self.getName())}
+        missing = []
+        changed = []
+        for record in records:
+            current = existing.get(record["id"])
+            if current is None:
+                missing.append(record)
+            elif any(current.get(key) != value for key, value in record.items()):
+                changed.append(record)
+        return missing, changed
+
     def getRawFormatter(self, dataId):
         # local import to prevent circular dependency
         from .rawFormatter import DarkEnergyCameraRawFormatter
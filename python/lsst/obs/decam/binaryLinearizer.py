@@ -0,0 +1,117 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Binary form of lookup-table linearizers, which can be memory mapped.
+
+Nothing in obs_decam or the butler reads this form yet: curated
+linearizers are still ingested from their YAML files, and
+`readBinaryLinearizer` is only used by the tests and
+``benchmarks/benchmarkLinearizerFormats.py``.
+"""
+
+__all__ = ("writeBinaryLinearizer", "readBinaryLinearizer")
+
+import json
+import os
+
+import numpy as np
+
+from lsst.ip.isr import Linearizer
+
+from .fileUtils import writeAtomic
+
+# Version of the binary linearizer format; bump when it changes.
+BINARY_LINEARIZER_FORMAT = 1
+
+
+def _sidecar(filename):
+    return os.path.splitext(filename)[0] + ".json"
+
+
+def _toJson(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot write {value!r} to JSON.")
+
+
+def writeBinaryLinearizer(linearizer, filename):
+    """Write a linearizer as a ``.npy`` lookup table and a JSON file with
+    everything else.
+
+    Parameters
+    ----------
+    linearizer : `lsst.ip.isr.Linearizer`
+        The linearizer to write.
+    filename : `str`
+        The ``.npy`` file to write the lookup table to.  The rest of the
+        linearizer is written to the file with the same name and a
+        ``.json`` extension.
+    """
+    content = linearizer.toDict()
+    content.pop("tableData", None)
+    content["metadata"] = linearizer.getMetadata().toDict()
+    content["binaryFormat"] = BINARY_LINEARIZER_FORMAT
+    table = np.ascontiguousarray(linearizer.tableData if linearizer.tableData is not None
+                                 else np.zeros((0, 0), dtype=np.float32))
+
+    def writeJson(tempName):
+        with open(tempName, "w") as f:
+            json.dump(content, f, default=_toJson)
+
+    def writeTable(tempName):
+        with open(tempName, "wb") as f:
+            np.save(f, table)
+
+    # The table is written first, so that a complete JSON file is only ever
+    # next to a complete table.
+    writeAtomic(filename, writeTable)
+    writeAtomic(_sidecar(filename), writeJson)
+
+
+def readBinaryLinearizer(filename, mmap=True):
+    """Read a linearizer written by `writeBinaryLinearizer`.
+
+    Parameters
+    ----------
+    filename : `str`
+        The ``.npy`` file of the lookup table.
+    mmap : `bool`, optional
+        Memory map the lookup table (read-only) instead of reading it.
+
+    Returns
+    -------
+    linearizer : `lsst.ip.isr.Linearizer`
+        The linearizer.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if the file was written in an unknown format version.
+    """
+    with open(_sidecar(filename)) as f:
+        content = json.load(f)
+    version = content.pop("binaryFormat", None)
+    if version != BINARY_LINEARIZER_FORMAT:
+        raise RuntimeError(f"Unknown binary linearizer format {version} in {_sidecar(filename)}.")
+    linearizer = Linearizer.fromDict(content)
+    table = np.load(filename, mmap_mode="r" if mmap else None)
+    linearizer.tableData = table if table.size else None
+    return linearizer
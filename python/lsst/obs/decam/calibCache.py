@@ -0,0 +1,235 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Process-local cache of DECam Community Pipeline calibration files.
+"""
+
+__all__ = ("CalibHduCache", "getCalibCache")
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import lsst.afw.fits
+import lsst.afw.image
+
+_LOG = logging.getLogger(__name__)
+
+# Environment variable giving the size of the cache in megabytes.
+CALIB_CACHE_ENV = "OBS_DECAM_CALIB_CACHE_MB"
+
+# Maximum number of files remembered as too large to cache.
+MAX_TOO_LARGE = 256
+
+
+class CalibHduCache:
+    """Cache of every HDU of recently-read multi-extension calibrations.
+
+    The first request for any HDU of a file reads all of its HDUs through
+    one open file handle; later requests for other HDUs of the same file
+    are served from memory.  Files are evicted, least recently used first,
+    once the total size of the cached images exceeds ``maxBytes``.  Files
+    larger than that on their own are read one HDU at a time, as usual;
+    reading them for the cache stops at the first HDU that takes the total
+    over ``maxBytes``.
+
+    Files are read without holding the cache's lock, so that reads of
+    different files proceed in parallel; concurrent requests for the same
+    file wait for a single read of it.
+
+    Parameters
+    ----------
+    maxBytes : `int`
+        Maximum number of bytes of image data to hold.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self._files = OrderedDict()
+        self._nBytes = 0
+        self._tooLarge = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path):
+        """Read all the image HDUs of a file, stopping as soon as they are
+        too large to cache.
+
+        Returns
+        -------
+        hdus : `dict` [`int`, `tuple`] or `None`
+            Metadata and image of each HDU, keyed by HDU index, or `None` if
+            the images are larger than ``maxBytes``.
+        nBytes : `int`
+            Size of the image data read.
+        """
+        hdus = {}
+        nBytes = 0
+        fitsData = lsst.afw.fits.Fits(path, "r")
+        try:
+            # NOTE: The primary header (HDU=0) does not contain detector
+            # data.
+            for hdu in range(1, fitsData.countHdus()):
+                fitsData.setHdu(hdu)
+                metadata = fitsData.readMetadata()
+                image = lsst.afw.image.ImageF(fitsData)
+                hdus[hdu] = (metadata, image)
+                nBytes += image.array.nbytes
+                if nBytes > self.maxBytes:
+                    return None, nBytes
+        finally:
+            fitsData.closeFile()
+        return hdus, nBytes
+
+    def _get(self, filename, hdu):
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry[0] == version:
+                self._files.move_to_end(path)
+                return entry[1].get(hdu)
+            if entry is not None:
+                self._evict(path)
+            if self._tooLarge.get(path) == version:
+                self._tooLarge.move_to_end(path)
+                return None
+            loading = self._loading.get(path)
+            if loading is not None and loading[0] == version:
+                future = loading[1]
+            else:
+                future = Future()
+                self._loading[path] = (version, future)
+                loading = None
+
+        if loading is not None:
+            # Another thread is reading this file.
+            return future.result().get(hdu)
+
+        try:
+            hdus, nBytes = self._load(path)
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(path, (None, None))[1] is future:
+                    del self._loading[path]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self._loading.get(path, (None, None))[1] is future:
+                del self._loading[path]
+            if hdus is not None:
+                if path in self._files:
+                    self._evict(path)
+                self._files[path] = (version, hdus, nBytes)
+                self._nBytes += nBytes
+                while self._nBytes > self.maxBytes:
+                    self._evict(next(iter(self._files)))
+            else:
+                _LOG.debug("%s (more than %d bytes) is too large to cache.", path, self.maxBytes)
+                self._tooLarge[path] = version
+                self._tooLarge.move_to_end(path)
+                while len(self._tooLarge) > MAX_TOO_LARGE:
+                    self._tooLarge.popitem(last=False)
+                hdus = {}
+        future.set_result(hdus)
+        return hdus.get(hdu)
+
+    def _evict(self, path):
+        _, _, nBytes = self._files.pop(path)
+        self._nBytes -= nBytes
+
+    def readMetadata(self, filename, hdu):
+        """Return the header of one HDU.
+
+        Parameters
+        ----------
+        filename : `str`
+            The calibration file.
+        hdu : `int`
+            Index of the HDU, counting the primary HDU as 0.
+
+        Returns
+        -------
+        metadata : `lsst.daf.base.PropertyList`
+            A copy of the header.
+        """
+        entry = self._get(filename, hdu)
+        if entry is None:
+            return lsst.afw.fits.readMetadata(filename, hdu)
+        return entry[0].deepCopy()
+
+    def readImage(self, filename, hdu):
+        """Return the image in one HDU.
+
+        Parameters
+        ----------
+        filename : `str`
+            The calibration file.
+        hdu : `int`
+            Index of the HDU, counting the primary HDU as 0.
+
+        Returns
+        -------
+        image : `lsst.afw.image.ImageF`
+            A copy of the image.
+        """
+        entry = self._get(filename, hdu)
+        if entry is None:
+            return lsst.afw.image.ImageF(filename, hdu)
+        return lsst.afw.image.ImageF(entry[1], deep=True)
+
+    def clear(self):
+        """Remove all entries.
+        """
+        with self._lock:
+            self._files.clear()
+            self._nBytes = 0
+            self._tooLarge.clear()
+
+
+_defaultCache = None
+_defaultCacheLock = threading.Lock()
+
+
+def getCalibCache():
+    """Return the process-wide `CalibHduCache`, if one is enabled.
+
+    Caching is enabled by setting the ``OBS_DECAM_CALIB_CACHE_MB``
+    environment variable to the size of the cache in megabytes.
+
+    Returns
+    -------
+    cache : `CalibHduCache` or `None`
+        The shared cache, or `None` if caching is not enabled.
+    """
+    global _defaultCache
+    maxBytes = int(float(os.environ.get(CALIB_CACHE_ENV) or 0)*2**20)
+    if maxBytes <= 0:
+        return None
+    with _defaultCacheLock:
+        if _defaultCache is None:
+            _defaultCache = CalibHduCache(maxBytes)
+        _defaultCache.maxBytes = maxBytes
+        return _defaultCache
@@ -0,0 +1,268 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Build the DECam camera geometry, or read a persisted copy of it.
+"""
+
+__all__ = ("buildCamera", "hashCameraSources", "statCameraSources", "readPersistedCamera",
+           "writePersistedCamera", "getCameraCacheDir", "loadCamera")
+
+import glob
+import hashlib
+import json
+import logging
+import os
+
+from lsst.afw.cameraGeom import Camera, CameraConfig, makeCameraFromPath
+
+from .fileUtils import writeAtomic
+
+_LOG = logging.getLogger(__name__)
+
+# Name of the persisted camera, and of the file recording what it was built
+# from, in the camera geometry directory.
+PERSISTED_CAMERA = "persistedCamera.fits"
+PERSISTED_CAMERA_INFO = "persistedCamera.json"
+
+# Version of the persisted camera format; bump to invalidate old ones.
+PERSISTED_CAMERA_FORMAT = 1
+
+# Environment variable giving a directory in which cameras built at run time
+# are persisted, for other processes to read.
+CAMERA_CACHE_ENV = "OBS_DECAM_CAMERA_CACHE_DIR"
+
+
+def buildCamera(path):
+    """Build the camera geometry from its config and amp info tables.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory, containing ``camera.py`` and one
+        amp info table per detector.
+
+    Returns
+    -------
+    camera : `lsst.afw.cameraGeom.Camera`
+        The camera geometry.
+    """
+    config = CameraConfig()
+    config.load(os.path.join(path, "camera.py"))
+    return makeCameraFromPath(
+        cameraConfig=config,
+        ampInfoPath=path,
+        shortNameFunc=lambda name: name.replace(" ", "_"),
+    )
+
+
+def _sourceFiles(path):
+    files = [os.path.join(path, "camera.py")]
+    files.extend(sorted(f for f in glob.glob(os.path.join(path, "*.fits"))
+                        if os.path.basename(f) != PERSISTED_CAMERA))
+    return files
+
+
+def hashCameraSources(path):
+    """Return a hash of the files the camera geometry is built from.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory.
+
+    Returns
+    -------
+    hash : `str`
+        Hex digest over the names and contents of ``camera.py`` and of the
+        amp info tables.
+    """
+    digest = hashlib.sha256()
+    for filename in _sourceFiles(path):
+        digest.update(os.path.basename(filename).encode())
+        with open(filename, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def statCameraSources(path):
+    """Return a hash of the names, sizes and modification times of the files
+    the camera geometry is built from.
+
+    This is much cheaper than `hashCameraSources`, as the files are not
+    read.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory.
+
+    Returns
+    -------
+    hash : `str`
+        Hex digest over the names, sizes and modification times of
+        ``camera.py`` and of the amp info tables.
+    """
+    digest = hashlib.sha256()
+    for filename in _sourceFiles(path):
+        stat = os.stat(filename)
+        digest.update(f"{os.path.basename(filename)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def readPersistedCamera(path, persistedPath=None, sourceHash=None):
+    """Read the persisted camera geometry, if it is up to date.
+
+    The sizes and modification times of the source files are compared with
+    those recorded when the camera was persisted; only if they differ (for
+    example because the files were copied) are the contents hashed and
+    compared.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory.
+    persistedPath : `str`, optional
+        Directory the persisted camera was written to; defaults to
+        ``path``.
+    sourceHash : `str`, optional
+        The result of `hashCameraSources`, if already known.
+
+    Returns
+    -------
+    camera : `lsst.afw.cameraGeom.Camera` or `None`
+        The camera geometry, or `None` if there is no persisted camera or
+        it was not built from the current config and amp info tables.
+    """
+    persistedPath = path if persistedPath is None else persistedPath
+    cameraFile = os.path.join(persistedPath, PERSISTED_CAMERA)
+    try:
+        with open(os.path.join(persistedPath, PERSISTED_CAMERA_INFO)) as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if info.get("format") != PERSISTED_CAMERA_FORMAT:
+        _LOG.debug("Persisted camera in %s has an old format; ignoring it.", persistedPath)
+        return None
+    if info.get("sourceStat") != statCameraSources(path):
+        sourceHash = hashCameraSources(path) if sourceHash is None else sourceHash
+        if info.get("sourceHash") != sourceHash:
+            _LOG.debug("Persisted camera in %s is out of date; ignoring it.", persistedPath)
+            return None
+    try:
+        return Camera.readFits(cameraFile)
+    except Exception as e:
+        _LOG.warning("Could not read persisted camera %s: %s", cameraFile, e)
+        return None
+
+
+def writePersistedCamera(path, outputPath=None, camera=None, sourceHash=None):
+    """Build the camera geometry and persist it.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory.
+    outputPath : `str`, optional
+        Directory to write the persisted camera to; defaults to ``path``.
+    camera : `lsst.afw.cameraGeom.Camera`, optional
+        The camera built from ``path``, if already built.
+    sourceHash : `str`, optional
+        The result of `hashCameraSources`, if already known.
+
+    Returns
+    -------
+    camera : `lsst.afw.cameraGeom.Camera`
+        The camera geometry that was persisted.
+    """
+    outputPath = path if outputPath is None else outputPath
+    sourceHash = hashCameraSources(path) if sourceHash is None else sourceHash
+    camera = buildCamera(path) if camera is None else camera
+
+    sourceStat = statCameraSources(path)
+
+    def writeInfo(filename):
+        with open(filename, "w") as f:
+            json.dump({"format": PERSISTED_CAMERA_FORMAT, "sourceHash": sourceHash, "sourceStat": sourceStat},
+                      f)
+
+    # The info is written last: it is what marks the camera as valid.
+    writeAtomic(os.path.join(outputPath, PERSISTED_CAMERA), camera.writeFits)
+    writeAtomic(os.path.join(outputPath, PERSISTED_CAMERA_INFO), writeInfo)
+    return camera
+
+
+def getCameraCacheDir():
+    """Return the directory cameras built at run time are shared through.
+
+    The cache is enabled by setting the ``OBS_DECAM_CAMERA_CACHE_DIR``
+    environment variable to a directory that all the processes that need
+    the camera can write to.
+
+    Returns
+    -------
+    cacheDir : `str` or `None`
+        The cache directory, or `None` if the cache is not enabled.
+    """
+    return os.environ.get(CAMERA_CACHE_ENV) or None
+
+
+def loadCamera(path):
+    """Return the camera geometry, reading a persisted copy if possible.
+
+    The camera persisted in ``path`` at build time is used if it is up to
+    date.  Otherwise, if the cross-process cache is enabled (see
+    `getCameraCacheDir`), a copy persisted there by an earlier process is
+    used, or the camera is built and persisted there for later ones.  The
+    cache is keyed on ``path`` and on the names, sizes and modification
+    times of the files in it (see `statCameraSources`), so it can be shared
+    by different stacks, and the files are only read to build the camera.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory.
+
+    Returns
+    -------
+    camera : `lsst.afw.cameraGeom.Camera`
+        The camera geometry.
+    """
+    camera = readPersistedCamera(path)
+    if camera is not None:
+        return camera
+
+    cacheDir = getCameraCacheDir()
+    if cacheDir is None:
+        return buildCamera(path)
+    key = hashlib.sha256(f"{os.path.abspath(path)}\0{statCameraSources(path)}".encode()).hexdigest()
+    entryDir = os.path.join(cacheDir, key[:32])
+    camera = readPersistedCamera(path, persistedPath=entryDir)
+    if camera is not None:
+        _LOG.debug("Read camera for %s from cache %s.", path, entryDir)
+        return camera
+
+    camera = buildCamera(path)
+    try:
+        os.makedirs(entryDir, exist_ok=True)
+        writePersistedCamera(path, outputPath=entryDir, camera=camera)
+    except OSError as e:
+        _LOG.warning("Could not write camera to cache %s: %s", entryDir, e)
+    return camera
@@ -0,0 +1,163 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Observation metadata of all the detectors of a DECam exposure.
+"""
+
+__all__ = ("DETECTOR_PROPERTIES", "ExposureMetadata", "readExposureMetadata")
+
+import astropy.table
+from astro_metadata_translator import DecamTranslator, ObservationInfo, makeObservationInfo
+
+import lsst.afw.fits
+
+from .hduIndex import getHduIndexCache
+from .metadataCache import fixDetectorHeader
+
+# The ObservationInfo properties that DecamTranslator derives from the
+# detector headers; all the others are the same for every detector.
+DETECTOR_PROPERTIES = ("detector_num", "detector_serial", "detector_unique_name", "detector_group",
+                       "detector_name", "detector_exposure_id")
+
+# Detectors with larger CCDNUMs are guiding and focus sensors.
+MAX_SCIENCE_CCDNUM = 62
+
+
+class ExposureMetadata:
+    """Observation metadata of the detectors in one raw file, stored as the
+    properties common to all of them and one column per detector property.
+
+    Parameters
+    ----------
+    exposureFields : `dict` [`str`, `object`]
+        Values of the properties that are the same for all detectors.
+    columns : `dict` [`str`, `list`]
+        The ``hdu`` of each detector, and the values of each property in
+        ``DETECTOR_PROPERTIES``, in file order.
+    translatorClass : `type`, optional
+        The translator the properties were computed with.
+    """
+
+    def __init__(self, exposureFields, columns, translatorClass=DecamTranslator):
+        self.exposureFields = exposureFields
+        self.columns = columns
+        self.translatorClass = translatorClass
+
+    def __len__(self):
+        return len(self.columns["hdu"])
+
+    def __getitem__(self, index):
+        """Return the full `~astro_metadata_translator.ObservationInfo` of
+        one detector, by position in the file.
+        """
+        detectorFields = {name: self.columns[name][index] for name in DETECTOR_PROPERTIES}
+        return makeObservationInfo(translator_class=self.translatorClass, **self.exposureFields,
+                                   **detectorFields)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def exposure(self):
+        """The properties common to all detectors
+        (`~astro_metadata_translator.ObservationInfo`), with the detector
+        properties unset.
+        """
+        return makeObservationInfo(translator_class=self.translatorClass, **self.exposureFields)
+
+    def toTable(self):
+        """Return the detector properties as a table.
+
+        Returns
+        -------
+        table : `astropy.table.Table`
+            One row per detector, with the properties common to all
+            detectors as table metadata.
+        """
+        return astropy.table.Table(self.columns, meta={"exposure": self.exposureFields})
+
+
+def readExposureMetadata(filename, translatorClass=DecamTranslator):
+    """Compute the observation metadata of every science detector in a raw
+    file.
+
+    The headers are read in one pass over the file, and the full
+    translation is done only for the first detector.  For the other
+    detectors only ``DETECTOR_PROPERTIES`` are translated.  The detector to
+    HDU mapping found is stored in the HDU index (see
+    `~lsst.obs.decam.hduIndex.HduIndexCache`).
+
+    Parameters
+    ----------
+    filename : `str`
+        The raw file.
+    translatorClass : `type`, optional
+        The metadata translator to use.
+
+    Returns
+    -------
+    metadata : `ExposureMetadata`
+        The metadata of each detector.
+
+    Raises
+    ------
+    ValueError
+        Raised if the file has no science detectors.
+    """
+    exposureFields = None
+    columns = {name: [] for name in ("hdu",) + DETECTOR_PROPERTIES}
+    hduIndex = {}
+    fitsData = lsst.afw.fits.Fits(filename, "r")
+    try:
+        # NOTE: The primary header (HDU=0) does not contain detector data.
+        for hdu in range(1, fitsData.countHdus()):
+            fitsData.setHdu(hdu)
+            header = fitsData.readMetadata()
+            ccdnum = header.get("CCDNUM")
+            if ccdnum is None:
+                continue
+            hduIndex.setdefault(ccdnum, hdu)
+            # Guiding and focus sensors can be in the file, but are not
+            # science detectors; they are skipped as
+            # DecamTranslator.determine_translatable_headers skips them.
+            if ccdnum > MAX_SCIENCE_CCDNUM:
+                continue
+            fixDetectorHeader(filename, header)
+
+            if exposureFields is None:
+                info = ObservationInfo(header, translator_class=translatorClass, pedantic=False,
+                                       filename=filename)
+                exposureFields = {name: getattr(info, name) for name in info.all_properties
+                                  if name not in DETECTOR_PROPERTIES}
+                values = {name: getattr(info, name) for name in DETECTOR_PROPERTIES}
+            else:
+                translator = translatorClass(header, filename=filename)
+                values = {name: getattr(translator, f"to_{name}")() for name in DETECTOR_PROPERTIES}
+            columns["hdu"].append(hdu)
+            for name, value in values.items():
+                columns[name].append(value)
+    finally:
+        fitsData.closeFile()
+    getHduIndexCache().put(filename, hduIndex)
+    if exposureFields is None:
+        raise ValueError(f"No science detectors found in {filename}.")
+    return ExposureMetadata(exposureFields, columns, translatorClass=translatorClass)
@@ -0,0 +1,443 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Instrument signature removal with the per-pixel steps fused into one
+pass per amplifier.
+"""
+
+__all__ = ("DecamFastIsrConfig", "DecamFastIsrTask")
+
+import math
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.afw.math as afwMath
+import lsst.pex.config as pexConfig
+import lsst.pipe.base as pipeBase
+from lsst.afw.cameraGeom import ReadoutCorner
+from lsst.ip.isr import IsrTask, IsrTaskConfig, isrFunctions
+
+from .linearize import LookupTableLinearizer
+
+# IsrTask steps the fast path does not do; if any is enabled, the standard
+# ISR is run instead.
+UNSUPPORTED_STEPS = ("doBrighterFatter", "doDark", "doStrayLight", "doApplyGains",
+                     "doIlluminationCorrection", "doVignette", "doAttachTransmissionCurve",
+                     "doDeferredCharge", "doAmpOffset", "doCalculateStatistics", "doBinnedExposures",
+                     "doAssembleIsrExposures", "doCameraSpecificMasking", "doNanInterpAfterFlat",
+                     "doTweakFlat")
+
+# IsrTask steps that are run, as IsrTask runs them, on the output of the
+# fused pass.
+FOLLOW_UP_STEPS = ("doDefect", "doWidenSaturationTrails", "doFringe", "doSetBadRegions", "doInterpolate",
+                   "doSaturationInterpolation", "doMeasureBackground")
+
+
+class DecamFastIsrConfig(IsrTaskConfig):
+    doFastPath = pexConfig.Field(
+        dtype=bool,
+        default=False,
+        doc="Do overscan, saturation and suspect masking, intra-chip crosstalk, bias, variance, "
+            "lookup-table linearization, NaN masking and flat correction in one pass per amplifier, "
+            "then the other enabled ISR steps, when none the fast path does not support are enabled.",
+    )
+    fastPathChunkRows = pexConfig.Field(
+        dtype=int,
+        default=256,
+        doc="Number of rows of each amplifier to process at a time in the fast path.",
+    )
+
+
+def _canonical(array, flips):
+    """Return a view of an amplifier's pixels read out from the lower left
+    corner.
+    """
+    flipX, flipY = flips
+    return array[::-1 if flipY else 1, ::-1 if flipX else 1]
+
+
+class DecamFastIsrTask(IsrTask):
+    """`~lsst.ip.isr.IsrTask` with an opt-in fast path for DECam.
+
+    With ``doFastPath`` set, and none of ``UNSUPPORTED_STEPS`` enabled,
+    overscan subtraction (``MEDIAN_PER_ROW``), saturation and suspect
+    masking, intra-chip crosstalk, assembly, bias subtraction, variance,
+    lookup-table linearization, NaN masking and flat correction (``USER``
+    scaling) are done in a single pass over each block of rows of the two
+    amplifiers, writing straight into the output exposure, instead of each
+    step walking the whole CCD and allocating its own intermediates.  The
+    enabled ``FOLLOW_UP_STEPS`` (defect and edge masking, widening of
+    saturation trails, fringe correction after the flat, bad regions,
+    interpolation with growth of the saturation mask, and background
+    measurement) are then run on the output as `~lsst.ip.isr.IsrTask` runs
+    them; those it runs before the flat only change the mask, so running
+    them after it gives the same result.  The overscan levels and read
+    noise are measured by the same ip_isr and afw code as the standard ISR,
+    so the results match it to floating point rounding.  Otherwise, or if
+    the calibrations are not of a form the fast path handles, the standard
+    ISR is run.
+    """
+    ConfigClass = DecamFastIsrConfig
+    _DefaultName = "isr"
+
+    def _canUseFastPath(self, crosstalk, crosstalkSources, defects):
+        config = self.config
+        if not config.doFastPath or not config.doAssembleCcd:
+            return False
+        enabled = [name for name in UNSUPPORTED_STEPS if getattr(config, name, False)]
+        if config.doFringe and not config.fringeAfterFlat:
+            enabled.append("doFringe before the flat")
+        for name in ("doThumbnailOss", "doThumbnailFlattened"):
+            if getattr(config.qa, name, False):
+                enabled.append(f"qa.{name}")
+        if enabled:
+            self.log.info("Not using the ISR fast path; unsupported steps enabled: %s.", enabled)
+            return False
+        if config.doOverscan and (config.overscan.fitType != "MEDIAN_PER_ROW"
+                                  or getattr(config.overscan, "doParallelOverscan", False)):
+            return False
+        if config.doFlat and config.flatScalingType != "USER":
+            return False
+        if config.doCrosstalk and crosstalk is not None and crosstalk.hasCrosstalk:
+            if not config.doCrosstalkBeforeAssemble or (crosstalk.interChip and crosstalkSources):
+                return False
+        # Let the standard ISR report missing inputs.
+        if config.doDefect and defects is None:
+            return False
+        return True
+
+    def run(self, ccdExposure, *, bias=None, linearizer=None, crosstalk=None, crosstalkSources=None,
+            flat=None, **kwargs):
+        # Docstring inherited.
+        result = None
+        if self._canUseFastPath(crosstalk, crosstalkSources, kwargs.get("defects")):
+            result = self._runFast(ccdExposure, bias=bias, linearizer=linearizer, crosstalk=crosstalk,
+                                   flat=flat, defects=kwargs.get("defects"),
+                                   fringes=kwargs.get("fringes", pipeBase.Struct(fringes=None)))
+        if result is None:
+            return super().run(ccdExposure, bias=bias, linearizer=linearizer, crosstalk=crosstalk,
+                               crosstalkSources=crosstalkSources, flat=flat, **kwargs)
+        return result
+
+    def _runFast(self, ccdExposure, bias, linearizer, crosstalk, flat, defects, fringes):
+        """Run the fused pass and the follow-up steps, or return `None` if
+        the standard ISR must be run instead.
+        """
+        config = self.config
+        lookupTable = None
+        if config.doLinearize and linearizer is not None and linearizer.hasLinearity:
+            try:
+                lookupTable = LookupTableLinearizer(linearizer, ccdExposure.getDetector())
+            except ValueError as e:
+                self.log.info("Not using the ISR fast path: %s", e)
+                return None
+        exposure = self.runFastPath(ccdExposure, bias=bias if config.doBias else None,
+                                    linearizer=lookupTable,
+                                    crosstalk=crosstalk if config.doCrosstalk else None,
+                                    flat=flat if config.doFlat else None)
+        if exposure is None:
+            self.log.info("Not using the ISR fast path: an amplifier is entirely saturated or suspect.")
+            return None
+        preInterpExposure = self.runFollowUp(exposure, defects=defects, fringes=fringes)
+        return pipeBase.Struct(exposure=exposure, outputExposure=exposure,
+                               preInterpExposure=preInterpExposure,
+                               outputOssThumbnail=None, outputFlattenedThumbnail=None,
+                               ossThumb=None, flattenedThumb=None, outputStatistics=None)
+
+    def _fitOverscanRows(self, overscan):
+        """Return the level of each row of an amplifier's serial overscan,
+        fit by the ``overscan`` subtask as the standard ISR fits it.
+
+        Parameters
+        ----------
+        overscan : `numpy.ndarray`
+            The overscan pixels of the rows of the amplifier's data.
+
+        Returns
+        -------
+        levels : `numpy.ndarray`
+            The level of each row.
+        """
+        image = lsst.afw.image.ImageF(np.ascontiguousarray(overscan, dtype=np.float32))
+        return np.asarray(self.overscan.fitOverscan(image, isTransposed=False).overscanValue,
+                          dtype=np.float64)
+
+    def runFastPath(self, ccdExposure, bias=None, linearizer=None, crosstalk=None, flat=None):
+        """Remove the instrument signature from a raw DECam exposure in one
+        pass per amplifier.
+
+        Parameters
+        ----------
+        ccdExposure : `lsst.afw.image.Exposure`
+            The untrimmed raw exposure.
+        bias, flat : `lsst.afw.image.Exposure`, optional
+            The assembled bias and flat; not applied if `None`.
+        linearizer : `lsst.obs.decam.linearize.LookupTableLinearizer`, \
+                optional
+            The lookup-table linearization of the detector; not applied if
+            `None`.
+        crosstalk : `lsst.ip.isr.CrosstalkCalib`, optional
+            The crosstalk calibration; only the intra-chip coefficients are
+            applied.
+
+        Returns
+        -------
+        exposure : `lsst.afw.image.ExposureF` or `None`
+            The trimmed, assembled and corrected exposure, or `None` if an
+            amplifier is entirely saturated or suspect, which the standard
+            ISR masks as bad and does not correct for overscan.
+
+        Raises
+        ------
+        ValueError
+            Raised if a calibration does not cover the trimmed detector.
+        """
+        config = self.config
+        detector = ccdExposure.getDetector()
+        output = lsst.afw.image.ExposureF(detector.getBBox())
+        output.setInfo(lsst.afw.image.ExposureInfo(ccdExposure.getInfo(), True))
+        metadata = output.getMetadata()
+        for key in config.assembleCcd.keysToRemove:
+            if key in metadata:
+                metadata.remove(key)
+        for calib, name in ((bias, "bias"), (flat, "flat")):
+            if calib is not None and calib.getBBox() != output.getBBox():
+                raise ValueError(f"The {name} bounding box {calib.getBBox()} does not match the trimmed "
+                                 f"detector bounding box {output.getBBox()}.")
+
+        rawOrigin = ccdExposure.getXY0()
+        outOrigin = output.getXY0()
+
+        def view(array, box, origin):
+            return array[box.getMinY() - origin.getY():box.getMaxY() + 1 - origin.getY(),
+                         box.getMinX() - origin.getX():box.getMaxX() + 1 - origin.getX()]
+
+        mask = output.mask
+        satBit = mask.getPlaneBitMask(config.saturatedMaskName) if config.doSaturation else 0
+        suspectBit = mask.getPlaneBitMask(config.suspectMaskName) if config.doSuspect else 0
+        # The planes IsrTask checks for amplifiers that are entirely masked.
+        badAmpBits = mask.getPlaneBitMask([config.saturatedMaskName, config.suspectMaskName])
+        negativeVarianceBit = 0
+        if config.doVariance and getattr(config, "maskNegativeVariance", False):
+            negativeVarianceBit = mask.getPlaneBitMask(config.negativeVarianceMaskName)
+        nanBit = 0
+        if config.doNanMasking:
+            mask.addMaskPlane("UNMASKEDNAN")
+            nanBit = mask.getPlaneBitMask("UNMASKEDNAN")
+
+        amps = []
+        for ampIndex, amp in enumerate(detector):
+            box = amp.getBBox()
+            rawFlips = (amp.getRawFlipX(), amp.getRawFlipY())
+            corner = amp.getReadoutCorner()
+            flips = (corner in (ReadoutCorner.LR, ReadoutCorner.UR),
+                     corner in (ReadoutCorner.UL, ReadoutCorner.UR))
+            rawDataBox = amp.getRawDataBBox()
+
+            def rawView(array):
+                return _canonical(_canonical(view(array, rawDataBox, rawOrigin), rawFlips), flips)
+
+            levels = np.zeros(rawDataBox.getHeight())
+            readNoise = amp.getReadNoise() if config.readNoise <= 0 else config.readNoise
+            if config.doOverscan:
+                overscanBox = amp.getRawHorizontalOverscanBBox()
+                overscan = view(ccdExposure.image.array, overscanBox, rawOrigin)
+                overscan = overscan[rawDataBox.getMinY() - overscanBox.getMinY():
+                                    rawDataBox.getMaxY() + 1 - overscanBox.getMinY()]
+                levels = self._fitOverscanRows(overscan)
+                if config.doEmpiricalReadNoise:
+                    # As IsrTask measures it from the overscan residuals.
+                    residuals = lsst.afw.image.ImageF((overscan - levels[:, np.newaxis]).astype(np.float32))
+                    readNoise = afwMath.makeStatistics(residuals, afwMath.STDEVCLIP,
+                                                       afwMath.StatisticsControl()).getValue()
+                # The levels are per raw row; put them in readout order.
+                if rawFlips[1] != flips[1]:
+                    levels = levels[::-1]
+
+            # The thresholds IsrTask masks the raw pixels with; NaN levels
+            # mask nothing.
+            thresholds = []
+            if satBit:
+                saturation = config.saturation if math.isfinite(config.saturation) else amp.getSaturation()
+                thresholds.append((saturation, satBit))
+            if suspectBit:
+                thresholds.append((amp.getSuspectLevel(), suspectBit))
+            gain = config.gain if math.isfinite(config.gain) else amp.getGain()
+
+            offsetY = box.getMinY() - outOrigin.getY()
+            amps.append(dict(
+                index=ampIndex,
+                raw=rawView(ccdExposure.image.array),
+                rawMask=rawView(ccdExposure.mask.array),
+                levels=levels.astype(np.float32),
+                image=_canonical(view(output.image.array, box, outOrigin), flips),
+                mask=_canonical(view(mask.array, box, outOrigin), flips),
+                variance=_canonical(view(output.variance.array, box, outOrigin), flips),
+                bias=None if bias is None else _canonical(view(bias.image.array, box, outOrigin), flips),
+                biasMask=None if bias is None else _canonical(view(bias.mask.array, box, outOrigin), flips),
+                flat=None if flat is None else _canonical(view(flat.image.array, box, outOrigin), flips),
+                flatMask=None if flat is None else _canonical(view(flat.mask.array, box, outOrigin), flips),
+                flatVariance=(None if flat is None
+                              else _canonical(view(flat.variance.array, box, outOrigin), flips)),
+                thresholds=[(level, bit) for level, bit in thresholds if not math.isnan(level)],
+                gain=gain,
+                readNoise=readNoise,
+                # The rows of the output image the readout-order rows
+                # start:stop of the amplifier are in.
+                outputRows=((lambda start, stop, height=box.getHeight(), offsetY=offsetY:
+                             slice(offsetY + height - min(stop, height), offsetY + height - start))
+                            if flips[1] else
+                            (lambda start, stop, height=box.getHeight(), offsetY=offsetY:
+                             slice(offsetY + start, offsetY + min(stop, height)))),
+                outputColumns=slice(box.getMinX() - outOrigin.getX(), box.getMaxX() + 1 - outOrigin.getX()),
+                badAmp=True,
+            ))
+
+        coeffs = None
+        crosstalkBit = 0
+        if crosstalk is not None and crosstalk.hasCrosstalk:
+            coeffs = np.asarray(crosstalk.coeffs, dtype=np.float32)
+            if len({amp["raw"].shape for amp in amps}) != 1:
+                raise ValueError("Cannot correct crosstalk between amplifiers of different shapes.")
+            mask.addMaskPlane(config.crosstalk.crosstalkMaskPlane)
+            crosstalkBit = mask.getPlaneBitMask(config.crosstalk.crosstalkMaskPlane)
+            minPixelToMask = config.crosstalk.minPixelToMask
+        flatScale = np.float32(config.flatUserScale)
+        numNans = 0
+
+        nRows = max(amp["raw"].shape[0] for amp in amps)
+        for start in range(0, nRows, config.fastPathChunkRows):
+            stop = start + config.fastPathChunkRows
+            rows = slice(start, stop)
+            for amp in amps:
+                image = amp["image"][rows]
+                ampMask = amp["mask"][rows]
+                raw = amp["raw"][rows]
+                np.copyto(ampMask, amp["rawMask"][rows])
+                for level, bit in amp["thresholds"]:
+                    ampMask[raw >= level] |= bit
+                amp["badAmp"] = amp["badAmp"] and bool(np.all(ampMask & badAmpBits))
+                np.subtract(raw, amp["levels"][rows, np.newaxis], out=image, casting="unsafe")
+
+            if coeffs is not None:
+                # All the corrections use the pixels before any crosstalk
+                # correction.  As in CrosstalkCalib.subtractCrosstalk, the
+                # pixels corrected for crosstalk from a bright pixel are
+                # masked, but the bright pixels themselves are not.
+                sources = [amp["image"][rows].copy() for amp in amps]
+                for amp in amps:
+                    amp["mask"][rows] &= ~crosstalkBit
+                for source, sourceData in zip(amps, sources):
+                    bright = None
+                    for target in amps:
+                        coeff = coeffs[source["index"], target["index"]]
+                        if coeff != 0.0:
+                            target["image"][rows] -= coeff*sourceData
+                            if bright is None:
+                                bright = sourceData >= minPixelToMask
+                            target["mask"][rows][bright] |= crosstalkBit
+
+            for amp in amps:
+                image = amp["image"][rows]
+                ampMask = amp["mask"][rows]
+                variance = amp["variance"][rows]
+                if amp["bias"] is not None:
+                    image -= amp["bias"][rows]
+                    ampMask |= amp["biasMask"][rows]
+                if config.doVariance:
+                    np.divide(image, amp["gain"], out=variance)
+                    variance += np.float32(amp["readNoise"]**2)
+                    if negativeVarianceBit:
+                        ampMask[variance <= 0.0] |= negativeVarianceBit
+                if linearizer is not None:
+                    linearizer.applyRegion(output.image.array, amp["outputRows"](start, stop),
+                                           amp["outputColumns"])
+                if nanBit:
+                    nans = ~np.isfinite(image)
+                    ampMask[nans] |= nanBit
+                    numNans += int(np.count_nonzero(nans))
+                if amp["flat"] is not None:
+                    flatData = amp["flat"][rows]/flatScale
+                    image /= flatData
+                    ampMask |= amp["flatMask"][rows]
+                    if config.doVariance:
+                        variance += image*image*(amp["flatVariance"][rows]/(flatScale*flatScale))
+                        variance /= flatData*flatData
+
+        if any(amp["badAmp"] for amp in amps):
+            return None
+        if nanBit:
+            self.metadata["NUMNANS"] = numNans
+            if numNans > 0:
+                self.log.warning("There were %d unmasked NaNs.", numNans)
+        return output
+
+    def runFollowUp(self, exposure, defects=None, fringes=pipeBase.Struct(fringes=None)):
+        """Run the enabled ``FOLLOW_UP_STEPS`` on the output of the fused
+        pass, in place, as `~lsst.ip.isr.IsrTask.run` runs them.
+
+        Parameters
+        ----------
+        exposure : `lsst.afw.image.Exposure`
+            The output of `runFastPath`.
+        defects : `lsst.ip.isr.Defects`, optional
+            The defects to mask, if ``doDefect``.
+        fringes : `lsst.pipe.base.Struct`, optional
+            The fringe data, if ``doFringe``.
+
+        Returns
+        -------
+        preInterpExposure : `lsst.afw.image.Exposure` or `None`
+            A copy of the exposure before bad regions are set and pixels
+            are interpolated, if ``doSaveInterpPixels``.
+        """
+        config = self.config
+        if config.doDefect:
+            self.log.info("Masking defects.")
+            self.maskDefect(exposure, defects)
+            if config.numEdgeSuspect > 0:
+                self.log.info("Masking edges as SUSPECT.")
+                self.maskEdges(exposure, numEdgePixels=config.numEdgeSuspect, maskPlane="SUSPECT",
+                               level=config.edgeMaskLevel)
+        if config.doWidenSaturationTrails:
+            self.log.info("Widening saturation trails.")
+            isrFunctions.widenSaturationTrails(exposure.getMaskedImage().getMask())
+        if config.doFringe and config.fringeAfterFlat:
+            self.log.info("Applying fringe correction after flat.")
+            self.fringe.run(exposure, **fringes.getDict())
+
+        preInterpExposure = exposure.clone() if config.doSaveInterpPixels else None
+        if config.doSetBadRegions:
+            badPixelCount, badPixelValue = isrFunctions.setBadRegions(exposure)
+            self.log.info("Set %d BAD pixels to %f.", badPixelCount, badPixelValue)
+        if config.doInterpolate:
+            self.log.info("Interpolating masked pixels.")
+            isrFunctions.interpolateFromMask(
+                maskedImage=exposure.getMaskedImage(),
+                fwhm=config.fwhm,
+                growSaturatedFootprints=config.growSaturationFootprintSize,
+                maskNameList=list(config.maskListToInterpolate),
+            )
+        if config.doMeasureBackground:
+            self.log.info("Measuring background level.")
+            self.measureBackground(exposure, config.qa)
+        return preInterpExposure
@@ -0,0 +1,69 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Utilities for writing files shared between processes.
+"""
+
+__all__ = ("writeAtomic",)
+
+import os
+import tempfile
+
+
+def _getUmask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# The umask can only be read by setting it, which is not safe while other
+# threads may be creating files, so it is read once, on import.
+_UMASK = _getUmask()
+
+
+def writeAtomic(filename, write):
+    """Write a file via a temporary file in the same directory, so that
+    readers never see a partial file.
+
+    The file is given the permissions a newly created file would have
+    (``0o666`` less the umask of the process when this module was
+    imported), not the owner-only permissions of
+    the temporary file.
+
+    Parameters
+    ----------
+    filename : `str`
+        The file to write; replaced if it exists.
+    write : `~collections.abc.Callable` [[`str`], `None`]
+        Function that writes the contents of the file to the path it is
+        given.
+    """
+    directory = os.path.dirname(filename)
+    fd, tempName = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(filename))
+    os.close(fd)
+    try:
+        write(tempName)
+        os.chmod(tempName, 0o666 & ~_UMASK)
+        os.replace(tempName, filename)
+    except BaseException:
+        if os.path.exists(tempName):
+            os.remove(tempName)
+        raise
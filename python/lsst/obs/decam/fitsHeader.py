@@ -0,0 +1,263 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Conversion of FITS header bytes to `~lsst.daf.base.PropertyList`, without
+opening the file with cfitsio.
+
+The conversion follows `lsst.afw.fits.readMetadata` (without ``strip``):
+each card is split into keyword, value and comment as cfitsio does, the
+value is typed as afw does, and extension headers with ``INHERIT = T`` are
+merged with the primary header as afw does.  Constructs whose handling is
+not reproduced exactly (long-string ``CONTINUE`` cards, ``HIERARCH``
+keywords, quotes within strings, non-finite strings, complex values and
+repeated undefined values) raise `UnsupportedHeaderError`, so that callers
+can fall back to afw.  So do extensions that are not images, which include
+tile-compressed images: cfitsio presents their binary-table headers to afw
+as image headers, and that conversion is not reproduced.
+"""
+
+__all__ = ("UnsupportedHeaderError", "parseHeader", "parseExtensionHeader", "isHeaderParseEnabled")
+
+import os
+import re
+
+from lsst.daf.base import PropertyList
+
+CARD_SIZE = 80
+
+# Environment variable that enables parsing raw headers from their bytes.
+HEADER_PARSE_ENV = "OBS_DECAM_PARSE_HEADERS"
+
+# The value formats recognized by afw, in the order it tries them.
+_BOOL = re.compile(r"[tTfF]")
+_INT = re.compile(r"[+-]?[0-9]+")
+_DOUBLE = re.compile(r"[+-]?([0-9]*\.?[0-9]+|[0-9]+\.?[0-9]*)([eE][+-]?[0-9]+)?")
+_STRING = re.compile(r"'(.*?) *'")
+
+# Keywords that never have a value.
+_NO_VALUE_KEYWORDS = ("COMMENT", "HISTORY", "CONTINUE", "")
+
+# afw reads these strings as non-finite doubles.
+_NON_FINITE_STRINGS = ("nan", "inf", "+inf", "-inf")
+
+
+class UnsupportedHeaderError(ValueError):
+    """Raised if a header uses a construct that is not converted exactly as
+    afw would convert it.
+    """
+
+
+def _splitCard(card):
+    """Split a header card into keyword, value and comment, as cfitsio's
+    ``fits_read_keyn`` does.
+
+    The value is the text of the value, including the quotes of a string,
+    and is empty if the card has no value.
+    """
+    card = card.rstrip(" ")
+    keyword = card[:8].rstrip(" ")
+    if keyword == "HIERARCH":
+        raise UnsupportedHeaderError(f"HIERARCH card: {card!r}")
+    if keyword in _NO_VALUE_KEYWORDS or card[8:10] != "= ":
+        return keyword, "", card[8:]
+
+    start = len(card) - len(card[10:].lstrip(" "))
+    if start == len(card):
+        # An undefined value.
+        return keyword, "", ""
+    if card[start] == "/":
+        value = ""
+        end = start + 1
+    elif card[start] == "'":
+        end = start + 1
+        while True:
+            end = card.find("'", end)
+            if end == -1:
+                raise ValueError(f"Missing closing quote in card {card!r}.")
+            if card[end + 1:end + 2] != "'":
+                break
+            end += 2
+        end += 1
+        value = card[start:end]
+    elif card[start] == "(":
+        raise UnsupportedHeaderError(f"Complex value in card {card!r}.")
+    else:
+        end = start
+        while end < len(card) and card[end] not in " /":
+            end += 1
+        value = card[start:end]
+
+    comment = card[end:].lstrip(" ")
+    if comment.startswith("/"):
+        comment = comment[2:] if comment[1:2] == " " else comment[1:]
+    return keyword, value, comment
+
+
+def _appendKey(metadata, key, value, comment):
+    if metadata.exists(key):
+        if value is None:
+            raise UnsupportedHeaderError(f"Repeated undefined value of {key}.")
+        metadata.add(key, value)
+    else:
+        metadata.set(key, value, comment)
+
+
+def _setKey(metadata, key, value, comment):
+    """Set a value with the type afw would give it.
+    """
+    if isinstance(value, bool):
+        metadata.setBool(key, value, comment)
+    elif isinstance(value, int):
+        if -(1 << 31) < value < (1 << 31):
+            metadata.setInt(key, value, comment)
+        else:
+            metadata.setLongLong(key, value, comment)
+    elif isinstance(value, float):
+        metadata.setDouble(key, value, comment)
+    else:
+        metadata.setString(key, value, comment)
+
+
+def parseHeader(header):
+    """Convert the bytes of one FITS header to a
+    `~lsst.daf.base.PropertyList`, as
+    `lsst.afw.fits.Fits.readMetadata` does.
+
+    Parameters
+    ----------
+    header : `bytes`
+        The header blocks of one HDU.
+
+    Returns
+    -------
+    metadata : `lsst.daf.base.PropertyList`
+        The header.
+
+    Raises
+    ------
+    UnsupportedHeaderError
+        Raised if the header uses a construct that is not converted as afw
+        would convert it.
+    ValueError
+        Raised if the header is malformed.
+    """
+    metadata = PropertyList()
+    text = header.decode("ascii")
+    for start in range(0, len(text), CARD_SIZE):
+        key, value, comment = _splitCard(text[start:start + CARD_SIZE])
+        if key == "END":
+            return metadata
+        if value.endswith("&'"):
+            raise UnsupportedHeaderError(f"Long-string value of {key}.")
+        if _BOOL.fullmatch(value):
+            _setKey(metadata, key, value in ("T", "t"), comment)
+        elif _INT.fullmatch(value):
+            _setKey(metadata, key, int(value), comment)
+        elif _DOUBLE.fullmatch(value):
+            _setKey(metadata, key, float(value), comment)
+        elif (match := _STRING.fullmatch(value)) is not None:
+            string = match.group(1)
+            if "''" in string or string.lower() in _NON_FINITE_STRINGS:
+                raise UnsupportedHeaderError(f"String value of {key} needs unescaping: {value}")
+            _setKey(metadata, key, string, comment)
+        elif key in ("HISTORY", "COMMENT"):
+            _appendKey(metadata, key, comment, "")
+        elif not key and not value:
+            # Blank keywords are stored as comments.
+            _appendKey(metadata, "COMMENT", comment, "")
+        elif not value:
+            _appendKey(metadata, key, None, comment)
+        else:
+            raise ValueError(f"Could not parse header value for key {key!r}: {value!r}")
+    raise ValueError("Header has no END card.")
+
+
+def _combine(first, second):
+    """Combine two headers as ``lsst.afw.fits.combineMetadata`` does: the
+    comments of both are kept, and the other values of ``second`` replace
+    those of ``first``.
+    """
+    combined = PropertyList()
+    for metadata in (first, second):
+        for name in metadata.getOrderedNames():
+            if name in ("COMMENT", "HISTORY"):
+                values = metadata.getArray(name)
+                if all(isinstance(value, str) for value in values):
+                    combined.add(name, values)
+            else:
+                combined.copy(name, metadata, name, True)
+    return combined
+
+
+def parseExtensionHeader(header, primary):
+    """Convert the bytes of an extension header to a
+    `~lsst.daf.base.PropertyList`, as `lsst.afw.fits.readMetadata` does,
+    including merging in the primary header if ``INHERIT`` is true.
+
+    Parameters
+    ----------
+    header : `bytes`
+        The header blocks of the extension.
+    primary : `lsst.daf.base.PropertyList`
+        The primary header of the file, from `parseHeader`; not modified.
+
+    Returns
+    -------
+    metadata : `lsst.daf.base.PropertyList`
+        The header.
+
+    Raises
+    ------
+    UnsupportedHeaderError
+        Raised if the extension is not an image, or the header uses a
+        construct that is not converted as afw would convert it.
+    ValueError
+        Raised if the header is malformed.
+    """
+    # XTENSION is always the first card, so other extensions are rejected
+    # without parsing the rest of their header.
+    keyword, value, _ = _splitCard(header[:CARD_SIZE].decode("ascii"))
+    match = _STRING.fullmatch(value)
+    if keyword != "XTENSION" or match is None or match.group(1) != "IMAGE":
+        raise UnsupportedHeaderError(f"Not an image extension: {keyword} = {value}")
+    metadata = parseHeader(header)
+    if not metadata.exists("INHERIT"):
+        return metadata
+    inherit = metadata.getScalar("INHERIT")
+    if isinstance(inherit, str):
+        inherit = inherit == "T"
+    if inherit:
+        return _combine(primary, metadata)
+    return _combine(metadata, PropertyList())
+
+
+def isHeaderParseEnabled():
+    """Return whether raw headers should be parsed from their bytes.
+
+    This is enabled by setting the ``OBS_DECAM_PARSE_HEADERS`` environment
+    variable to anything other than ``0``.
+
+    Returns
+    -------
+    enabled : `bool`
+        Whether header parsing is enabled.
+    """
+    return os.environ.get(HEADER_PARSE_ENV, "0") not in ("", "0")
@@ -0,0 +1,256 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Intra- and inter-chip crosstalk correction of a whole DECam exposure.
+"""
+
+__all__ = ("FocalPlaneCrosstalk", "correctRawFile")
+
+import logging
+
+import numpy as np
+
+import lsst.afw.image
+from lsst.afw.cameraGeom import ReadoutCorner
+
+from .rawReader import DarkEnergyCameraRawReader
+
+_LOG = logging.getLogger(__name__)
+
+
+class FocalPlaneCrosstalk:
+    """Crosstalk correction of all the amplifiers of the focal plane at
+    once.
+
+    The coefficients are held as a sparse matrix from source amplifiers to
+    target amplifiers, over all the amplifiers of the camera, so that
+    crosstalk between detectors is corrected in the same pass as crosstalk
+    within them.  As in `lsst.ip.isr.CrosstalkCalib.subtractCrosstalk`, the
+    raw data of each source amplifier, flipped to the readout orientation of
+    the target amplifier, is scaled by the coefficient and subtracted from
+    the target; only the linear term is applied, and no pixels are masked.
+
+    Parameters
+    ----------
+    camera : `lsst.afw.cameraGeom.Camera`
+        The camera geometry.
+    terms : iterable [`tuple`]
+        The non-zero coefficients, as ``(sourceDetector, sourceAmp,
+        targetDetector, targetAmp, coeff)``, where the detectors are ids
+        and the amps are indices in the detector.
+
+    Raises
+    ------
+    ValueError
+        Raised if the amplifiers with crosstalk do not all have raw data of
+        the same shape.
+    """
+
+    def __init__(self, camera, terms):
+        # Each amplifier is a "slot", with its raw data bounding box and
+        # whether it has to be flipped to be read out from its lower left
+        # corner.
+        self._slots = {}
+        self._boxes = []
+        self._flips = []
+        for detector in camera:
+            for ampIndex, amp in enumerate(detector):
+                self._slots[(detector.getId(), ampIndex)] = len(self._boxes)
+                self._boxes.append(amp.getRawDataBBox())
+                corner = amp.getReadoutCorner()
+                self._flips.append((corner in (ReadoutCorner.LR, ReadoutCorner.UR),
+                                    corner in (ReadoutCorner.UL, ReadoutCorner.UR)))
+        sources = []
+        targets = []
+        coeffs = []
+        for sourceDetector, sourceAmp, targetDetector, targetAmp, coeff in terms:
+            if coeff == 0.0:
+                continue
+            sources.append(self._slots[(sourceDetector, sourceAmp)])
+            targets.append(self._slots[(targetDetector, targetAmp)])
+            coeffs.append(coeff)
+        # Sorted by target, so that the contributions to each target can be
+        # summed with a single reduceat.
+        order = np.lexsort((sources, targets))
+        self._sources = np.array(sources, dtype=np.int64)[order]
+        self._targets = np.array(targets, dtype=np.int64)[order]
+        self._coeffs = np.array(coeffs, dtype=np.float64)[order]
+        shapes = {(self._boxes[slot].getHeight(), self._boxes[slot].getWidth())
+                  for slot in set(sources) | set(targets)}
+        if len(shapes) > 1:
+            raise ValueError(f"Amplifiers with crosstalk have raw data of different shapes: {sorted(shapes)}")
+        self.ampShape = shapes.pop() if shapes else None
+        self._detectorOfSlot = np.empty(len(self._boxes), dtype=np.int64)
+        for (detectorId, _), slot in self._slots.items():
+            self._detectorOfSlot[slot] = detectorId
+
+    @classmethod
+    def fromCrosstalkCalibs(cls, camera, calibs):
+        """Build the correction from per-detector crosstalk calibrations.
+
+        Parameters
+        ----------
+        camera : `lsst.afw.cameraGeom.Camera`
+            The camera geometry.
+        calibs : `dict` [`int`, `lsst.ip.isr.CrosstalkCalib`]
+            The crosstalk calibration of each detector, by detector id,
+            with ``coeffs`` and each entry of ``interChip`` (keyed by source
+            detector name) indexed by ``[source amp, target amp]``, as used
+            by `lsst.ip.isr.CrosstalkCalib.subtractCrosstalk`.
+
+        Returns
+        -------
+        crosstalk : `FocalPlaneCrosstalk`
+            The correction.
+        """
+        terms = []
+        for targetDetector, calib in calibs.items():
+            if not calib.hasCrosstalk:
+                continue
+            matrices = [(targetDetector, calib.coeffs)]
+            for sourceName, coeffs in (calib.interChip or {}).items():
+                if sourceName not in camera:
+                    _LOG.debug("Ignoring crosstalk from unknown detector %s.", sourceName)
+                    continue
+                matrices.append((camera[sourceName].getId(), coeffs))
+            for sourceDetector, coeffs in matrices:
+                coeffs = np.asarray(coeffs)
+                for sourceAmp, targetAmp in zip(*np.nonzero(coeffs)):
+                    terms.append((sourceDetector, int(sourceAmp), targetDetector, int(targetAmp),
+                                  float(coeffs[sourceAmp, targetAmp])))
+        return cls(camera, terms)
+
+    def __len__(self):
+        return len(self._coeffs)
+
+    def getSources(self, detectors):
+        """Return the detectors whose pixels are needed to correct some
+        detectors.
+
+        Parameters
+        ----------
+        detectors : iterable [`int`]
+            Ids of the detectors to correct.
+
+        Returns
+        -------
+        sources : `set` [`int`]
+            Ids of the detectors to correct, and of the detectors that
+            crosstalk onto them.
+        """
+        detectors = set(detectors)
+        isTarget = np.isin(self._detectorOfSlot[self._targets], list(detectors))
+        return detectors | set(self._detectorOfSlot[self._sources[isTarget]].tolist())
+
+    def _ampView(self, arrays, slot):
+        """Return the raw data of an amplifier, flipped so that it is read
+        out from its lower left corner.
+        """
+        box = self._boxes[slot]
+        view = arrays[self._detectorOfSlot[slot]][box.getMinY():box.getMaxY() + 1,
+                                                  box.getMinX():box.getMaxX() + 1]
+        flipX, flipY = self._flips[slot]
+        return view[::-1 if flipY else 1, ::-1 if flipX else 1]
+
+    def apply(self, images, chunkRows=32):
+        """Correct the crosstalk in the images of an exposure, in place.
+
+        Parameters
+        ----------
+        images : `dict` [`int`, `lsst.afw.image.Image` or `numpy.ndarray`]
+            The untrimmed, floating-point images to correct, by detector id.
+            Terms whose source or target detector is missing are skipped.
+        chunkRows : `int`, optional
+            Number of rows of all the amplifiers to correct at a time;
+            bounds the memory used for the sources and corrections.
+
+        Raises
+        ------
+        TypeError
+            Raised if an image is not floating point.
+        """
+        arrays = {detectorId: getattr(image, "array", image) for detectorId, image in images.items()}
+        for detectorId, array in arrays.items():
+            if not np.issubdtype(array.dtype, np.floating):
+                raise TypeError(f"Cannot correct crosstalk in place in the {array.dtype} image of "
+                                f"detector {detectorId}.")
+        present = np.isin(self._detectorOfSlot, list(arrays))
+        use = present[self._sources] & present[self._targets]
+        if not np.all(use):
+            _LOG.debug("Skipping %d crosstalk terms with missing detectors.", np.count_nonzero(~use))
+        sources, targets, coeffs = self._sources[use], self._targets[use], self._coeffs[use]
+        if len(coeffs) == 0:
+            return
+
+        sourceSlots, sourceIndex = np.unique(sources, return_inverse=True)
+        targetSlots, starts = np.unique(targets, return_index=True)
+        sourceViews = [self._ampView(arrays, slot) for slot in sourceSlots]
+        targetViews = [self._ampView(arrays, slot) for slot in targetSlots]
+        dtype = np.result_type(*(view.dtype for view in sourceViews))
+        weights = coeffs.astype(dtype)[:, np.newaxis, np.newaxis]
+
+        nRows, nCols = self.ampShape
+        for start in range(0, nRows, chunkRows):
+            rows = slice(start, min(start + chunkRows, nRows))
+            # Copy the sources before any target is corrected, so that
+            # every correction uses the uncorrected source pixels.
+            sourceData = np.stack([view[rows] for view in sourceViews])
+            corrections = np.add.reduceat(sourceData[sourceIndex]*weights, starts, axis=0)
+            for view, correction in zip(targetViews, corrections):
+                view[rows] -= correction
+
+
+def correctRawFile(filename, crosstalk, detectors=None):
+    """Read detectors of a raw file and correct their crosstalk, including
+    that from the other detectors in the file.
+
+    Parameters
+    ----------
+    filename : `str`
+        The raw file.
+    crosstalk : `FocalPlaneCrosstalk`
+        The crosstalk correction.
+    detectors : iterable [`int`], optional
+        Ids of the detectors to return; all the detectors in the file if
+        not given.  The detectors that crosstalk onto them are also read.
+
+    Returns
+    -------
+    images : `dict` [`int`, `tuple`]
+        The fixed-up header (`lsst.daf.base.PropertyList`) and corrected
+        image (`lsst.afw.image.ImageF`) of each detector, by id.
+
+    Raises
+    ------
+    ValueError
+        Raised if a requested detector, or one that crosstalks onto it, is
+        not in the file.
+    """
+    wanted = None if detectors is None else set(detectors)
+    toRead = None if wanted is None else crosstalk.getSources(wanted)
+    reader = DarkEnergyCameraRawReader(filename)
+    results = {}
+    for detectorId, metadata, image in reader.readDetectors(toRead):
+        results[detectorId] = (metadata, lsst.afw.image.ImageF(image, deep=True))
+    crosstalk.apply({detectorId: image for detectorId, (_, image) in results.items()})
+    if wanted is not None:
+        results = {detectorId: results[detectorId] for detectorId in wanted}
+    return results
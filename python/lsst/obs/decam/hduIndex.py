@@ -0,0 +1,191 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Persistent detector to HDU index for DECam multi-extension FITS files.
+"""
+
+__all__ = ("HduIndexCache", "getHduIndexCache")
+
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+_LOG = logging.getLogger(__name__)
+
+# Environment variable naming an SQLite file in which to persist the index.
+HDU_INDEX_ENV = "OBS_DECAM_HDU_INDEX"
+
+
+class HduIndexCache:
+    """Cache of the detector to HDU mapping of DECam raw files.
+
+    Entries are keyed on the absolute path of the file and are only
+    returned while the size and modification time of the file match those
+    recorded when the entry was stored, so a file that is rewritten in
+    place is rescanned.
+
+    Parameters
+    ----------
+    path : `str`, optional
+        SQLite database in which to persist the index across processes.
+        If `None`, the index is only kept in memory.
+    maxSize : `int`, optional
+        Maximum number of files to hold in the in-memory layer.
+    """
+
+    def __init__(self, path=None, maxSize=1024):
+        self.path = path
+        self.maxSize = maxSize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            try:
+                with self._connect() as connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS hdu_index "
+                        "(uri TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hdus TEXT)"
+                    )
+            except sqlite3.Error as e:
+                _LOG.warning("Could not open HDU index %s; only caching in memory: %s", path, e)
+                self.path = None
+
+    @contextlib.contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _fileKey(filename):
+        """Return the path, size and modification time of a file.
+        """
+        uri = os.path.abspath(filename)
+        stat = os.stat(uri)
+        return uri, stat.st_size, stat.st_mtime_ns
+
+    def get(self, filename):
+        """Return the detector to HDU mapping of a file.
+
+        Parameters
+        ----------
+        filename : `str`
+            File to look up.
+
+        Returns
+        -------
+        index : `dict` [`int`, `int`] or `None`
+            Mapping of detector id (``CCDNUM``) to HDU index, or `None` if
+            the file has not been indexed or has changed since it was.
+        """
+        uri, size, mtime = self._fileKey(filename)
+        with self._lock:
+            entry = self._memory.get(uri)
+            if entry is not None:
+                if entry[:2] == (size, mtime):
+                    self._memory.move_to_end(uri)
+                    return entry[2]
+                del self._memory[uri]
+
+        if self.path is None:
+            return None
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT size, mtime_ns, hdus FROM hdu_index WHERE uri = ?", (uri,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            _LOG.warning("Could not read HDU index %s: %s", self.path, e)
+            return None
+        if row is None or tuple(row[:2]) != (size, mtime):
+            return None
+        index = {int(detector): hdu for detector, hdu in json.loads(row[2]).items()}
+        self._remember(uri, size, mtime, index)
+        return index
+
+    def put(self, filename, index):
+        """Store the detector to HDU mapping of a file.
+
+        Parameters
+        ----------
+        filename : `str`
+            File that was indexed.
+        index : `dict` [`int`, `int`]
+            Mapping of detector id (``CCDNUM``) to HDU index.
+        """
+        uri, size, mtime = self._fileKey(filename)
+        index = dict(index)
+        self._remember(uri, size, mtime, index)
+        if self.path is None:
+            return
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO hdu_index (uri, size, mtime_ns, hdus) VALUES (?, ?, ?, ?)",
+                    (uri, size, mtime, json.dumps(index)),
+                )
+        except sqlite3.Error as e:
+            _LOG.warning("Could not write HDU index %s: %s", self.path, e)
+
+    def _remember(self, uri, size, mtime, index):
+        with self._lock:
+            self._memory[uri] = (size, mtime, index)
+            self._memory.move_to_end(uri)
+            while len(self._memory) > self.maxSize:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries, including any persisted ones.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute("DELETE FROM hdu_index")
+
+
+_defaultCache = None
+_defaultCacheLock = threading.Lock()
+
+
+def getHduIndexCache():
+    """Return the process-wide `HduIndexCache`.
+
+    The index is persisted to the SQLite file named by the
+    ``OBS_DECAM_HDU_INDEX`` environment variable if it is set, and is
+    otherwise only kept in memory.
+
+    Returns
+    -------
+    cache : `HduIndexCache`
+        The shared cache.
+    """
+    global _defaultCache
+    with _defaultCacheLock:
+        if _defaultCache is None:
+            _defaultCache = HduIndexCache(os.environ.get(HDU_INDEX_ENV) or None)
+        return _defaultCache
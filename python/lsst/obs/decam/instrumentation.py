@@ -0,0 +1,257 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Opt-in timings and counters for the DECam read paths.
+"""
+
+__all__ = ("MetricsRegistry", "getMetrics", "timed", "instrumented", "increment", "recordEvent")
+
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+_LOG = logging.getLogger(__name__)
+
+# Environment variable that enables the metrics: ``1`` to only collect them,
+# or the name of a file to write them to as JSON when the process exits.
+METRICS_ENV = "OBS_DECAM_METRICS"
+
+
+class MetricsRegistry:
+    """Thread-safe, in-process registry of timings, counters and events.
+
+    Timings are aggregated per name (number of calls, total, minimum and
+    maximum time), so the registry stays small however many reads are
+    made; only the most recent ``maxEvents`` events are kept.
+
+    Parameters
+    ----------
+    maxEvents : `int`, optional
+        Maximum number of events to keep.
+    """
+
+    def __init__(self, maxEvents=1000):
+        self._timings = {}
+        self._counters = {}
+        self._events = deque(maxlen=maxEvents)
+        self._lock = threading.Lock()
+
+    def addTiming(self, name, seconds):
+        """Record the duration of one call.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of what was timed.
+        seconds : `float`
+            Duration of the call.
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                self._timings[name] = {"count": 1, "total": seconds, "min": seconds, "max": seconds}
+            else:
+                timing["count"] += 1
+                timing["total"] += seconds
+                timing["min"] = min(timing["min"], seconds)
+                timing["max"] = max(timing["max"], seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time the enclosed block, including when it raises.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of what is timed.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTiming(name, time.perf_counter() - start)
+
+    def increment(self, name, value=1):
+        """Add to a counter.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of the counter.
+        value : `int`, optional
+            Amount to add.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def event(self, name, **fields):
+        """Record an event.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of the event; it is also counted, as ``events.<name>``.
+        **fields
+            JSON-serializable details of the event.
+        """
+        with self._lock:
+            self._events.append(dict(fields, event=name, time=time.time()))
+            key = f"events.{name}"
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def toDict(self):
+        """Return a snapshot of the metrics.
+
+        Returns
+        -------
+        metrics : `dict`
+            ``timings``, ``counters`` and ``events``; suitable for JSON or
+            for attaching to task metadata.
+        """
+        with self._lock:
+            return {
+                "timings": {name: dict(timing) for name, timing in self._timings.items()},
+                "counters": dict(self._counters),
+                "events": list(self._events),
+            }
+
+    def dump(self, filename):
+        """Write the metrics to a JSON file.
+
+        Parameters
+        ----------
+        filename : `str`
+            The file to write.
+        """
+        with open(filename, "w") as f:
+            json.dump(self.toDict(), f, indent=2)
+
+    def reset(self):
+        """Remove all metrics.
+        """
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self._events.clear()
+
+
+_registry = None
+_registryLock = threading.Lock()
+
+
+def _dumpAtExit(filename):
+    try:
+        _registry.dump(filename)
+    except OSError as e:
+        _LOG.warning("Could not write DECam I/O metrics to %s: %s", filename, e)
+
+
+def getMetrics():
+    """Return the process-wide `MetricsRegistry`, if metrics are enabled.
+
+    Metrics are enabled by setting the ``OBS_DECAM_METRICS`` environment
+    variable to ``1``, or to the name of a file to write them to (as JSON)
+    when the process exits.
+
+    Returns
+    -------
+    metrics : `MetricsRegistry` or `None`
+        The shared registry, or `None` if metrics are not enabled.
+    """
+    global _registry
+    setting = os.environ.get(METRICS_ENV, "0")
+    if setting in ("", "0"):
+        return None
+    with _registryLock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            if setting != "1":
+                atexit.register(_dumpAtExit, setting)
+        return _registry
+
+
+def timed(name):
+    """Return a context manager that times the enclosed block if metrics
+    are enabled.
+
+    Parameters
+    ----------
+    name : `str`
+        Name of what is timed.
+    """
+    metrics = getMetrics()
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.timer(name)
+
+
+def instrumented(name):
+    """Decorate a function so that its calls are timed if metrics are
+    enabled.
+
+    Parameters
+    ----------
+    name : `str`
+        Name to record the timings under.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(name, value=1):
+    """Add to a counter if metrics are enabled.
+
+    Parameters
+    ----------
+    name : `str`
+        Name of the counter.
+    value : `int`, optional
+        Amount to add.
+    """
+    metrics = getMetrics()
+    if metrics is not None:
+        metrics.increment(name, value)
+
+
+def recordEvent(name, **fields):
+    """Record an event if metrics are enabled.
+
+    Parameters
+    ----------
+    name : `str`
+        Name of the event.
+    **fields
+        JSON-serializable details of the event.
+    """
+    metrics = getMetrics()
+    if metrics is not None:
+        metrics.event(name, **fields)
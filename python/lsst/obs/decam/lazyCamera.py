@@ -0,0 +1,239 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Camera geometry that builds each detector only when it is needed.
+"""
+
+__all__ = ("LazyCamera", "splitCameraConfig")
+
+import ast
+import os
+import threading
+
+import lsst.afw.table
+from lsst.afw.cameraGeom import Amplifier, CameraConfig, makeCameraFromAmpLists
+
+from .cameraCache import loadCamera
+
+
+def _detectorIndex(node):
+    """Return the index in ``config.detectorList`` that an expression
+    refers to, or `None` if it does not refer to a detector config.
+    """
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        if isinstance(node, ast.Call):
+            node = node.func
+            continue
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute)
+                and node.value.attr == "detectorList" and isinstance(node.value.value, ast.Name)
+                and node.value.value.id == "config"):
+            index = node.slice
+            if isinstance(index, ast.Constant) and isinstance(index.value, int):
+                return index.value
+            raise ValueError(f"Unsupported detector config index on line {node.lineno}.")
+        node = node.value
+    return None
+
+
+def _statementIndex(statement):
+    """Return the index in ``config.detectorList`` of the detector config
+    a top-level statement sets, or `None` if it sets no detector config.
+    """
+    if isinstance(statement, ast.Assign):
+        targets = statement.targets
+    elif isinstance(statement, (ast.AugAssign, ast.AnnAssign)):
+        targets = [statement.target]
+    elif isinstance(statement, ast.Expr):
+        targets = [statement.value]
+    else:
+        return None
+    indices = {_detectorIndex(target) for target in targets}
+    if len(indices) > 1:
+        raise ValueError(f"Statement on line {statement.lineno} sets more than one detector config.")
+    return indices.pop()
+
+
+def splitCameraConfig(text):
+    """Split a persisted `~lsst.afw.cameraGeom.CameraConfig` into the part
+    common to all detectors and the part for each detector.
+
+    The text is parsed with `ast`, so statements may span several lines.
+    Comments go with the statement that follows them.
+
+    Parameters
+    ----------
+    text : `str`
+        The text of a camera config file, as written by
+        `lsst.pex.config.Config.save`.
+
+    Returns
+    -------
+    common : `str`
+        The statements that do not set a detector config.
+    detectors : `dict` [`int`, `str`]
+        The statements setting each detector config, keyed by its index in
+        ``detectorList``.
+    ids : `dict` [`int`, `int`]
+        Index in ``detectorList`` of each detector id.
+    names : `dict` [`str`, `int`]
+        Index in ``detectorList`` of each detector name.
+
+    Raises
+    ------
+    SyntaxError
+        Raised if the text is not valid Python.
+    ValueError
+        Raised if a line holds statements for different detectors (or for
+        a detector and the rest of the camera), or a detector config is
+        indexed by anything other than an integer literal.
+    """
+    lines = text.splitlines(keepends=True)
+    common = []
+    detectors = {}
+    ids = {}
+    names = {}
+    end = 0
+    lastIndex = None
+    for statement in ast.parse(text).body:
+        index = _statementIndex(statement)
+        if statement.lineno <= end:
+            # Another statement on the last line of the previous one.
+            if index != lastIndex:
+                raise ValueError(f"Line {statement.lineno} sets more than one detector config.")
+            end = max(end, statement.end_lineno)
+            continue
+        # Any lines since the previous statement are blank or comments.
+        block = lines[end:statement.end_lineno]
+        end = statement.end_lineno
+        lastIndex = index
+        if index is None:
+            common.extend(block)
+            continue
+        detectors.setdefault(index, []).extend(block)
+        if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Attribute)
+                and statement.targets[0].attr in ("id", "name")
+                and isinstance(statement.targets[0].value, ast.Subscript)):
+            value = ast.literal_eval(statement.value)
+            if statement.targets[0].attr == "id":
+                ids[value] = index
+            else:
+                names[value] = index
+    common.extend(lines[end:])
+    return "".join(common), {index: "".join(lines) for index, lines in detectors.items()}, ids, names
+
+
+class LazyCamera:
+    """Camera geometry whose detectors are built one at a time, on demand.
+
+    Indexing by detector id or name parses only the config of that detector
+    and reads only its amp info table, instead of building the whole camera.
+    Anything else a `~lsst.afw.cameraGeom.Camera` provides is delegated to
+    the full camera, which is built (or read; see
+    `~lsst.obs.decam.cameraCache.loadCamera`) the first time it is needed.
+
+    Parameters
+    ----------
+    path : `str`
+        The camera geometry directory, containing ``camera.py`` and one amp
+        info table per detector.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "camera.py")) as f:
+            self._common, self._configs, self._ids, self._names = splitCameraConfig(f.read())
+        self._detectors = {}
+        self._camera = None
+        self._lock = threading.Lock()
+
+    def _index(self, key):
+        index = self._names.get(key) if isinstance(key, str) else self._ids.get(key)
+        if index is None:
+            raise LookupError(f"No detector with id or name {key!r} in the camera defined in {self.path}.")
+        return index
+
+    def _buildDetector(self, index):
+        config = CameraConfig()
+        config.loadFromString(self._common + self._configs[index],
+                              filename=os.path.join(self.path, "camera.py"))
+        detectorConfig = config.detectorList[index]
+        ampInfoPath = os.path.join(self.path, detectorConfig.name.replace(" ", "_") + ".fits")
+        catalog = lsst.afw.table.BaseCatalog.readFits(ampInfoPath)
+        amps = [Amplifier.fromRecord(record) for record in catalog]
+        camera = makeCameraFromAmpLists(config, {detectorConfig.name: amps})
+        return camera[detectorConfig.name]
+
+    def __getitem__(self, key):
+        index = self._index(key)
+        with self._lock:
+            detector = self._detectors.get(index)
+            if detector is None:
+                if self._camera is not None:
+                    detector = self._camera[key]
+                else:
+                    detector = self._buildDetector(index)
+                self._detectors[index] = detector
+        return detector
+
+    def __contains__(self, key):
+        try:
+            self._index(key)
+        except LookupError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self._configs)
+
+    def __iter__(self):
+        # Every detector is needed, so build them all at once.
+        return iter(self.getCamera())
+
+    def getIdIter(self):
+        """Return an iterator over the detector ids, without building any
+        detectors.
+        """
+        return iter(sorted(self._ids, key=self._ids.get))
+
+    def getNameIter(self):
+        """Return an iterator over the detector names, without building any
+        detectors.
+        """
+        return iter(sorted(self._names, key=self._names.get))
+
+    def getCamera(self):
+        """Return the full camera, building it if necessary.
+
+        Returns
+        -------
+        camera : `lsst.afw.cameraGeom.Camera`
+            The camera geometry.
+        """
+        with self._lock:
+            if self._camera is None:
+                self._camera = loadCamera(self.path)
+            return self._camera
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.getCamera(), name)
@@ -0,0 +1,207 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Lookup-table linearization of whole DECam CCDs.
+"""
+
+__all__ = ("LookupTableLinearizer", "applyLookupTable")
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Environment variable giving the default number of linearization threads.
+LINEARIZE_THREADS_ENV = "OBS_DECAM_LINEARIZE_THREADS"
+
+
+def _tableIndex(values, offset, maxIndex):
+    """Return the lookup-table index of each value, as a float64 array.
+
+    As in ``lsst.ip.isr.applyLookupTable``, the values are rounded with
+    halves away from zero (``lround``), offset, and clipped to the table;
+    NaNs use the start of the table.
+    """
+    index = np.abs(values, dtype=np.float64)
+    index += 0.5
+    np.floor(index, out=index)
+    np.copysign(index, values, out=index)
+    index += offset
+    # Unlike clip, fmax and fmin also replace NaNs.
+    np.fmax(index, 0.0, out=index)
+    np.fmin(index, maxIndex, out=index)
+    return index
+
+
+def applyLookupTable(values, table, indexOffset):
+    """Add the lookup-table correction of each value in place, like
+    ``lsst.ip.isr.applyLookupTable``.
+
+    Parameters
+    ----------
+    values : `numpy.ndarray`
+        The values to correct.
+    table : `numpy.ndarray`
+        The correction for each rounded value.
+    indexOffset : `int`
+        Offset of the rounded values in ``table``.
+    """
+    index = _tableIndex(values, indexOffset, len(table) - 1)
+    values += np.take(table, index.astype(np.intp))
+
+
+class LookupTableLinearizer:
+    """Lookup-table linearization of all the amplifiers of a CCD in one
+    gather.
+
+    The rows of the linearizer's table are concatenated, and each column of
+    the CCD is given the start of its amplifier's row and its amplifier's
+    index offset, so that one rounded, clipped index per pixel looks up the
+    corrections of both DECam amplifiers at once.  The results are the same
+    as `lsst.ip.isr.Linearizer.applyLinearity` with ``LookupTable``
+    linearities.
+
+    Parameters
+    ----------
+    linearizer : `lsst.ip.isr.Linearizer`
+        The linearizer; each amplifier must have a ``LookupTable`` or
+        ``None`` linearity.
+    detector : `lsst.afw.cameraGeom.Detector`
+        The detector; each amplifier must span its full height.
+
+    Raises
+    ------
+    ValueError
+        Raised if an amplifier has another type of linearity, or the
+        amplifiers are not side by side.
+    """
+
+    def __init__(self, linearizer, detector):
+        bbox = detector.getBBox()
+        self.shape = (bbox.getHeight(), bbox.getWidth())
+        table = linearizer.tableData
+        nRows, self._maxIndex = (0, 0) if table is None else (len(table), np.shape(table)[1] - 1)
+        # The last row is all zeros; it is used by the columns of amplifiers
+        # with no linearity.
+        self._table = np.zeros((nRows + 1, self._maxIndex + 1))
+        # The table, flattened and cast to each image type it has been used
+        # with.
+        self._tables = {}
+        if table is not None:
+            self._table[:nRows] = table
+        self._rowStarts = np.full(self.shape[1], nRows*(self._maxIndex + 1), dtype=np.intp)
+        self._offsets = np.zeros(self.shape[1])
+        self.ampColumns = []
+        for amp in detector:
+            box = amp.getBBox()
+            if box.getHeight() != self.shape[0]:
+                raise ValueError(f"Amplifier {amp.getName()} does not span the height of detector "
+                                 f"{detector.getName()}.")
+            columns = slice(box.getMinX() - bbox.getMinX(), box.getMaxX() + 1 - bbox.getMinX())
+            self.ampColumns.append(columns)
+            kind = linearizer.linearityType.get(amp.getName(), "None") if linearizer.hasLinearity else "None"
+            if kind == "None":
+                continue
+            if kind != "LookupTable":
+                raise ValueError(f"Amplifier {amp.getName()} has a {kind} linearity, not a LookupTable.")
+            rowIndex, indexOffset = linearizer.linearityCoeffs[amp.getName()][:2]
+            self._rowStarts[columns] = int(rowIndex)*(self._maxIndex + 1)
+            self._offsets[columns] = int(indexOffset)
+
+    def _castTable(self, dtype):
+        table = self._tables.get(dtype)
+        if table is None:
+            table = self._tables.setdefault(dtype, self._table.astype(dtype).ravel())
+        return table
+
+    def _apply(self, array, table, rows, columns):
+        values = array[rows, columns]
+        index = _tableIndex(values, self._offsets[columns], self._maxIndex).astype(np.intp)
+        index += self._rowStarts[columns]
+        values += np.take(table, index)
+
+    def applyRegion(self, image, rows, columns=slice(None)):
+        """Linearize a block of the image of the CCD in place.
+
+        This lets callers that process a CCD a block of rows at a time
+        linearize each block while it is in cache.
+
+        Parameters
+        ----------
+        image : `numpy.ndarray`
+            The trimmed, floating-point image of the CCD.
+        rows, columns : `slice`
+            The block to linearize, as indices into ``image``; columns must
+            be in increasing order.
+        """
+        self._apply(image, self._castTable(image.dtype), rows, columns)
+
+    def apply(self, image, nThreads=None, chunkRows=512):
+        """Linearize the image of the CCD in place.
+
+        Parameters
+        ----------
+        image : `lsst.afw.image.Image` or `numpy.ndarray`
+            The trimmed, floating-point image of the CCD.
+        nThreads : `int`, optional
+            Number of threads to use, each linearizing a block of rows of
+            one amplifier; from the ``OBS_DECAM_LINEARIZE_THREADS``
+            environment variable if not given, and 1 if that is not set.
+        chunkRows : `int`, optional
+            Number of rows to linearize at a time in each thread; bounds the
+            memory used for the indices.
+
+        Raises
+        ------
+        TypeError
+            Raised if the image is not floating point.
+        ValueError
+            Raised if the image is not the shape of the detector.
+        """
+        array = getattr(image, "array", image)
+        if not np.issubdtype(array.dtype, np.floating):
+            raise TypeError(f"Cannot linearize a {array.dtype} image in place.")
+        if array.shape != self.shape:
+            raise ValueError(f"Image of shape {array.shape} is not the shape of the detector, {self.shape}.")
+        if nThreads is None:
+            nThreads = int(os.environ.get(LINEARIZE_THREADS_ENV) or 1)
+        table = self._castTable(array.dtype)
+
+        if nThreads <= 1:
+            for start in range(0, self.shape[0], chunkRows):
+                self._apply(array, table, slice(start, start + chunkRows), slice(None))
+            return
+
+        # Split each amplifier into enough bands of rows to keep the threads
+        # busy.
+        nBands = max(-(-nThreads//len(self.ampColumns)), 1)
+        bandRows = -(-self.shape[0]//nBands)
+
+        def applyBand(bandStart, columns):
+            bandEnd = min(bandStart + bandRows, self.shape[0])
+            for start in range(bandStart, bandEnd, chunkRows):
+                self._apply(array, table, slice(start, min(start + chunkRows, bandEnd)), columns)
+
+        with ThreadPoolExecutor(nThreads, thread_name_prefix="decamLinearize") as executor:
+            futures = [executor.submit(applyBand, bandStart, columns)
+                       for columns in self.ampColumns for bandStart in range(0, self.shape[0], bandRows)]
+            for future in futures:
+                future.result()
@@ -20,6 +20,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import threading
+from collections.abc import Mapping
+
 import astropy.io.fits
 import numpy as np
 
@@ -54,44 +57,119 @@ def getDESAtmosphereTransmission():
     return {DECAM_BEGIN: atm}
 
 
-def getDESSystemTransmission():
-    """Return a nested dictionary of TransmissionCurves describing the
-    system throughput (optics + filter + detector) at the location of
-    each detector.
+# Bands we have DES detector throughputs for.
+DES_SYSTEM_BANDS = ("g", "r", "i", "z", "Y")
 
-    Outer dictionary keys are string dates (YYYY-MM-DD).  The next level
-    dictionary maps the physical filter name to another dict.  The inner
-    dict is keyed by detector number.
+
+def _systemTransmissionFile(band):
+    return os.path.join(DATA_DIR, "des", f"{band}_band_per_detector_throughput.fits")
+
+
+class _DetectorTransmissions(Mapping):
+    """The system TransmissionCurves of one band, keyed by detector number,
+    each made the first time it is looked up.
+
+    The throughput table is read the first time any detector is looked up,
+    into one C-contiguous (detector, wavelength) float64 array, so that the
+    throughput of each detector is a view of one of its rows.
     """
-    # We have DES detector throughputs for the grizy bands.
 
-    bands = ["g", "r", "i", "z", "Y"]
+    def __init__(self, filename):
+        self._filename = filename
+        self._wavelengths = None
+        self._throughputs = None
+        self._curves = {}
+        self._lock = threading.Lock()
+
+    def _read(self):
+        # Called with the lock held.
+        if self._throughputs is None:
+            table = astropy.io.fits.getdata(self._filename)
+            self._wavelengths = np.ascontiguousarray(table["lambda"], dtype=np.float64)
+            self._throughputs = np.ascontiguousarray(table["throughput_ccd"].T, dtype=np.float64)
+        return self._throughputs
+
+    def __getitem__(self, detector):
+        with self._lock:
+            curve = self._curves.get(detector)
+            if curve is None:
+                throughputs = self._read()
+                # The DECam detector starts at 1.
+                if not isinstance(detector, (int, np.integer)) or not 1 <= detector <= len(throughputs):
+                    raise KeyError(detector)
+                curve = TransmissionCurve.makeSpatiallyConstant(
+                    throughput=throughputs[detector - 1],
+                    wavelengths=self._wavelengths,
+                    throughputAtMin=0.0,
+                    throughputAtMax=0.0,
+                )
+                self._curves[detector] = curve
+            return curve
+
+    def __iter__(self):
+        with self._lock:
+            nDetectors = len(self._read())
+        return iter(range(1, nDetectors + 1))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._read())
+
+
+class _FilterTransmissions(Mapping):
+    """The system TransmissionCurves of each detector, keyed by physical
+    filter; the table of each band is only read when it is used.
+    """
+
+    def __init__(self):
+        self._bands = {}
+        for band in DES_SYSTEM_BANDS:
+            for filter_def in DECAM_FILTER_DEFINITIONS:
+                # The DES Y band is the DECam y band.
+                if band.lower() == filter_def.band:
+                    self._bands[filter_def.physical_filter] = _DetectorTransmissions(
+                        _systemTransmissionFile(band))
+                    break
+
+    def __getitem__(self, physical_filter):
+        return self._bands[physical_filter]
 
-    filter_dict = {}
-    for band in bands:
-        for filter_def in DECAM_FILTER_DEFINITIONS:
-            if band == filter_def.band:
-                physical_filter = filter_def.physical_filter
-                break
+    def __iter__(self):
+        return iter(self._bands)
 
-        table = astropy.io.fits.getdata(
-            os.path.join(DATA_DIR, "des", f"{band}_band_per_detector_throughput.fits"),
-        )
+    def __len__(self):
+        return len(self._bands)
 
-        detector_dict = {}
-        for index in range(table['throughput_ccd'].shape[1]):
-            # The DECam detector starts at 1.
-            detector = index + 1
 
-            tput = TransmissionCurve.makeSpatiallyConstant(
-                throughput=table["throughput_ccd"][:, index].astype(np.float64),
-                wavelengths=table["lambda"].astype(np.float64),
-                throughputAtMin=0.0,
-                throughputAtMax=0.0,
-            )
+_systemTransmission = None
+_systemTransmissionVersion = None
+_systemTransmissionLock = threading.Lock()
 
-            detector_dict[detector] = tput
 
-        filter_dict[physical_filter] = detector_dict
+def getDESSystemTransmission():
+    """Return a nested dictionary of TransmissionCurves describing the
+    system throughput (optics + filter + detector) at the location of
+    each detector.
+
+    Outer dictionary keys are string dates (YYYY-MM-DD).  The next level
+    dictionary maps the physical filter name to another dict.  The inner
+    dict is keyed by detector number.
 
-    return {DECAM_BEGIN: filter_dict}
+    The inner mappings are read-only, and each curve is made the first time
+    it is looked up.  They are shared by all the calls in a process until
+    one of the throughput files changes.
+    """
+    global _systemTransmission, _systemTransmissionVersion
+    version = []
+    for band in DES_SYSTEM_BANDS:
+        filename = _systemTransmissionFile(band)
+        try:
+            stat = os.stat(filename)
+            version.append((filename, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            version.append((filename, None, None))
+    with _systemTransmissionLock:
+        if _systemTransmission is None or version != _systemTransmissionVersion:
+            _systemTransmission = _FilterTransmissions()
+            _systemTransmissionVersion = version
+        return {DECAM_BEGIN: _systemTransmission}
@@ -0,0 +1,142 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Memory-mapped reads of uncompressed image HDUs.
+"""
+
+__all__ = ("mapImageArray", "readMappedImage", "isMappedReadEnabled")
+
+import os
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.geom
+
+from .seekTable import getSeekTable
+
+# Environment variable that enables memory-mapped reads of calibrations.
+MAPPED_READ_ENV = "OBS_DECAM_MAP_CALIBS"
+
+# Big-endian numpy types of the FITS BITPIX values.
+_BITPIX_TYPES = {8: "u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+
+def _asFloat(value, default):
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def mapImageArray(filename, hdu):
+    """Return a read-only, memory-mapped view of the pixels of an HDU.
+
+    Parameters
+    ----------
+    filename : `str`
+        The FITS file.
+    hdu : `int`
+        Index of the HDU, counting the primary HDU as 0.
+
+    Returns
+    -------
+    array : `numpy.memmap` or `None`
+        The pixels, in the file's (big-endian) byte order, or `None` if the
+        HDU is not an uncompressed two-dimensional image whose pixel values
+        are stored unscaled.
+    header : `dict` [`str`, `object`]
+        The header cards of the HDU, as returned by
+        `~lsst.obs.decam.seekTable.FitsSeekTable.readCards`.
+
+    Notes
+    -----
+    No pixel data is read until the array is used.  The array cannot be
+    written to; take a copy to modify it.
+    """
+    table = getSeekTable(filename)
+    header = table.readCards(hdu)
+    if hdu == 0:
+        isImage = header.get("SIMPLE") is True
+    else:
+        isImage = header.get("XTENSION") == "IMAGE"
+    dtype = _BITPIX_TYPES.get(header.get("BITPIX"))
+    shape = (header.get("NAXIS2"), header.get("NAXIS1"))
+    if (not isImage or dtype is None or header.get("NAXIS") != 2
+            or not all(isinstance(n, int) and n > 0 for n in shape)
+            or _asFloat(header.get("BSCALE"), 1.0) != 1.0 or _asFloat(header.get("BZERO"), 0.0) != 0.0):
+        return None, header
+    array = np.memmap(filename, mode="r", dtype=dtype, offset=table[hdu].dataOffset, shape=shape)
+    return array, header
+
+
+def readMappedImage(filename, hdu, dtype=lsst.afw.image.ImageF):
+    """Read the image in one HDU through a memory map.
+
+    The pixels are converted to native byte order as they are copied
+    straight from the file's pages into the new image, with no
+    intermediate buffers.  HDUs that cannot be mapped (see
+    `mapImageArray`) are read with afw instead.
+
+    Parameters
+    ----------
+    filename : `str`
+        The FITS file.
+    hdu : `int`
+        Index of the HDU, counting the primary HDU as 0.
+    dtype : `type`, optional
+        The afw image class to read into.
+
+    Returns
+    -------
+    image : `lsst.afw.image.Image`
+        The image.
+    """
+    array, header = mapImageArray(filename, hdu)
+    if array is None:
+        return dtype(filename, hdu)
+    height, width = array.shape
+    image = dtype(width, height)
+    if image.array.dtype.kind != array.dtype.kind:
+        # Reading would need a type conversion; leave that to afw.
+        return dtype(filename, hdu)
+    image.array[:, :] = array
+    crval1, crval2 = _asFloat(header.get("CRVAL1A"), None), _asFloat(header.get("CRVAL2A"), None)
+    if crval1 is not None and crval2 is not None:
+        # This is how afw persists XY0.
+        image.setXY0(lsst.geom.Point2I(int(crval1), int(crval2)))
+    return image
+
+
+def isMappedReadEnabled():
+    """Return whether calibrations should be read through a memory map.
+
+    This is enabled by setting the ``OBS_DECAM_MAP_CALIBS`` environment
+    variable to anything other than ``0``.
+
+    Returns
+    -------
+    enabled : `bool`
+        Whether memory-mapped reads are enabled.
+    """
+    return os.environ.get(MAPPED_READ_ENV, "0") not in ("", "0")
@@ -0,0 +1,362 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""In-process caches of fixed-up DECam headers.
+"""
+
+__all__ = ("MetadataCache", "getMetadataCache", "ExposureFixups", "fixDetectorHeader")
+
+import datetime
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import astro_metadata_translator
+import lsst.afw.fits
+from astro_metadata_translator.headers import FIXUP_SENTINEL, HIERARCH
+
+_LOG = logging.getLogger(__name__)
+
+# Environment variable giving the number of headers to cache.
+METADATA_CACHE_ENV = "OBS_DECAM_METADATA_CACHE_SIZE"
+
+# Environment variable giving the number of files whose exposure-level
+# header fix-ups are cached.
+FIXUP_CACHE_ENV = "OBS_DECAM_FIXUP_CACHE_SIZE"
+
+# The provenance cards written by `astro_metadata_translator.fix_header`.
+_FIXUP_DATE = HIERARCH + " DATE"
+_FIXUP_FILE = HIERARCH + " FILE"
+_FIXUP_VERSION = HIERARCH + " VERSION"
+_PROVENANCE = (FIXUP_SENTINEL, _FIXUP_DATE, _FIXUP_FILE, _FIXUP_VERSION)
+
+
+class MetadataCache:
+    """Bounded LRU cache of fixed-up headers, keyed on file and detector.
+
+    Entries are only returned while the size and modification time of the
+    file match those it had when the entry was stored.  Callers always get
+    their own copy of a header, so modifying it does not affect the cache.
+
+    Parameters
+    ----------
+    maxSize : `int`
+        Maximum number of headers to hold.
+    """
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filename, detector):
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        return (path, detector), (stat.st_size, stat.st_mtime_ns)
+
+    def get(self, filename, detector):
+        """Return a copy of a cached header.
+
+        Parameters
+        ----------
+        filename : `str`
+            The file the header was read from.
+        detector : `int`
+            The detector id.
+
+        Returns
+        -------
+        metadata : `lsst.daf.base.PropertyList` or `None`
+            The header, or `None` if it is not cached or the file has
+            changed since it was.
+        """
+        key, version = self._key(filename, detector)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            metadata = entry[1]
+        return metadata.deepCopy()
+
+    def put(self, filename, detector, metadata):
+        """Store a copy of a header.
+
+        Parameters
+        ----------
+        filename : `str`
+            The file the header was read from.
+        detector : `int`
+            The detector id.
+        metadata : `lsst.daf.base.PropertyList`
+            The fixed-up header.
+        """
+        key, version = self._key(filename, detector)
+        metadata = metadata.deepCopy()
+        with self._lock:
+            self._entries[key] = (version, metadata)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_defaultCache = None
+_defaultCacheLock = threading.Lock()
+
+
+def getMetadataCache():
+    """Return the process-wide `MetadataCache`, if one is enabled.
+
+    Caching is enabled by setting the ``OBS_DECAM_METADATA_CACHE_SIZE``
+    environment variable to the number of headers to hold.
+
+    Returns
+    -------
+    cache : `MetadataCache` or `None`
+        The shared cache, or `None` if caching is not enabled.
+    """
+    global _defaultCache
+    maxSize = int(os.environ.get(METADATA_CACHE_ENV) or 0)
+    if maxSize <= 0:
+        return None
+    with _defaultCacheLock:
+        if _defaultCache is None:
+            _defaultCache = MetadataCache(maxSize)
+        _defaultCache.maxSize = maxSize
+        return _defaultCache
+
+
+class _RecordingHeader(MutableMapping):
+    """A header that records the names of the cards that are looked up in
+    it.
+
+    Parameters
+    ----------
+    metadata : `lsst.daf.base.PropertyList`
+        The header to wrap; modifications are made to it.
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.names = set()
+
+    def __getitem__(self, name):
+        self.names.add(name)
+        return self.metadata[name]
+
+    def __contains__(self, name):
+        self.names.add(name)
+        return name in self.metadata
+
+    def __setitem__(self, name, value):
+        self.metadata[name] = value
+
+    def __delitem__(self, name):
+        del self.metadata[name]
+
+    def __iter__(self):
+        # Iterating over the header may look at any card.
+        self.names.update(self.metadata.getOrderedNames())
+        return iter(self.metadata)
+
+    def __len__(self):
+        return len(self.metadata)
+
+
+def _cardValues(metadata, name):
+    """Return all values of a card, or `None` if it is not present."""
+    return metadata.getArray(name) if metadata.exists(name) else None
+
+
+class ExposureFixups:
+    """The header fix-ups that apply to every detector of an exposure.
+
+    `astro_metadata_translator.fix_header` applies per-observation
+    correction files and translator fix-ups, both of which only look at
+    exposure-level cards for DECam.  This runs it once on the primary
+    header of a file, recording which cards it looks at and what it
+    changes, so that the change can be patched into each detector header
+    whose recorded cards have the same values as in the primary header.
+
+    Parameters
+    ----------
+    filename : `str`
+        The raw file.
+    primary : `lsst.daf.base.PropertyList`
+        The primary header of the file; it is not modified.
+    translatorClass : `type`, optional
+        The metadata translator to use; determined from ``primary`` if not
+        given.
+
+    Raises
+    ------
+    ValueError
+        Raised if no translator can be determined for ``primary``, or the
+        instrument and observation id of the exposure cannot be found.
+    """
+
+    def __init__(self, filename, primary, translatorClass=None):
+        self.filename = filename
+        if translatorClass is None:
+            translatorClass = astro_metadata_translator.MetadataTranslator.determine_translator(
+                primary, filename=filename)
+        self.translatorClass = translatorClass
+        translator = translatorClass(primary, filename=filename)
+        try:
+            translator.to_instrument()
+            translator.to_observation_id()
+        except Exception as e:
+            raise ValueError(f"Cannot determine the exposure of {filename}: {e}") from e
+
+        fixed = _RecordingHeader(primary.deepCopy())
+        # As in the per-detector fix_header(metadata) call, no filename is
+        # given.
+        astro_metadata_translator.fix_header(fixed, translator_class=translatorClass)
+        self.inputs = {name: _cardValues(primary, name) for name in fixed.names}
+        fixed = fixed.metadata
+        self.modified = fixed[FIXUP_SENTINEL]
+        # The provenance cards are written for every detector by apply, and
+        # are not part of the patch.
+        self.provenance = {name: fixed[name] for name in (_FIXUP_FILE, _FIXUP_VERSION) if fixed.exists(name)}
+        self.patch = {}
+        for name in fixed.getOrderedNames():
+            if name in _PROVENANCE:
+                continue
+            value = fixed.getArray(name)
+            if not primary.exists(name) or primary.getArray(name) != value:
+                self.patch[name] = (value if len(value) > 1 else value[0], fixed.getComment(name))
+        self.removed = [name for name in primary.getOrderedNames() if not fixed.exists(name)]
+
+    def appliesTo(self, metadata):
+        """Return whether the fix-ups of the primary header are those of a
+        detector header.
+
+        Parameters
+        ----------
+        metadata : `lsst.daf.base.PropertyList`
+            The detector header, merged with the primary header.
+
+        Returns
+        -------
+        applies : `bool`
+            `True` if every card that `astro_metadata_translator.fix_header`
+            looked at has the same values in both headers.
+        """
+        return all(_cardValues(metadata, name) == values for name, values in self.inputs.items())
+
+    def apply(self, metadata):
+        """Apply the fix-ups to the header of one detector.
+
+        Headers that the fix-ups do not apply to (see `appliesTo`) are fixed
+        up with `astro_metadata_translator.fix_header`.
+
+        Parameters
+        ----------
+        metadata : `lsst.daf.base.PropertyList`
+            The detector header, merged with the primary header; modified
+            in place.
+
+        Returns
+        -------
+        modified : `bool`
+            `True` if the header was updated, as returned by
+            `astro_metadata_translator.fix_header`.
+        """
+        if metadata.exists(FIXUP_SENTINEL):
+            return metadata[FIXUP_SENTINEL]
+        if not self.appliesTo(metadata):
+            return astro_metadata_translator.fix_header(metadata)
+
+        for name, (value, comment) in self.patch.items():
+            metadata.set(name, value, comment)
+        for name in self.removed:
+            if metadata.exists(name):
+                metadata.remove(name)
+        metadata[FIXUP_SENTINEL] = self.modified
+        metadata[_FIXUP_DATE] = datetime.datetime.now().isoformat()
+        for name, value in self.provenance.items():
+            metadata[name] = value
+        return self.modified
+
+
+_fixups = OrderedDict()
+_fixupsLock = threading.Lock()
+
+
+def fixDetectorHeader(filename, metadata):
+    """Fix up the header of one detector of a raw file.
+
+    This gives the same result as `astro_metadata_translator.fix_header`.
+    If the ``OBS_DECAM_FIXUP_CACHE_SIZE`` environment variable is set to
+    a positive number, the exposure-level fix-ups are computed only once
+    per file and kept in a bounded LRU cache of that many files.
+
+    Parameters
+    ----------
+    filename : `str`
+        The file the header was read from.
+    metadata : `lsst.daf.base.PropertyList`
+        The detector header, merged with the primary header; modified in
+        place.
+    """
+    maxSize = int(os.environ.get(FIXUP_CACHE_ENV) or 0)
+    if maxSize <= 0:
+        astro_metadata_translator.fix_header(metadata)
+        return
+
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _fixupsLock:
+        entry = _fixups.get(path)
+        if entry is not None and entry[0] == version:
+            _fixups.move_to_end(path)
+        else:
+            entry = None
+    if entry is None:
+        try:
+            fixups = ExposureFixups(path, lsst.afw.fits.readMetadata(path, 0))
+        except Exception as e:
+            _LOG.debug("Could not compute exposure-level fixups for %s: %s", path, e)
+            fixups = None
+        entry = (version, fixups)
+        with _fixupsLock:
+            _fixups[path] = entry
+            while len(_fixups) > maxSize:
+                _fixups.popitem(last=False)
+
+    fixups = entry[1]
+    if fixups is None:
+        astro_metadata_translator.fix_header(metadata)
+    else:
+        fixups.apply(metadata)
@@ -0,0 +1,354 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Columnar index of the translated metadata of DECam raw files.
+"""
+
+__all__ = ("MetadataIndex",)
+
+import concurrent.futures
+import functools
+import logging
+import os
+
+import astropy.units as u
+
+from .decamFilters import DECAM_FILTER_DEFINITIONS
+from .exposureInfo import readExposureMetadata
+from .fileUtils import writeAtomic
+
+_LOG = logging.getLogger(__name__)
+
+_BANDS = {definition.physical_filter: definition.band for definition in DECAM_FILTER_DEFINITIONS}
+
+# The detector columns of the index, after filename and exposure_id.
+_DETECTOR_COLUMNS = ("hdu", "detector_num", "detector_name", "detector_group", "detector_serial",
+                     "detector_unique_name", "detector_exposure_id")
+
+
+def _importPyarrow():
+    """Import pyarrow, which only the index itself needs.
+
+    Raises
+    ------
+    ImportError
+        Raised if pyarrow is not installed.
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("MetadataIndex needs pyarrow, which is not installed; install it "
+                          "(e.g. with 'conda install pyarrow') to read or write metadata indexes.") from e
+    return pyarrow
+
+
+@functools.cache
+def _schemas():
+    """Return the schemas of the exposure and detector tables.
+    """
+    pyarrow = _importPyarrow()
+    exposureSchema = pyarrow.schema([
+        ("filename", pyarrow.string()),
+        ("size", pyarrow.int64()),
+        ("mtime_ns", pyarrow.int64()),
+        ("exposure_id", pyarrow.int64()),
+        ("observation_id", pyarrow.string()),
+        ("observation_type", pyarrow.string()),
+        ("day_obs", pyarrow.int64()),
+        ("mjd", pyarrow.float64()),
+        ("physical_filter", pyarrow.string()),
+        ("band", pyarrow.string()),
+        ("exposure_time", pyarrow.float64()),
+        ("dark_time", pyarrow.float64()),
+        ("airmass", pyarrow.float64()),
+        ("ra", pyarrow.float64()),
+        ("dec", pyarrow.float64()),
+        ("science_program", pyarrow.string()),
+        ("object", pyarrow.string()),
+    ])
+    detectorSchema = pyarrow.schema([
+        ("filename", pyarrow.string()),
+        ("exposure_id", pyarrow.int64()),
+        ("hdu", pyarrow.int32()),
+        ("detector_num", pyarrow.int32()),
+        ("detector_name", pyarrow.string()),
+        ("detector_group", pyarrow.string()),
+        ("detector_serial", pyarrow.string()),
+        ("detector_unique_name", pyarrow.string()),
+        ("detector_exposure_id", pyarrow.int64()),
+    ])
+    return exposureSchema, detectorSchema
+
+
+# Query keywords that select on a string column, and those that select on
+# a (min, max) range of a numeric column.
+_MATCH_COLUMNS = ("band", "physical_filter", "observation_type", "science_program", "object")
+_RANGE_COLUMNS = ("exposure_time", "airmass", "mjd", "ra", "dec")
+
+
+def _quantity(value, unit):
+    return None if value is None else float(value.to_value(unit))
+
+
+def _readRows(filename):
+    """Return the exposure row and the detector rows of one raw file.
+    """
+    stat = os.stat(filename)
+    metadata = readExposureMetadata(filename)
+    fields = metadata.exposureFields
+    radec = fields.get("tracking_radec")
+    begin = fields.get("datetime_begin")
+    exposure = {
+        "filename": filename,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "exposure_id": fields.get("exposure_id"),
+        "observation_id": fields.get("observation_id"),
+        "observation_type": fields.get("observation_type"),
+        "day_obs": fields.get("observing_day"),
+        "mjd": None if begin is None else float(begin.tai.mjd),
+        "physical_filter": fields.get("physical_filter"),
+        "band": _BANDS.get(fields.get("physical_filter")),
+        "exposure_time": _quantity(fields.get("exposure_time"), u.s),
+        "dark_time": _quantity(fields.get("dark_time"), u.s),
+        "airmass": fields.get("boresight_airmass"),
+        "ra": None if radec is None else float(radec.icrs.ra.deg),
+        "dec": None if radec is None else float(radec.icrs.dec.deg),
+        "science_program": fields.get("science_program"),
+        "object": fields.get("object"),
+    }
+    detectors = [dict(filename=filename, exposure_id=exposure["exposure_id"],
+                      **{name: metadata.columns[name][i] for name in _DETECTOR_COLUMNS})
+                 for i in range(len(metadata))]
+    return exposure, detectors
+
+
+def _tryReadRows(filename):
+    try:
+        return _readRows(filename)
+    except Exception as e:
+        _LOG.warning("Cannot index %s: %s", filename, e)
+        return None
+
+
+def _replaceRows(table, filenames, rows, schema):
+    """Return a table without the rows of some files, and with new rows.
+    """
+    pyarrow = _importPyarrow()
+    drop = pyarrow.compute.is_in(table["filename"],
+                                 value_set=pyarrow.array(sorted(filenames), pyarrow.string()))
+    return pyarrow.concat_tables([
+        table.filter(pyarrow.compute.invert(drop)),
+        pyarrow.Table.from_pylist(rows, schema=schema),
+    ]).combine_chunks()
+
+
+class MetadataIndex:
+    """Index of the translated metadata of DECam raw files, for selecting
+    exposures without a registry query or reading any headers.
+
+    The index is a directory holding two Parquet tables:
+    ``exposures.parquet``, with one row per raw file, and
+    ``detectors.parquet``, with one row per science detector in each file.
+    Headers are translated with
+    `~lsst.obs.decam.exposureInfo.readExposureMetadata`, and the band comes
+    from the DECam filter definitions.  Both tables are
+    held in memory once loaded, so queries over hundreds of thousands of
+    exposures take milliseconds.
+
+    Parameters
+    ----------
+    path : `str`
+        Directory of the index; created by `update` if it does not exist.
+
+    Raises
+    ------
+    ImportError
+        Raised if pyarrow, which is an optional dependency of obs_decam, is
+        not installed.
+    """
+
+    def __init__(self, path):
+        _importPyarrow()
+        self.path = path
+        self._exposures = None
+        self._detectors = None
+
+    @property
+    def exposures(self):
+        """One row per indexed file (`pyarrow.Table`).
+        """
+        if self._exposures is None:
+            self._exposures = self._read("exposures.parquet", _schemas()[0])
+        return self._exposures
+
+    @property
+    def detectors(self):
+        """One row per science detector of each indexed file
+        (`pyarrow.Table`).
+        """
+        if self._detectors is None:
+            self._detectors = self._read("detectors.parquet", _schemas()[1])
+        return self._detectors
+
+    def _read(self, name, schema):
+        pyarrow = _importPyarrow()
+        filename = os.path.join(self.path, name)
+        if not os.path.exists(filename):
+            return schema.empty_table()
+        return pyarrow.parquet.read_table(filename, schema=schema)
+
+    def update(self, filenames, processes=1, prune=False):
+        """Add new and changed files to the index and write it out.
+
+        Files already indexed are only read again if their size or
+        modification time has changed.
+
+        Parameters
+        ----------
+        filenames : iterable [`str`]
+            Raw files to index.
+        processes : `int`, optional
+            Number of processes to read the headers with.
+        prune : `bool`, optional
+            If `True`, also remove files that no longer exist from the
+            index.
+
+        Returns
+        -------
+        count : `int`
+            Number of files that were read.
+        """
+        known = dict(zip(self.exposures["filename"].to_pylist(),
+                         zip(self.exposures["size"].to_pylist(), self.exposures["mtime_ns"].to_pylist())))
+        toRead = []
+        for filename in {os.path.abspath(f) for f in filenames}:
+            try:
+                stat = os.stat(filename)
+            except OSError as e:
+                _LOG.warning("Cannot index %s: %s", filename, e)
+                continue
+            if known.get(filename) != (stat.st_size, stat.st_mtime_ns):
+                toRead.append(filename)
+        toRead.sort()
+
+        if processes > 1:
+            with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+                results = list(executor.map(_tryReadRows, toRead))
+        else:
+            results = [_tryReadRows(filename) for filename in toRead]
+        exposures = [result[0] for result in results if result is not None]
+        detectors = [row for result in results if result is not None for row in result[1]]
+
+        # Drop the old rows of the files that were read, or have gone.
+        drop = set(toRead)
+        if prune:
+            drop.update(f for f in known if not os.path.exists(f))
+        if not drop:
+            return 0
+        exposureSchema, detectorSchema = _schemas()
+        self._exposures = _replaceRows(self.exposures, drop, exposures, exposureSchema)
+        self._detectors = _replaceRows(self.detectors, drop, detectors, detectorSchema)
+        self.write()
+        return len(exposures)
+
+    def write(self):
+        """Write the index to its directory.
+        """
+        pyarrow = _importPyarrow()
+        os.makedirs(self.path, exist_ok=True)
+        # The exposures are written last, as they are what update compares
+        # against.
+        writeAtomic(os.path.join(self.path, "detectors.parquet"),
+                    lambda f: pyarrow.parquet.write_table(self.detectors, f))
+        writeAtomic(os.path.join(self.path, "exposures.parquet"),
+                    lambda f: pyarrow.parquet.write_table(self.exposures, f))
+
+    def select(self, detector=None, **kwargs):
+        """Return the exposures matching some criteria.
+
+        Parameters
+        ----------
+        detector : `int` or iterable [`int`], optional
+            Only select files containing (one of) these detectors.
+        **kwargs
+            Criteria on the exposure columns.  ``band``,
+            ``physical_filter``, ``observation_type``, ``science_program``
+            and ``object`` take a value or an iterable of values;
+            ``exposure_time``, ``airmass``, ``mjd``, ``ra`` and ``dec`` take
+            a ``(min, max)`` pair, either of which may be `None`.
+
+        Returns
+        -------
+        exposures : `pyarrow.Table`
+            The rows of `exposures` that match all the criteria.
+
+        Raises
+        ------
+        TypeError
+            Raised if a criterion is not one of the above.
+        """
+        pyarrow = _importPyarrow()
+        table = self.exposures
+        mask = None
+        for name, value in kwargs.items():
+            if name not in _MATCH_COLUMNS + _RANGE_COLUMNS:
+                raise TypeError(f"Cannot select on {name!r}.")
+            column = table[name]
+            if name in _MATCH_COLUMNS:
+                values = [value] if isinstance(value, str) else list(value)
+                condition = pyarrow.compute.is_in(column, value_set=pyarrow.array(values, pyarrow.string()))
+            else:
+                low, high = value
+                condition = pyarrow.compute.is_valid(column)
+                if low is not None:
+                    condition = pyarrow.compute.and_(condition, pyarrow.compute.greater_equal(column, low))
+                if high is not None:
+                    condition = pyarrow.compute.and_(condition, pyarrow.compute.less_equal(column, high))
+            mask = condition if mask is None else pyarrow.compute.and_(mask, condition)
+        if detector is not None:
+            detectors = [detector] if isinstance(detector, int) else list(detector)
+            rows = self.detectors.filter(pyarrow.compute.is_in(self.detectors["detector_num"],
+                                                               value_set=pyarrow.array(detectors,
+                                                                                       pyarrow.int32())))
+            condition = pyarrow.compute.is_in(table["filename"], value_set=rows["filename"].unique())
+            mask = condition if mask is None else pyarrow.compute.and_(mask, condition)
+        return table if mask is None else table.filter(mask)
+
+    def query(self, detector=None, **kwargs):
+        """Return the raw files matching some criteria.
+
+        Parameters
+        ----------
+        detector : `int` or iterable [`int`], optional
+            Only select files containing (one of) these detectors.
+        **kwargs
+            Criteria on the exposure columns; see `select`.
+
+        Returns
+        -------
+        filenames : `list` [`str`]
+            The matching files, in order of observation time.
+        """
+        rows = self.select(detector=detector, **kwargs)
+        return rows.sort_by([("mjd", "ascending"), ("filename", "ascending")])["filename"].to_pylist()
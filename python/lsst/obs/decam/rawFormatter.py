@@ -30,6 +30,14 @@ import lsst.afw.image
 from lsst.obs.base import FitsRawFormatterBase
 
 from . import DarkEnergyCamera
+from .calibCache import getCalibCache
+from .fitsHeader import isHeaderParseEnabled
+from .hduIndex import getHduIndexCache
+from .instrumentation import increment, instrumented, recordEvent, timed
+from .mappedImage import isMappedReadEnabled, readMappedImage
+from .metadataCache import fixDetectorHeader, getMetadataCache
+from .seekTable import getSeekTable, isSeekTableEnabled
+from .tileDecompression import getTileDecompressor
 
 __all__ = ("DarkEnergyCameraRawFormatter", "DarkEnergyCameraCPCalibFormatter")
 
@@ -57,8 +65,10 @@ class DarkEnergyCameraRawFormatter(FitsRawFormatterBase):
     wcsFlipX = True
 
     def getDetector(self, id):
-        return DarkEnergyCamera().getCamera()[id]
+        # Only build the detector being read, not the whole camera.
+        return DarkEnergyCamera.getLazyCamera()[id]
 
+    @instrumented("raw.scanHdus")
     def _scanHdus(self, filename, detectorId):
         """Scan through a file for the HDU containing data from one detector.
 
@@ -83,21 +93,56 @@ class DarkEnergyCameraRawFormatter(FitsRawFormatterBase):
         """
         log = logging.getLogger("lsst.obs.decam.DarkEnergyCameraRawFormatter")
         log.debug("Did not find detector=%s at expected HDU=%s in %s: scanning through all HDUs.",
-                  detectorId, detector_to_hdu[detectorId], filename)
+                  detectorId, detector_to_hdu.get(detectorId), filename)
+        recordEvent("scanFallback", filename=filename, detector=detectorId)
 
+        # Locate every detector from the header blocks alone, and remember
+        # where each one is so that the other detectors in this file do not
+        # need to scan again.
+        try:
+            hduIndex = getSeekTable(filename).detectorIndex()
+        except ValueError as e:
+            log.debug("Could not build seek table of %s: %s", filename, e)
+            hduIndex = {}
+        if detectorId in hduIndex:
+            getHduIndexCache().put(filename, hduIndex)
+            index = hduIndex[detectorId]
+            increment("hdusVisited")
+            return index, lsst.afw.fits.readMetadata(filename, index)
+
+        # Fall back to reading every header with afw.
+        hduIndex = {}
+        found = None
         fitsData = lsst.afw.fits.Fits(filename, 'r')
         # NOTE: The primary header (HDU=0) does not contain detector data.
         for i in range(1, fitsData.countHdus()):
             fitsData.setHdu(i)
             metadata = fitsData.readMetadata()
-            if metadata['CCDNUM'] == detectorId:
-                return i, metadata
-        else:
+            increment("hdusVisited")
+            ccdnum = metadata.get('CCDNUM')
+            if ccdnum is None:
+                continue
+            hduIndex.setdefault(ccdnum, i)
+            if ccdnum == detectorId and found is None:
+                found = (i, metadata)
+        getHduIndexCache().put(filename, hduIndex)
+
+        if found is None:
             raise ValueError(f"Did not find detectorId={detectorId} as CCDNUM in any HDU of {filename}.")
+        return found
 
+    @instrumented("raw.determineHDU")
     def _determineHDU(self, detectorId):
         """Determine the correct HDU number for a given detector id.
 
+        Files whose HDUs are not in the usual order are scanned once, and
+        the resulting index (see `~lsst.obs.decam.hduIndex.HduIndexCache`)
+        is used for all later reads of that file.  If
+        ``OBS_DECAM_SEEK_TABLE`` is set, the HDU is found and read through
+        the file's `~lsst.obs.decam.seekTable.FitsSeekTable` instead, and if
+        ``OBS_DECAM_PARSE_HEADERS`` is set, the header is parsed from its
+        bytes (see `~lsst.obs.decam.fitsHeader`) where it can be.
+
         Parameters
         ----------
         detectorId : `int`
@@ -116,45 +161,120 @@ class DarkEnergyCameraRawFormatter(FitsRawFormatterBase):
             Raised if detectorId is not found in any of the file HDUs
         """
         filename = self._reader_path
+        parseHeaders = isHeaderParseEnabled()
+        if parseHeaders or isSeekTableEnabled():
+            table = getSeekTable(filename)
+            index = table.detectorIndex().get(detectorId)
+            if index is None:
+                raise ValueError(f"Did not find detectorId={detectorId} as CCDNUM in any HDU of {filename}.")
+            increment("hdusVisited")
+            if parseHeaders:
+                try:
+                    return index, table.parseMetadata(index)
+                except ValueError as e:
+                    logging.getLogger("lsst.obs.decam.DarkEnergyCameraRawFormatter").debug(
+                        "Reading header of %s HDU %d with afw: %s", filename, index, e)
+                    increment("headerParseFallbacks")
+            return index, table.readMetadata(index)
+
+        hduIndex = getHduIndexCache().get(filename)
+        if hduIndex is not None:
+            # This file has already been scanned.
+            if detectorId not in hduIndex:
+                raise ValueError(f"Did not find detectorId={detectorId} as CCDNUM in any HDU of {filename}.")
+            index = hduIndex[detectorId]
+            metadata = lsst.afw.fits.readMetadata(filename, index)
+            increment("hdusVisited")
+            if metadata['CCDNUM'] == detectorId:
+                return index, metadata
+            return self._scanHdus(filename, detectorId)
+
         try:
             index = detector_to_hdu[detectorId]
             metadata = lsst.afw.fits.readMetadata(filename, index)
+            increment("hdusVisited")
             if metadata['CCDNUM'] != detectorId:
                 # detector->HDU mapping is different in this file: try scanning
                 return self._scanHdus(filename, detectorId)
             else:
-                fitsData = lsst.afw.fits.Fits(filename, 'r')
-                fitsData.setHdu(index)
                 return index, metadata
         except lsst.afw.fits.FitsError:
             # If the file doesn't contain all the HDUs of "normal" files,
             # try scanning.
             return self._scanHdus(filename, detectorId)
 
+    @instrumented("raw.readMetadata")
     def readMetadata(self):
-        index, metadata = self._determineHDU(self.data_id['detector'])
-        astro_metadata_translator.fix_header(metadata)
+        detectorId = self.data_id['detector']
+        # Headers are fixed up once per file and detector if caching is
+        # enabled (see `lsst.obs.decam.metadataCache`).
+        cache = getMetadataCache()
+        if cache is not None:
+            metadata = cache.get(self._reader_path, detectorId)
+            if metadata is not None:
+                increment("metadataCacheHits")
+                return metadata
+
+        index, metadata = self._determineHDU(detectorId)
+        with timed("raw.fixHeader"):
+            fixDetectorHeader(self._reader_path, metadata)
+        if cache is not None:
+            cache.put(self._reader_path, detectorId, metadata)
         return metadata
 
+    @instrumented("raw.readImage")
     def readImage(self):
         index, metadata = self._determineHDU(self.data_id['detector'])
-        return lsst.afw.image.ImageI(self._reader_path, index)
+        with timed("raw.readPixels"):
+            decompressor = getTileDecompressor()
+            if decompressor is not None:
+                image = decompressor.readImage(self._reader_path, index)
+            elif isSeekTableEnabled():
+                image = getSeekTable(self._reader_path).readImage(index)
+            else:
+                image = lsst.afw.image.ImageI(self._reader_path, index)
+        increment("pixelBytes", image.array.nbytes)
+        return image
 
 
 class DarkEnergyCameraCPCalibFormatter(DarkEnergyCameraRawFormatter):
     """DECam Community Pipeline calibrations (bias, dark, flat, fringe) are
     multi-extension FITS files with detector=index+1.
+
+    If ``OBS_DECAM_CALIB_CACHE_MB`` is set, all the HDUs of a calibration
+    are read the first time any of them is needed, and kept in a
+    process-local cache of that size (see
+    `~lsst.obs.decam.calibCache.CalibHduCache`) for the other detectors.
+    Otherwise, if ``OBS_DECAM_MAP_CALIBS`` is set, the pixels of
+    uncompressed calibrations are copied directly from a memory map of the
+    file (see `~lsst.obs.decam.mappedImage.readMappedImage`).
     """
 
+    @instrumented("calib.determineHDU")
     def _determineHDU(self, detectorId):
         """The HDU to read is the same as the detector number."""
         filename = self._reader_path
-        metadata = lsst.afw.fits.readMetadata(filename, detectorId)
+        cache = getCalibCache()
+        if cache is not None:
+            metadata = cache.readMetadata(filename, detectorId)
+        else:
+            metadata = lsst.afw.fits.readMetadata(filename, detectorId)
+        increment("hdusVisited")
         if metadata['CCDNUM'] != detectorId:
             msg = f"Found CCDNUM={metadata['CCDNUM']} instead of {detectorId} in {filename} HDU={detectorId}."
             raise ValueError(msg)
         return detectorId, metadata
 
+    @instrumented("calib.readImage")
     def readImage(self):
         index, metadata = self._determineHDU(self.data_id['detector'])
-        return lsst.afw.image.ImageF(self._reader_path, index)
+        with timed("calib.readPixels"):
+            cache = getCalibCache()
+            if cache is not None:
+                image = cache.readImage(self._reader_path, index)
+            elif isMappedReadEnabled():
+                image = readMappedImage(self._reader_path, index)
+            else:
+                image = lsst.afw.image.ImageF(self._reader_path, index)
+        increment("pixelBytes", image.array.nbytes)
+        return image
@@ -0,0 +1,84 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Raw ingest specialized for DECam multi-extension FITS files.
+"""
+
+__all__ = ("DecamRawIngestTask",)
+
+from lsst.daf.butler import DataCoordinate
+from lsst.obs.base import RawIngestTask
+from lsst.obs.base.ingest import RawFileData, RawFileDatasetInfo
+
+from .exposureInfo import readExposureMetadata
+
+
+class DecamRawIngestTask(RawIngestTask):
+    """Raw ingest that reads all the detector headers of a DECam file in one
+    pass, and translates only what differs between detectors.
+
+    The generic `~lsst.obs.base.RawIngestTask` reads the primary header,
+    and then every extension header through astropy, and fixes up and
+    translates every merged header independently.  This instead reads the
+    headers with `~lsst.obs.decam.exposureInfo.readExposureMetadata`, which
+    walks the HDUs of each file once with a single afw file handle, does
+    the exposure-level work (header fix-ups and all properties that do not
+    depend on the detector) once per file, and stores the detector to HDU
+    mapping it finds in the HDU index (see
+    `~lsst.obs.decam.hduIndex.HduIndexCache`) so that reading the raws
+    does not rediscover it.
+
+    Files are spread over processes as usual, with the ``processes`` (or
+    ``pool``) argument of `run`.  Set ``OBS_DECAM_HDU_INDEX`` to keep the
+    HDU index of files ingested by worker processes.  Files with a JSON
+    sidecar, remote files, and files that cannot be read this way are
+    handled by `~lsst.obs.base.RawIngestTask`.
+
+    Use this with ``butler ingest-raws --ingest-task
+    lsst.obs.decam.DecamRawIngestTask``.
+    """
+
+    def extractMetadata(self, filename):
+        # Docstring inherited.
+        if not filename.isLocal or filename.updatedExtension(".json").exists():
+            return super().extractMetadata(filename)
+        try:
+            datasets = [
+                RawFileDatasetInfo(
+                    obsInfo=obsInfo,
+                    dataId=DataCoordinate.standardize(instrument=obsInfo.instrument,
+                                                      exposure=obsInfo.exposure_id,
+                                                      detector=obsInfo.detector_num,
+                                                      universe=self.universe),
+                )
+                for obsInfo in readExposureMetadata(filename.ospath)
+            ]
+        except Exception as e:
+            self.log.debug("Could not read the detector headers of %s in one pass (%s); "
+                           "falling back to the default reader.", filename, e)
+            return super().extractMetadata(filename)
+
+        # All the datasets of a file must share a formatter.
+        instrument, formatterClass = self._determine_instrument_formatter(datasets[0].dataId, filename)
+        if instrument is None:
+            datasets = []
+        return RawFileData(datasets=datasets, filename=filename, FormatterClass=formatterClass,
+                           instrument=instrument)
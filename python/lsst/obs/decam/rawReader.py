@@ -0,0 +1,129 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Read many detectors from a DECam raw multi-extension FITS file at once.
+"""
+
+__all__ = ("DarkEnergyCameraRawReader",)
+
+import lsst.afw.fits
+import lsst.afw.image
+
+from .hduIndex import getHduIndexCache
+from .metadataCache import fixDetectorHeader
+from .tileDecompression import getTileDecompressor
+
+
+class DarkEnergyCameraRawReader:
+    """Reader for several detectors of one DECam raw file.
+
+    Unlike `~lsst.obs.decam.DarkEnergyCameraRawFormatter`, which opens the
+    file and locates the HDU for every detector it reads, this opens the
+    file once and walks the requested HDUs in file order.  Images are read
+    (and, for fpack-compressed files, decompressed) one HDU at a time as
+    the caller iterates, so only the detector being handed out needs to be
+    held in memory.
+
+    Parameters
+    ----------
+    filename : `str`
+        The raw file to read.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def readDetectors(self, detectors=None):
+        """Iterate over the metadata and image of detectors in the file.
+
+        Parameters
+        ----------
+        detectors : iterable [`int`], optional
+            Detector ids (``CCDNUM``) to read.  All detectors in the file
+            are read if not given.
+
+        Yields
+        ------
+        detector : `int`
+            The detector id.
+        metadata : `lsst.daf.base.PropertyList`
+            The fixed-up header for the detector, as returned by
+            `~lsst.obs.decam.DarkEnergyCameraRawFormatter.readMetadata`.
+        image : `lsst.afw.image.ImageI`
+            The raw image for the detector.
+
+        Raises
+        ------
+        ValueError
+            Raised if any of the requested detectors is not found in the
+            file.  If the file has not been indexed yet this is only known
+            once all the other requested detectors have been yielded.
+
+        Notes
+        -----
+        Detectors are yielded in the order they appear in the file, not the
+        order they were requested in.
+        """
+        wanted = None if detectors is None else set(detectors)
+        hduIndex = getHduIndexCache().get(self.filename)
+        if hduIndex is not None:
+            if wanted is not None:
+                self._checkMissing(wanted - hduIndex.keys())
+            hdus = sorted(hdu for detector, hdu in hduIndex.items() if wanted is None or detector in wanted)
+        else:
+            hdus = None
+
+        decompressor = getTileDecompressor()
+        fitsData = lsst.afw.fits.Fits(self.filename, "r")
+        try:
+            found = {}
+            if hdus is None:
+                # NOTE: The primary header (HDU=0) does not contain detector
+                # data.
+                hdus = range(1, fitsData.countHdus())
+            for hdu in hdus:
+                fitsData.setHdu(hdu)
+                metadata = fitsData.readMetadata()
+                detector = metadata.get("CCDNUM")
+                if detector is None:
+                    continue
+                found.setdefault(detector, hdu)
+                if wanted is not None and detector not in wanted:
+                    continue
+                fixDetectorHeader(self.filename, metadata)
+                if decompressor is not None:
+                    image = decompressor.readImage(self.filename, hdu)
+                else:
+                    image = lsst.afw.image.ImageI(fitsData)
+                yield detector, metadata, image
+        finally:
+            fitsData.closeFile()
+
+        if hduIndex is None:
+            # Every HDU was visited, so record where each detector is.
+            getHduIndexCache().put(self.filename, found)
+            if wanted is not None:
+                self._checkMissing(wanted - found.keys())
+
+    def _checkMissing(self, missing):
+        if missing:
+            raise ValueError(f"Did not find detectorId={sorted(missing)} as CCDNUM in any HDU of "
+                             f"{self.filename}.")
@@ -0,0 +1,379 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Byte offsets of the HDUs in a FITS file, for random access to any HDU.
+"""
+
+__all__ = ("HduEntry", "FitsSeekTable", "getSeekTable", "isSeekTableEnabled")
+
+import io
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import lsst.afw.fits
+import lsst.afw.image
+
+from .fitsHeader import parseExtensionHeader, parseHeader
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+# Environment variable that enables reading raws through their seek table.
+SEEK_TABLE_ENV = "OBS_DECAM_SEEK_TABLE"
+
+HduEntry = namedtuple("HduEntry", ["headerOffset", "headerSize", "dataOffset", "dataSize", "ccdnum"])
+HduEntry.__doc__ = """Location of one HDU in a FITS file.
+
+All sizes are in bytes and include the padding to a whole FITS block;
+``ccdnum`` is the value of the ``CCDNUM`` header card, or `None`.
+"""
+
+
+def _parseValue(card):
+    """Parse the value of a FITS header card.
+
+    Only the value types needed to walk the file structure are supported:
+    integers, logicals and strings.  Anything else is returned as the
+    stripped text of the value.
+    """
+    if card[8:10] != b"= ":
+        return None
+    value = card[10:].decode("ascii", errors="replace").strip()
+    if value.startswith("'"):
+        end = value.find("'", 1)
+        while end != -1 and value[end + 1:end + 2] == "'":
+            end = value.find("'", end + 2)
+        return value[1:end].replace("''", "'").rstrip()
+    value = value.split("/", 1)[0].strip()
+    if value == "T":
+        return True
+    if value == "F":
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class FitsSeekTable:
+    """Table of the byte offsets and sizes of every HDU in a FITS file.
+
+    The table is built by reading only the header blocks of the file and
+    seeking over all data, so building it costs one small read per header
+    block.  Once built, the header or data of any HDU can be read with a
+    single positioned read, independent of where the HDU is in the file.
+
+    Parameters
+    ----------
+    filename : `str`
+        The FITS file.
+    entries : `list` [`HduEntry`]
+        The location of each HDU, with the primary HDU first.
+    """
+
+    def __init__(self, filename, entries):
+        self.filename = filename
+        self.entries = entries
+        self._detectorIndex = None
+        self._primary = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, hdu):
+        return self.entries[hdu]
+
+    @classmethod
+    def fromFile(cls, filename):
+        """Build the seek table of a file.
+
+        Parameters
+        ----------
+        filename : `str`
+            The FITS file to index.
+
+        Returns
+        -------
+        table : `FitsSeekTable`
+            The seek table.
+
+        Raises
+        ------
+        ValueError
+            Raised if the file is not a valid FITS file.
+        """
+        entries = []
+        with open(filename, "rb") as f:
+            fileSize = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset < fileSize:
+                cards = {}
+                headerSize = 0
+                done = False
+                while not done:
+                    block = os.pread(f.fileno(), BLOCK_SIZE, offset + headerSize)
+                    if len(block) < BLOCK_SIZE:
+                        raise ValueError(f"Truncated header at byte {offset + headerSize} of {filename}.")
+                    headerSize += BLOCK_SIZE
+                    for start in range(0, BLOCK_SIZE, CARD_SIZE):
+                        card = block[start:start + CARD_SIZE]
+                        keyword = card[:8].rstrip()
+                        if keyword == b"END":
+                            done = True
+                            break
+                        if keyword in (b"SIMPLE", b"XTENSION", b"BITPIX", b"GROUPS", b"PCOUNT", b"GCOUNT",
+                                       b"CCDNUM") or keyword.startswith(b"NAXIS"):
+                            cards.setdefault(keyword.decode(), _parseValue(card))
+                if not entries and "SIMPLE" not in cards:
+                    raise ValueError(f"{filename} is not a FITS file.")
+
+                naxis = cards.get("NAXIS", 0)
+                axes = [cards.get(f"NAXIS{i}", 0) for i in range(1, naxis + 1)]
+                if cards.get("GROUPS") is True and axes and axes[0] == 0:
+                    # Random groups: NAXIS1 is a placeholder.
+                    axes = axes[1:]
+                nPixels = math.prod(axes) if naxis else 0
+                bytesPerValue = abs(cards.get("BITPIX", 8))//8
+                nBytes = bytesPerValue*cards.get("GCOUNT", 1)*(cards.get("PCOUNT", 0) + nPixels)
+                dataSize = -(-nBytes//BLOCK_SIZE)*BLOCK_SIZE
+                ccdnum = cards.get("CCDNUM")
+                entries.append(HduEntry(offset, headerSize, offset + headerSize, dataSize,
+                                        ccdnum if isinstance(ccdnum, int) else None))
+                offset += headerSize + dataSize
+        return cls(filename, entries)
+
+    def detectorIndex(self):
+        """Return the mapping of detector to HDU.
+
+        Returns
+        -------
+        index : `dict` [`int`, `int`]
+            Mapping of ``CCDNUM`` to the first HDU with that value.
+        """
+        if self._detectorIndex is None:
+            index = {}
+            for hdu, entry in enumerate(self.entries):
+                if entry.ccdnum is not None:
+                    index.setdefault(entry.ccdnum, hdu)
+            self._detectorIndex = index
+        return self._detectorIndex
+
+    def readBytes(self, hdu, includeData=True):
+        """Read the raw bytes of one HDU.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU, counting the primary HDU as 0.
+        includeData : `bool`, optional
+            Read the data as well as the header?
+
+        Returns
+        -------
+        data : `bytes`
+            The header (and data) blocks of the HDU.
+        """
+        entry = self.entries[hdu]
+        size = entry.headerSize + (entry.dataSize if includeData else 0)
+        fd = os.open(self.filename, os.O_RDONLY)
+        try:
+            return os.pread(fd, size, entry.headerOffset)
+        finally:
+            os.close(fd)
+
+    def readCards(self, hdu):
+        """Read the header cards of one HDU without afw.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU, counting the primary HDU as 0.
+
+        Returns
+        -------
+        cards : `dict` [`str`, `object`]
+            The first value of each keyword, parsed as described for the
+            values needed to walk the file structure; other values (e.g.
+            floats) are returned as their stripped text.
+        """
+        header = self.readBytes(hdu, includeData=False)
+        cards = {}
+        for start in range(0, len(header), CARD_SIZE):
+            card = header[start:start + CARD_SIZE]
+            keyword = card[:8].rstrip()
+            if keyword == b"END":
+                break
+            cards.setdefault(keyword.decode("ascii", errors="replace"), _parseValue(card))
+        return cards
+
+    def makeMemFile(self, hdu, includeData=True):
+        """Extract one HDU into an in-memory FITS file.
+
+        The in-memory file holds the primary HDU of this file followed by
+        the requested HDU, so that afw can read it (including merging the
+        primary header into extensions with ``INHERIT = T``) as HDU 1.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU to extract; must not be 0.
+        includeData : `bool`, optional
+            Extract the data of the HDU as well as its header?  cfitsio only
+            reads the header of the last HDU of a file when asked for its
+            metadata, so the file need not hold the data then.
+
+        Returns
+        -------
+        manager : `lsst.afw.fits.MemFileManager`
+            The in-memory FITS file.
+        """
+        if hdu == 0:
+            raise ValueError("The primary HDU is always included; request an extension.")
+        primarySize = self.entries[0].headerSize + self.entries[0].dataSize
+        entry = self.entries[hdu]
+        size = primarySize + entry.headerSize + (entry.dataSize if includeData else 0)
+        # Both HDUs are read straight into the buffer of one BytesIO, whose
+        # getvalue returns that buffer without copying it, so the only copy
+        # is the one into the MemFileManager.
+        stream = io.BytesIO(bytes(size))
+        with stream.getbuffer() as view, open(self.filename, "rb", buffering=0) as f:
+            nRead = os.preadv(f.fileno(), [view[:primarySize]], 0)
+            nRead += os.preadv(f.fileno(), [view[primarySize:]], entry.headerOffset)
+        if nRead != size:
+            raise ValueError(f"Truncated HDU {hdu} in {self.filename}.")
+        manager = lsst.afw.fits.MemFileManager(size)
+        manager.setData(stream.getvalue(), size)
+        return manager
+
+    def readMetadata(self, hdu):
+        """Read the header of one HDU with afw.
+
+        Only the header blocks of this HDU and the primary HDU are read.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU to read; must not be 0.
+
+        Returns
+        -------
+        metadata : `lsst.daf.base.PropertyList`
+            The header, as `lsst.afw.fits.readMetadata` would return it.
+        """
+        return lsst.afw.fits.readMetadata(self.makeMemFile(hdu, includeData=False), 1)
+
+    def parseMetadata(self, hdu):
+        """Parse the header of one HDU from its bytes, without afw.
+
+        Only the header blocks of this HDU and of the primary HDU (which is
+        parsed once per table) are read; the file is not opened with cfitsio
+        and no HDUs are walked.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU to read; must not be 0.
+
+        Returns
+        -------
+        metadata : `lsst.daf.base.PropertyList`
+            The header, as `lsst.afw.fits.readMetadata` would return it.
+
+        Raises
+        ------
+        lsst.obs.decam.fitsHeader.UnsupportedHeaderError
+            Raised if a header uses a construct that is not parsed exactly
+            as afw would parse it; use `readMetadata` instead.
+        """
+        if hdu == 0:
+            raise ValueError("The primary HDU is always included; request an extension.")
+        if self._primary is None:
+            self._primary = parseHeader(self.readBytes(0, includeData=False))
+        return parseExtensionHeader(self.readBytes(hdu, includeData=False), self._primary)
+
+    def readImage(self, hdu, dtype=lsst.afw.image.ImageI):
+        """Read the image in one HDU with afw.
+
+        Parameters
+        ----------
+        hdu : `int`
+            Index of the HDU to read; must not be 0.
+        dtype : `type`, optional
+            The afw image class to read into.
+
+        Returns
+        -------
+        image : `lsst.afw.image.Image`
+            The image.
+        """
+        return dtype.readFits(self.makeMemFile(hdu), 1)
+
+
+_seekTables = OrderedDict()
+_seekTablesLock = threading.Lock()
+_MAX_SEEK_TABLES = 256
+
+
+def getSeekTable(filename):
+    """Return the seek table of a file, building it only if the file has
+    not been seen before or has changed since it was.
+
+    Parameters
+    ----------
+    filename : `str`
+        The FITS file.
+
+    Returns
+    -------
+    table : `FitsSeekTable`
+        The seek table.
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _seekTablesLock:
+        cached = _seekTables.get(path)
+        if cached is not None and cached[0] == key:
+            _seekTables.move_to_end(path)
+            return cached[1]
+    table = FitsSeekTable.fromFile(path)
+    with _seekTablesLock:
+        _seekTables[path] = (key, table)
+        _seekTables.move_to_end(path)
+        while len(_seekTables) > _MAX_SEEK_TABLES:
+            _seekTables.popitem(last=False)
+    return table
+
+
+def isSeekTableEnabled():
+    """Return whether raws should be read through their seek table.
+
+    This is enabled by setting the ``OBS_DECAM_SEEK_TABLE`` environment
+    variable to anything other than ``0``.
+
+    Returns
+    -------
+    enabled : `bool`
+        Whether seek-table reads are enabled.
+    """
+    return os.environ.get(SEEK_TABLE_ENV, "0") not in ("", "0")
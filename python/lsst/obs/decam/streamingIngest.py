@@ -0,0 +1,242 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Ingest DECam raws as they arrive in a directory.
+"""
+
+__all__ = ("StreamingIngester",)
+
+import asyncio
+import collections
+import fnmatch
+import logging
+import os
+import time
+
+from .instrumentation import getMetrics
+from .rawIngest import DecamRawIngestTask
+
+_LOG = logging.getLogger(__name__)
+
+
+class StreamingIngester:
+    """Watch a drop directory and ingest each raw as soon as it has landed.
+
+    The directory is polled, so it works on any file system.  A file is
+    taken to have landed once its size and modification time have not
+    changed for ``settleTime`` seconds; files whose names start with ``.``
+    are ignored, so writers can also create a hidden file and rename it
+    when it is complete.  Landed files are put on a bounded queue and
+    ingested one at a time with `~lsst.obs.decam.DecamRawIngestTask`; while
+    the queue is full the directory is not polled, so a slow registry
+    holds new files back rather than letting work pile up in memory.
+
+    The latency of each file, from when it was first seen to when it is
+    registered, is logged and recorded (as ``streamingIngest.latency``, with
+    the time spent in ingest itself as ``streamingIngest.ingest``) in the
+    metrics registry of `lsst.obs.decam.instrumentation`, if enabled, and
+    in `latencies`, which keeps only the most recent files.
+
+    A file is only marked as done once it has been ingested, so files that
+    are still queued when the ingester stops are picked up by the next run;
+    files whose datasets are already in the run (such as one that was being
+    ingested when the previous run stopped) are skipped.  Files that fail
+    to ingest are recorded in `failed`, and retried once their size or
+    modification time changes.  What is remembered about each file is
+    forgotten when it leaves the directory, so the memory used is bounded
+    by the number of files in it.
+
+    Parameters
+    ----------
+    butler : `lsst.daf.butler.Butler`
+        Writeable butler to ingest into; the instrument must already be
+        registered.
+    directory : `str`
+        The drop directory to watch.
+    pattern : `str`, optional
+        Shell-style pattern of the file names to ingest.
+    run : `str`, optional
+        The run to ingest into; the instrument's default raw run if not
+        given.
+    transfer : `str`, optional
+        The ingest transfer mode.
+    pollInterval : `float`, optional
+        Seconds between polls of the directory.
+    settleTime : `float`, optional
+        Seconds a file has to be unchanged for to be ingested.
+    queueSize : `int`, optional
+        Maximum number of landed files waiting to be ingested.
+    maxLatencies : `int`, optional
+        Number of recent latencies to keep in `latencies`.
+    """
+
+    def __init__(self, butler, directory, *, pattern="*.fits*", run=None, transfer="direct",
+                 pollInterval=1.0, settleTime=2.0, queueSize=8, maxLatencies=1000):
+        self.directory = directory
+        self.pattern = pattern
+        self.run = run
+        self.pollInterval = pollInterval
+        self.settleTime = settleTime
+        self.queueSize = queueSize
+        config = DecamRawIngestTask.ConfigClass()
+        config.transfer = transfer
+        self.task = DecamRawIngestTask(config=config, butler=butler)
+        # The (path, latency) of the most recently ingested files.
+        self.latencies = collections.deque(maxlen=maxLatencies)
+        self.failed = set()
+        # Version of each file that is settling, and when it was first seen
+        # and last changed.
+        self._seen = {}
+        # Version of each file that has landed and is waiting to be, or
+        # being, ingested.
+        self._landed = {}
+        # Version of each file that has been ingested, or failed to be.
+        self._done = {}
+        # Created by serve, in the event loop it runs in.
+        self._stop = None
+
+    def _poll(self):
+        """Return the files that have landed since the last poll.
+
+        Returns
+        -------
+        landed : `list` [`tuple` [`str`, `float`]]
+            The path of each landed file, and the (monotonic) time it was
+            first seen.
+        """
+        now = time.monotonic()
+        landed = []
+        present = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if (entry.name.startswith(".") or not fnmatch.fnmatch(entry.name, self.pattern)
+                        or not entry.is_file()):
+                    continue
+                present.add(entry.path)
+                if entry.path in self._landed:
+                    continue
+                stat = entry.stat()
+                version = (stat.st_size, stat.st_mtime_ns)
+                done = self._done.get(entry.path)
+                if done is not None:
+                    if done == version or entry.path not in self.failed:
+                        continue
+                    # A file that failed has been replaced; try it again.
+                    _LOG.info("Retrying %s, which has changed since it failed to ingest.", entry.path)
+                    del self._done[entry.path]
+                    self.failed.discard(entry.path)
+                firstSeen, lastVersion, lastChanged = self._seen.get(entry.path, (now, None, now))
+                if version != lastVersion:
+                    self._seen[entry.path] = (firstSeen, version, now)
+                elif now - lastChanged >= self.settleTime:
+                    del self._seen[entry.path]
+                    self._landed[entry.path] = version
+                    landed.append((entry.path, firstSeen))
+        # Forget the files that have left the directory.
+        for state in (self._seen, self._landed, self._done):
+            for path in state.keys() - present:
+                del state[path]
+        self.failed &= present
+        return sorted(landed, key=lambda item: item[1])
+
+    async def _watch(self, queue):
+        while not self._stop.is_set():
+            for item in self._poll():
+                # Blocks while the queue is full.
+                await queue.put(item)
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.pollInterval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _ingest(self, path):
+        # A file may have been ingested already by a run that stopped before
+        # it was marked as done.
+        return self.task.run([path], run=self.run, skip_existing_exposures=True)
+
+    def _markDone(self, path):
+        """Record that a landed file has been ingested, or failed to be."""
+        version = self._landed.pop(path, None)
+        if version is not None:
+            self._done[path] = version
+
+    async def _consume(self, queue, maxFiles):
+        loop = asyncio.get_running_loop()
+        count = 0
+        while True:
+            path, firstSeen = await queue.get()
+            start = time.monotonic()
+            try:
+                refs = await loop.run_in_executor(None, self._ingest, path)
+            except Exception as e:
+                _LOG.error("Failed to ingest %s: %s", path, e)
+                self._markDone(path)
+                self.failed.add(path)
+                metrics = getMetrics()
+                if metrics is not None:
+                    metrics.event("streamingIngestFailure", filename=path, error=str(e))
+            else:
+                self._markDone(path)
+                end = time.monotonic()
+                latency = end - firstSeen
+                self.latencies.append((path, latency))
+                metrics = getMetrics()
+                if metrics is not None:
+                    metrics.addTiming("streamingIngest.latency", latency)
+                    metrics.addTiming("streamingIngest.ingest", end - start)
+                _LOG.info("Ingested %d datasets from %s in %.2f s (%.2f s after it was first seen).",
+                          len(refs), path, end - start, latency)
+            finally:
+                queue.task_done()
+            count += 1
+            if maxFiles is not None and count >= maxFiles:
+                self.stop()
+                return
+
+    async def serve(self, maxFiles=None):
+        """Watch the directory and ingest files until stopped.
+
+        Parameters
+        ----------
+        maxFiles : `int`, optional
+            Stop after this many files have been processed (successfully or
+            not); run until `stop` is called if not given.
+        """
+        self._stop = asyncio.Event()
+        queue = asyncio.Queue(maxsize=self.queueSize)
+        watcher = asyncio.create_task(self._watch(queue))
+        consumer = asyncio.create_task(self._consume(queue, maxFiles))
+        try:
+            await self._stop.wait()
+        finally:
+            # A file that is being ingested is finished by its executor
+            # thread; files still in the queue are left for the next run,
+            # which will see them land again.
+            watcher.cancel()
+            consumer.cancel()
+            await asyncio.gather(watcher, consumer, return_exceptions=True)
+            self._landed.clear()
+
+    def stop(self):
+        """Stop watching the directory once the current file is ingested.
+        """
+        if self._stop is not None:
+            self._stop.set()
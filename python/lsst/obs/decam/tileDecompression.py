@@ -0,0 +1,234 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Multi-threaded decompression of fpack-compressed DECam images.
+"""
+
+__all__ = ("TileDecompressor", "getTileDecompressor")
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import astropy.io.fits
+import numpy as np
+from astropy.io.fits.hdu.compressed._codecs import Rice1
+
+import lsst.afw.image
+import lsst.geom
+
+# Environment variable giving the number of threads to decompress raws with.
+DECOMPRESS_THREADS_ENV = "OBS_DECAM_DECOMPRESS_THREADS"
+
+# Descriptor types of the COMPRESSED_DATA column, by TFORM code.
+_DESCRIPTOR_TYPES = {"P": ">i4", "Q": ">i8"}
+
+
+def _compressionParameter(header, name, default):
+    """Return a ``ZNAMEi``/``ZVALi`` compression parameter."""
+    i = 1
+    while f"ZNAME{i}" in header:
+        if header[f"ZNAME{i}"].upper() == name:
+            return header[f"ZVAL{i}"]
+        i += 1
+    return default
+
+
+def _riceLayout(header):
+    """Return how to decode a tile-compressed HDU, or `None` if it is not
+    stored the way fpack stores DECam raws.
+
+    The tiles must be lossless ``RICE_1``-compressed integers, spanning the
+    full width of the image, with ``COMPRESSED_DATA`` the only column.
+
+    Parameters
+    ----------
+    header : `astropy.io.fits.Header`
+        The header of the HDU, read as a binary table.
+
+    Returns
+    -------
+    layout : `dict` or `None`
+        The image shape, tile height, Rice parameters, ``BZERO``, and the
+        descriptor type and heap start of the table.
+    """
+    if (header.get("ZIMAGE") is not True or header.get("ZCMPTYPE") != "RICE_1"
+            or header.get("ZBITPIX") not in (16, 32) or header.get("ZNAXIS") != 2
+            or header.get("TFIELDS") != 1 or header.get("TTYPE1") != "COMPRESSED_DATA"
+            or "ZBLANK" in header or header.get("BSCALE", 1) != 1):
+        return None
+    tform = header["TFORM1"].lstrip("1")
+    if tform[:1] not in _DESCRIPTOR_TYPES or tform[1:2] != "B":
+        return None
+    width, height = header["ZNAXIS1"], header["ZNAXIS2"]
+    if header.get("ZTILE1", width) != width:
+        return None
+    bzero = header.get("BZERO", 0)
+    if bzero != int(bzero):
+        return None
+    return dict(
+        shape=(height, width),
+        tileRows=header.get("ZTILE2", 1),
+        blocksize=_compressionParameter(header, "BLOCKSIZE", 32),
+        bytepix=_compressionParameter(header, "BYTEPIX", 4),
+        bzero=np.int32(bzero),
+        descriptorType=_DESCRIPTOR_TYPES[tform[0]],
+        nTiles=header["NAXIS2"],
+        heapStart=header.get("THEAP", header["NAXIS1"]*header["NAXIS2"]),
+    )
+
+
+class TileDecompressor:
+    """Decompress the tiles of fpack-compressed image HDUs in parallel.
+
+    The compressed table of each HDU is read once, and its tiles are split
+    into bands that are decoded on a pool of threads.  Each tile is decoded
+    by astropy's ``RICE_1`` codec, which releases the GIL, and written
+    straight into its rows of the output `~lsst.afw.image.ImageI`, with
+    ``BZERO`` added on the way; the only other buffers are the size of one
+    tile.  HDUs that are not compressed as DECam raws are (see
+    `_riceLayout`) are read by afw.
+
+    Parameters
+    ----------
+    nThreads : `int`
+        Number of decompression threads.
+    minRowsPerTask : `int`, optional
+        Smallest band, in rows, to hand to one thread; bands are rounded up
+        to whole tiles.
+    """
+
+    def __init__(self, nThreads, minRowsPerTask=128):
+        self.nThreads = nThreads
+        self.minRowsPerTask = minRowsPerTask
+        self._executor = ThreadPoolExecutor(nThreads, thread_name_prefix="decamDecompress")
+
+    def readImage(self, filename, hdu):
+        """Read one image HDU.
+
+        Parameters
+        ----------
+        filename : `str`
+            File to read.
+        hdu : `int`
+            Index of the HDU to read, counting the primary HDU as 0.
+
+        Returns
+        -------
+        image : `lsst.afw.image.ImageI`
+            The image in that HDU.
+        """
+        return self.readImages(filename, [hdu])[0]
+
+    def readImages(self, filename, hdus):
+        """Read several image HDUs of one file, decompressing all of their
+        tiles on the same thread pool.
+
+        Parameters
+        ----------
+        filename : `str`
+            File to read.
+        hdus : `list` [`int`]
+            Indices of the HDUs to read, counting the primary HDU as 0.
+
+        Returns
+        -------
+        images : `list` [`lsst.afw.image.ImageI`]
+            The images, in the same order as ``hdus``.
+        """
+        images = []
+        tasks = []
+        with (astropy.io.fits.open(filename, memmap=False, lazy_load_hdus=True,
+                                   disable_image_compression=True) as hduList,
+              open(filename, "rb") as f):
+            for hdu in hdus:
+                header = hduList[hdu].header
+                layout = _riceLayout(header)
+                if layout is None:
+                    images.append(lsst.afw.image.ImageI(filename, hdu))
+                    continue
+                height, width = layout["shape"]
+                image = lsst.afw.image.ImageI(width, height)
+                if "CRVAL1A" in header and "CRVAL2A" in header:
+                    # This is how afw persists XY0.
+                    image.setXY0(lsst.geom.Point2I(int(header["CRVAL1A"]), int(header["CRVAL2A"])))
+                images.append(image)
+
+                info = hduList[hdu].fileinfo()
+                f.seek(info["datLoc"])
+                table = f.read(info["datSpan"])
+                descriptors = np.frombuffer(table, dtype=layout["descriptorType"],
+                                            count=2*layout["nTiles"]).reshape(-1, 2)
+                tileRows = layout["tileRows"]
+                tilesPerTask = max(1, -(-self.minRowsPerTask // tileRows))
+                for firstTile in range(0, layout["nTiles"], tilesPerTask):
+                    tasks.append((image.array, table, descriptors, layout,
+                                  range(firstTile, min(firstTile + tilesPerTask, layout["nTiles"]))))
+
+        # Consume the results so that worker exceptions are raised.
+        for _ in self._executor.map(lambda task: self._decodeTiles(*task), tasks):
+            pass
+        return images
+
+    @staticmethod
+    def _decodeTiles(array, table, descriptors, layout, tiles):
+        """Decode tiles of one HDU into their rows of ``array``."""
+        height, width = layout["shape"]
+        tileRows = layout["tileRows"]
+        for tile in tiles:
+            y0 = tile*tileRows
+            y1 = min(y0 + tileRows, height)
+            nBytes, offset = (int(value) for value in descriptors[tile])
+            start = layout["heapStart"] + offset
+            codec = Rice1(blocksize=layout["blocksize"], bytepix=layout["bytepix"],
+                          tilesize=(y1 - y0)*width)
+            compressed = np.frombuffer(table, dtype=np.uint8, count=nBytes, offset=start)
+            values = codec.decode(compressed).reshape(y1 - y0, width)
+            np.add(values, layout["bzero"], out=array[y0:y1], casting="unsafe")
+
+
+_defaultDecompressor = None
+_defaultDecompressorLock = threading.Lock()
+
+
+def getTileDecompressor():
+    """Return the process-wide `TileDecompressor`, if one is enabled.
+
+    Multi-threaded decompression is enabled by setting the
+    ``OBS_DECAM_DECOMPRESS_THREADS`` environment variable to the number of
+    threads to use.
+
+    Returns
+    -------
+    decompressor : `TileDecompressor` or `None`
+        The shared decompressor, or `None` if multi-threaded decompression
+        is not enabled.
+    """
+    global _defaultDecompressor
+    nThreads = int(os.environ.get(DECOMPRESS_THREADS_ENV) or 0)
+    if nThreads <= 1:
+        return None
+    with _defaultDecompressorLock:
+        if _defaultDecompressor is None or _defaultDecompressor.nThreads != nThreads:
+            if _defaultDecompressor is not None:
+                _defaultDecompressor._executor.shutdown(wait=False)
+            _defaultDecompressor = TileDecompressor(nThreads)
+        return _defaultDecompressor
@@ -0,0 +1,103 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the binary form of lookup-table linearizers.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+from lsst.ip.isr import Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.binaryLinearizer import readBinaryLinearizer, writeBinaryLinearizer
+
+
+class BinaryLinearizerTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "1970-01-01T00:00:00.npy")
+        detector = DarkEnergyCamera().getCamera()[10]
+        adu = np.arange(1000, dtype=np.float32)
+        self.linearizer = Linearizer(table=np.stack([1e-6*adu**2, -2e-6*adu**2]))
+        for i, amp in enumerate(detector):
+            self.linearizer.ampNames.append(amp.getName())
+            self.linearizer.linearityType[amp.getName()] = "LookupTable"
+            self.linearizer.linearityCoeffs[amp.getName()] = np.array([i, 0])
+            self.linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+            self.linearizer.fitParams[amp.getName()] = np.array([])
+            self.linearizer.fitParamsErr[amp.getName()] = np.array([])
+            self.linearizer.fitChiSq[amp.getName()] = np.nan
+            self.linearizer.fitResiduals[amp.getName()] = np.array([])
+            self.linearizer.linearFit[amp.getName()] = np.array([])
+        self.linearizer.updateMetadata(detector=detector, CALIBDATE="1970-01-01T00:00:00", setCalibId=True)
+        self.linearizer.hasLinearity = True
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def testRoundTrip(self):
+        writeBinaryLinearizer(self.linearizer, self.filename)
+        self.assertTrue(os.path.exists(self.filename.replace(".npy", ".json")))
+        for mmap in (True, False):
+            with self.subTest(mmap=mmap):
+                linearizer = readBinaryLinearizer(self.filename, mmap=mmap)
+                self.assertEqual(linearizer, self.linearizer)
+                self.assertEqual(linearizer.tableData.dtype, np.float32)
+                self.assertEqual(isinstance(linearizer.tableData, np.memmap), mmap)
+                self.assertEqual(linearizer.getMetadata()["DETECTOR"], 10)
+
+    def testMatchesYaml(self):
+        """The binary form should read back as the same linearizer as the
+        YAML form.
+        """
+        yamlFile = os.path.join(self.tempdir.name, "linearizer.yaml")
+        self.linearizer.writeText(yamlFile)
+        writeBinaryLinearizer(Linearizer.readText(yamlFile), self.filename)
+        self.assertEqual(readBinaryLinearizer(self.filename), Linearizer.readText(yamlFile))
+
+    def testUnknownFormat(self):
+        writeBinaryLinearizer(self.linearizer, self.filename)
+        sidecar = self.filename.replace(".npy", ".json")
+        with open(sidecar) as f:
+            content = json.load(f)
+        content["binaryFormat"] = 99
+        with open(sidecar, "w") as f:
+            json.dump(content, f)
+        with self.assertRaises(RuntimeError):
+            readBinaryLinearizer(self.filename)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
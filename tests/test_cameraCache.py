@@ -0,0 +1,173 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the persisted DECam camera geometry.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.utils.tests
+from lsst.afw.cameraGeom import FOCAL_PLANE, PIXELS
+from lsst.obs.decam.cameraCache import (buildCamera, hashCameraSources, loadCamera, readPersistedCamera,
+                                        writePersistedCamera)
+from lsst.obs.decam.lazyCamera import LazyCamera, splitCameraConfig
+from lsst.utils import getPackageDir
+
+
+class PersistedCameraTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "camGeom")
+        shutil.copytree(os.path.join(getPackageDir("obs_decam"), "decam", "camGeom"), self.path,
+                        ignore=shutil.ignore_patterns("persistedCamera.*"))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def assertCamerasEqual(self, camera, expected):
+        self.assertEqual(camera.getName(), expected.getName())
+        self.assertEqual([d.getId() for d in camera], [d.getId() for d in expected])
+        for detector in expected:
+            self.assertDetectorsEqual(camera[detector.getId()], detector)
+
+    def assertDetectorsEqual(self, other, detector):
+        self.assertEqual(other.getName(), detector.getName())
+        self.assertEqual(other.getSerial(), detector.getSerial())
+        self.assertEqual(other.getType(), detector.getType())
+        self.assertEqual(other.getBBox(), detector.getBBox())
+        self.assertEqual([amp.getName() for amp in other], [amp.getName() for amp in detector])
+        for amp, expectedAmp in zip(other, detector):
+            self.assertEqual(amp.getRawBBox(), expectedAmp.getRawBBox())
+            self.assertEqual(amp.getGain(), expectedAmp.getGain())
+        center = detector.getCenter(PIXELS)
+        self.assertPairsAlmostEqual(other.transform(center, PIXELS, FOCAL_PLANE),
+                                    detector.transform(center, PIXELS, FOCAL_PLANE))
+
+    def test_roundTrip(self):
+        self.assertIsNone(readPersistedCamera(self.path))
+        expected = writePersistedCamera(self.path)
+        self.assertCamerasEqual(readPersistedCamera(self.path), expected)
+        self.assertCamerasEqual(buildCamera(self.path), expected)
+
+    def test_outOfDate(self):
+        writePersistedCamera(self.path)
+        with open(os.path.join(self.path, "camera.py"), "a") as f:
+            f.write("\n# Changed.\n")
+        self.assertIsNone(readPersistedCamera(self.path))
+
+    def test_sourceStat(self):
+        """Test that the sources are only hashed if their sizes or
+        modification times have changed.
+        """
+        expected = writePersistedCamera(self.path)
+        with unittest.mock.patch("lsst.obs.decam.cameraCache.hashCameraSources",
+                                 wraps=hashCameraSources) as hashSources:
+            self.assertCamerasEqual(readPersistedCamera(self.path), expected)
+            hashSources.assert_not_called()
+            # Touched but unchanged sources are still up to date.
+            filename = os.path.join(self.path, "camera.py")
+            stat = os.stat(filename)
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertCamerasEqual(readPersistedCamera(self.path), expected)
+            hashSources.assert_called_once()
+
+    def test_cacheDir(self):
+        with tempfile.TemporaryDirectory() as cacheDir:
+            with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_CAMERA_CACHE_DIR": cacheDir}):
+                expected = loadCamera(self.path)
+                entries = os.listdir(cacheDir)
+                self.assertEqual(len(entries), 1)
+                persistedPath = os.path.join(cacheDir, entries[0])
+                self.assertCamerasEqual(readPersistedCamera(self.path, persistedPath=persistedPath), expected)
+                with unittest.mock.patch("lsst.obs.decam.cameraCache.buildCamera") as build:
+                    self.assertCamerasEqual(loadCamera(self.path), expected)
+                    build.assert_not_called()
+
+                # A changed definition gets a new entry.
+                with open(os.path.join(self.path, "camera.py"), "a") as f:
+                    f.write("\n# Changed.\n")
+                loadCamera(self.path)
+                self.assertEqual(len(os.listdir(cacheDir)), 2)
+
+    def test_lazyCamera(self):
+        camera = LazyCamera(self.path)
+        expected = buildCamera(self.path)
+        self.assertEqual(len(camera), len(expected))
+        self.assertEqual(list(camera.getIdIter()), [d.getId() for d in expected])
+        self.assertEqual(list(camera.getNameIter()), [d.getName() for d in expected])
+        with unittest.mock.patch("lsst.obs.decam.lazyCamera.loadCamera") as load:
+            for key in (1, 62, "N4"):
+                self.assertIn(key, camera)
+                self.assertDetectorsEqual(camera[key], expected[key])
+            self.assertIs(camera[1], camera["S29"])
+            load.assert_not_called()
+        self.assertNotIn(70, camera)
+        with self.assertRaises(LookupError):
+            camera[70]
+        # Anything else is delegated to the full camera.
+        self.assertEqual(camera.getName(), expected.getName())
+        self.assertCamerasEqual(camera, expected)
+
+    def test_splitCameraConfig(self):
+        """Test that detector statements spanning several lines are split
+        whole, and that mixed lines are rejected.
+        """
+        text = ("config.plateScale = 17.575\n"
+                "# Name of the detector\n"
+                "config.detectorList[0].name = (\n"
+                "    'S29')\n"
+                "config.detectorList[0].id = 1\n"
+                "config.detectorList[0].crosstalk = [\n"
+                "    0.0, 1.0,\n"
+                "    2.0, 3.0]\n"
+                "config.detectorList[1].name = 'S30'\n"
+                "config.detectorList[1].id = 2\n")
+        common, detectors, ids, names = splitCameraConfig(text)
+        self.assertEqual(common, "config.plateScale = 17.575\n")
+        self.assertEqual(detectors[0], "".join(text.splitlines(keepends=True)[1:8]))
+        self.assertEqual(ids, {1: 0, 2: 1})
+        self.assertEqual(names, {"S29": 0, "S30": 1})
+        with self.assertRaises(ValueError):
+            splitCameraConfig("config.detectorList[0].id = 1; config.detectorList[1].id = 2\n")
+
+        with open(os.path.join(self.path, "camera.py")) as f:
+            text = f.read()
+        common, detectors, ids, names = splitCameraConfig(text)
+        self.assertEqual(len(detectors), 62)
+        self.assertEqual(sorted(common.splitlines() + "".join(detectors.values()).splitlines()),
+                         sorted(text.splitlines()))
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
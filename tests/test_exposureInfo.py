@@ -0,0 +1,86 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of reading the observation metadata of a whole exposure at once.
+"""
+
+import os
+import unittest
+
+from astro_metadata_translator import DecamTranslator, ObservationInfo
+
+import lsst.afw.fits
+import lsst.utils.tests
+from lsst.obs.decam.exposureInfo import DETECTOR_PROPERTIES, readExposureMetadata
+from lsst.obs.decam.metadataCache import fixDetectorHeader
+
+testDataPackage = "testdata_decam"
+try:
+    testDataDirectory = lsst.utils.getPackageDir(testDataPackage)
+except LookupError:
+    testDataDirectory = None
+
+
+@unittest.skipIf(testDataDirectory is None, "testdata_decam must be set up")
+class ExposureMetadataTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.filename = os.path.join(testDataDirectory, "rawData", "raw",
+                                     "c4d_150227_012718_ori-stripped.fits.fz")
+
+    def test_matches_full_translation(self):
+        metadata = readExposureMetadata(self.filename)
+        self.assertEqual(len(metadata), 62)
+        for hdu, obsInfo in zip(metadata.columns["hdu"], metadata):
+            header = lsst.afw.fits.readMetadata(self.filename, hdu)
+            fixDetectorHeader(self.filename, header)
+            expected = ObservationInfo(header, translator_class=DecamTranslator, pedantic=False,
+                                       filename=self.filename)
+            self.assertEqual(obsInfo, expected)
+        self.assertIsNone(metadata.exposure.detector_num)
+        self.assertEqual(metadata.exposure.exposure_id, metadata[0].exposure_id)
+
+    def test_table(self):
+        metadata = readExposureMetadata(self.filename)
+        table = metadata.toTable()
+        self.assertEqual(len(table), len(metadata))
+        self.assertEqual(table.colnames, ["hdu"] + list(DETECTOR_PROPERTIES))
+        self.assertEqual(len(set(table["detector_num"])), len(metadata))
+        self.assertEqual(table.meta["exposure"]["physical_filter"], metadata[0].physical_filter)
+
+    def test_detectors(self):
+        """Test that the same detectors are read as by the translator."""
+        metadata = readExposureMetadata(self.filename)
+        expected = [header["CCDNUM"] for header in
+                    DecamTranslator.determine_translatable_headers(self.filename)]
+        self.assertEqual(list(metadata.toTable()["detector_num"]), expected)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,166 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the fused ISR fast path.
+"""
+
+import os
+import unittest
+import unittest.mock
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.geom
+import lsst.pipe.base as pipeBase
+import lsst.utils.tests
+from lsst.ip.isr import CrosstalkCalib, Defects, IsrTask, Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.fastIsr import UNSUPPORTED_STEPS, DecamFastIsrConfig, DecamFastIsrTask
+from lsst.utils import getPackageDir
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+
+
+def makeConfig(fastPath, filename=None):
+    """Return the ISR config in ``filename`` unmodified, or the test ISR
+    config with the steps the fast path does not support disabled.
+    """
+    config = DecamFastIsrConfig()
+    if filename is not None:
+        config.load(filename)
+    else:
+        config.load(os.path.join(ROOT, "config", "isr.py"))
+        for name in UNSUPPORTED_STEPS:
+            if hasattr(config, name):
+                setattr(config, name, False)
+    config.doFastPath = fastPath
+    return config
+
+
+class DecamFastIsrTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        rng = np.random.Generator(np.random.MT19937(3))
+        detector = DarkEnergyCamera().getCamera()[1]
+        rawBox = lsst.geom.Box2I()
+        for amp in detector:
+            rawBox.include(amp.getRawBBox())
+        raw = lsst.afw.image.ExposureI(rawBox)
+        raw.setDetector(detector)
+        raw.setFilter(lsst.afw.image.FilterLabel(band="g", physical="g DECam SDSS c0001 4720.0 1520.0"))
+        for amp in detector:
+            box = amp.getRawBBox()
+            raw.image[box].array[:] = np.rint(rng.normal(1500.0, 1.0, size=raw.image[box].array.shape))
+            raw.image[amp.getRawDataBBox()].array += np.rint(
+                rng.normal(3000.0, 50.0, size=raw.image[amp.getRawDataBBox()].array.shape)).astype(np.int32)
+        # A saturated star, bright enough to mask the pixels it causes
+        # crosstalk in.
+        dataBox = detector[0].getRawDataBBox()
+        raw.image.array[dataBox.getMinY() + 2000:dataBox.getMinY() + 2004,
+                        dataBox.getMinX() + 500:dataBox.getMinX() + 503] = 65000
+
+        bias = lsst.afw.image.ExposureF(detector.getBBox())
+        bias.image.array[:] = rng.normal(2.0, 0.5, size=bias.image.array.shape)
+        flat = lsst.afw.image.ExposureF(detector.getBBox())
+        flat.image.array[:] = rng.uniform(0.9, 1.1, size=flat.image.array.shape)
+
+        table = np.stack([np.arange(70000)*1e-4, np.arange(70000)*-2e-4]).astype(np.float32)
+        linearizer = Linearizer(table=table)
+        for i, amp in enumerate(detector):
+            linearizer.ampNames.append(amp.getName())
+            linearizer.linearityType[amp.getName()] = "LookupTable"
+            linearizer.linearityCoeffs[amp.getName()] = np.array([i, 0])
+            linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+        linearizer.hasLinearity = True
+
+        crosstalk = CrosstalkCalib(detector=detector)
+        crosstalk.hasCrosstalk = True
+        crosstalk.nAmp = 2
+        crosstalk.coeffs = np.array([[0.0, 3e-4], [-5e-4, 0.0]])
+        crosstalk.interChip = {}
+        self.inputs = dict(ccdExposure=raw, bias=bias, flat=flat, linearizer=linearizer, crosstalk=crosstalk,
+                           defects=Defects(), fringes=pipeBase.Struct(fringes=None))
+
+    def assertMatchesStandard(self, fast, standard):
+        self.assertEqual(fast.getBBox(), standard.getBBox())
+        np.testing.assert_allclose(fast.image.array, standard.image.array, rtol=1e-5, atol=0.5)
+        np.testing.assert_allclose(fast.variance.array, standard.variance.array, rtol=1e-3)
+        self.assertEqual(fast.mask.getMaskPlaneDict(), standard.mask.getMaskPlaneDict())
+        np.testing.assert_array_equal(fast.mask.array, standard.mask.array)
+
+    def test_matches_standard_isr(self):
+        self.inputs["ccdExposure"].getMetadata()["DATASECA"] = "[1:1024,1:4096]"
+        rawArray = self.inputs["ccdExposure"].image.array.copy()
+        standard = DecamFastIsrTask(config=makeConfig(False)).run(**self.inputs).exposure
+        with unittest.mock.patch.object(IsrTask, "run") as standardRun:
+            fast = DecamFastIsrTask(config=makeConfig(True)).run(**self.inputs).exposure
+        standardRun.assert_not_called()
+
+        self.assertMatchesStandard(fast, standard)
+        # The raw exposure is not modified.
+        np.testing.assert_array_equal(self.inputs["ccdExposure"].image.array, rawArray)
+        self.assertIn("DATASECA", self.inputs["ccdExposure"].getMetadata())
+        self.assertNotIn("DATASECA", fast.getMetadata())
+
+    def test_decam_config(self):
+        """Test that the fast path is used with the DECam ISR config, and
+        gives the same saturation, crosstalk and interpolation masks as the
+        standard ISR.
+        """
+        filename = os.path.join(getPackageDir("obs_decam"), "config", "isr.py")
+        standard = DecamFastIsrTask(config=makeConfig(False, filename)).run(**self.inputs)
+        with unittest.mock.patch.object(IsrTask, "run") as standardRun:
+            fast = DecamFastIsrTask(config=makeConfig(True, filename)).run(**self.inputs)
+        standardRun.assert_not_called()
+
+        self.assertMatchesStandard(fast.exposure, standard.exposure)
+        mask = fast.exposure.mask
+        for plane in ("SAT", "CROSSTALK", "INTRP", "SUSPECT"):
+            self.assertTrue(np.any(mask.array & mask.getPlaneBitMask(plane)), msg=plane)
+        # The saturation mask is grown.
+        self.assertGreater(np.count_nonzero(mask.array & mask.getPlaneBitMask("SAT")), 12)
+
+    def test_fallback(self):
+        config = makeConfig(True)
+        config.doDark = True
+        with unittest.mock.patch.object(IsrTask, "run") as standardRun:
+            DecamFastIsrTask(config=config).run(**self.inputs)
+        standardRun.assert_called_once()
+
+    def test_fallback_linearizer(self):
+        linearizer = self.inputs["linearizer"]
+        linearizer.linearityType[linearizer.ampNames[0]] = "Polynomial"
+        with unittest.mock.patch.object(IsrTask, "run") as standardRun:
+            DecamFastIsrTask(config=makeConfig(True)).run(**self.inputs)
+        standardRun.assert_called_once()
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,93 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the file-writing utilities.
+"""
+
+import os
+import stat
+import tempfile
+import unittest
+
+import lsst.utils.tests
+from lsst.obs.decam.fileUtils import writeAtomic
+
+
+class WriteAtomicTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "file.txt")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, text):
+        def write(tempName):
+            with open(tempName, "w") as f:
+                f.write(text)
+        return write
+
+    def test_write(self):
+        writeAtomic(self.filename, self.write("first"))
+        writeAtomic(self.filename, self.write("second"))
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), "second")
+        self.assertEqual(os.listdir(self.tempdir.name), ["file.txt"])
+
+    def test_permissions(self):
+        """Test that the file has the permissions of a newly created file,
+        not the owner-only ones of the temporary file.
+        """
+        expected = os.path.join(self.tempdir.name, "expected.txt")
+        with open(expected, "w"):
+            pass
+        writeAtomic(self.filename, self.write("text"))
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode),
+                         stat.S_IMODE(os.stat(expected).st_mode))
+
+    def test_failure(self):
+        """Test that a failed write leaves the old file and no temporary
+        file.
+        """
+        writeAtomic(self.filename, self.write("first"))
+
+        def fail(tempName):
+            self.write("partial")(tempName)
+            raise RuntimeError("Write failed.")
+
+        with self.assertRaises(RuntimeError):
+            writeAtomic(self.filename, fail)
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), "first")
+        self.assertEqual(os.listdir(self.tempdir.name), ["file.txt"])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,112 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of focal-plane crosstalk correction.
+"""
+
+import unittest
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.geom
+import lsst.utils.tests
+from lsst.ip.isr import CrosstalkCalib
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.focalPlaneCrosstalk import FocalPlaneCrosstalk
+
+
+class FocalPlaneCrosstalkTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.camera = DarkEnergyCamera().getCamera()
+        self.detectors = (1, 2, 3)
+        rng = np.random.Generator(np.random.MT19937(5))
+        self.exposures = {}
+        for detectorId in self.detectors:
+            bbox = lsst.geom.Box2I()
+            for amp in self.camera[detectorId]:
+                bbox.include(amp.getRawBBox())
+            exposure = lsst.afw.image.ExposureF(bbox)
+            exposure.image.array[:] = rng.normal(1000.0, 30.0, size=exposure.image.array.shape)
+            exposure.setDetector(self.camera[detectorId])
+            self.exposures[detectorId] = exposure
+
+        self.calibs = {}
+        for detectorId in self.detectors:
+            calib = CrosstalkCalib()
+            calib.hasCrosstalk = True
+            calib.nAmp = 2
+            calib.coeffs = np.array([[0.0, 1e-3*detectorId], [-2e-3, 0.0]])
+            calib.interChip = {}
+            self.calibs[detectorId] = calib
+        self.calibs[1].interChip[self.camera[2].getName()] = np.array([[1e-4, 0.0], [0.0, 2e-4]])
+        self.calibs[2].interChip[self.camera[3].getName()] = np.array([[0.0, -3e-4], [0.0, 0.0]])
+        # Detector 60 is not being corrected, so this is skipped.
+        self.calibs[3].interChip[self.camera[60].getName()] = np.array([[0.0, 1e-4], [0.0, 0.0]])
+
+    def expected(self):
+        """Correct each detector with
+        `lsst.ip.isr.CrosstalkCalib.subtractCrosstalk`, as ISR does: the
+        intra-chip terms, then the inter-chip terms from each source
+        detector.
+        """
+        images = {}
+        for detectorId, calib in self.calibs.items():
+            exposure = self.exposures[detectorId].clone()
+            calib.subtractCrosstalk(exposure, crosstalkCoeffs=calib.coeffs, minPixelToMask=np.inf)
+            for sourceName, coeffs in calib.interChip.items():
+                source = self.exposures.get(self.camera[sourceName].getId())
+                if source is not None:
+                    calib.subtractCrosstalk(exposure, sourceExposure=source, crosstalkCoeffs=coeffs,
+                                            minPixelToMask=np.inf)
+            images[detectorId] = exposure.image.array
+        return images
+
+    def test_apply(self):
+        crosstalk = FocalPlaneCrosstalk.fromCrosstalkCalibs(self.camera, self.calibs)
+        self.assertEqual(len(crosstalk), 9)
+        self.assertEqual(crosstalk.getSources([1]), {1, 2})
+        self.assertEqual(crosstalk.getSources([3]), {3, 60})
+
+        expected = self.expected()
+        corrected = {detectorId: exposure.image.clone() for detectorId, exposure in self.exposures.items()}
+        crosstalk.apply(corrected, chunkRows=100)
+        for detectorId in self.detectors:
+            np.testing.assert_allclose(corrected[detectorId].array, expected[detectorId], rtol=1e-6,
+                                       err_msg=f"Detector {detectorId}")
+
+    def test_integer(self):
+        crosstalk = FocalPlaneCrosstalk.fromCrosstalkCalibs(self.camera, self.calibs)
+        with self.assertRaises(TypeError):
+            crosstalk.apply({1: self.exposures[1].image.array.astype(np.int32)})
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -23,14 +23,23 @@
 HDU a given detector is in in a multi-extension FITS file.
 """
 
+import concurrent.futures
 import contextlib
 import astro_metadata_translator
 import unittest
+import unittest.mock
 import os
 
 import lsst.afw.geom
 import lsst.utils.tests
 import lsst.obs.decam
+import lsst.obs.decam.calibCache
+import lsst.obs.decam.fitsHeader
+import lsst.obs.decam.hduIndex
+import lsst.obs.decam.instrumentation
+import lsst.obs.decam.metadataCache
+import lsst.obs.decam.seekTable
+import lsst.obs.decam.tileDecompression
 import lsst.daf.butler
 import lsst.afw.image
 
@@ -103,6 +112,47 @@ class DarkEnergyCameraRawFormatterTestCase(lsst.utils.tests.TestCase):
         self.assertEqual(expected['CCDNUM'], 1)  # sanity check
         self.check_readMetadata(1, expected)
 
+    def test_readMetadata_cached(self):
+        """Test that cached headers are identical to freshly-read ones."""
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_METADATA_CACHE_SIZE": "10"}):
+            cache = lsst.obs.decam.metadataCache.getMetadataCache()
+            cache.clear()
+            for detector in (25, 1):
+                formatter = lsst.obs.decam.DarkEnergyCameraRawFormatter(
+                    self.fileDescriptor, ref=make_dataset_ref(detector)
+                )
+                first = formatter.read(component="metadata")
+                self.assertIsNotNone(cache.get(self.filename, detector))
+                formatter = lsst.obs.decam.DarkEnergyCameraRawFormatter(
+                    self.fileDescriptor, ref=make_dataset_ref(detector)
+                )
+                second = formatter.read(component="metadata")
+                self.assertEqual(second.toDict(), first.toDict())
+            # Also check against the uncached results.
+            self.test_readMetadata()
+
+    def test_metrics(self):
+        """Test that reads are timed and scan fallbacks recorded when
+        metrics are enabled.
+        """
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_METRICS": "1"}):
+            metrics = lsst.obs.decam.instrumentation.getMetrics()
+            metrics.reset()
+            lsst.obs.decam.hduIndex.getHduIndexCache().clear()
+            # detector 1 is not in its usual HDU, so the file is scanned.
+            formatter = lsst.obs.decam.DarkEnergyCameraRawFormatter(
+                self.fileDescriptor, ref=make_dataset_ref(1)
+            )
+            image = formatter.read(component="image")
+            results = metrics.toDict()
+        self.assertEqual(results["timings"]["raw.readImage"]["count"], 1)
+        self.assertEqual(results["timings"]["raw.scanHdus"]["count"], 1)
+        self.assertEqual(results["counters"]["events.scanFallback"], 1)
+        self.assertEqual(results["events"][0]["detector"], 1)
+        self.assertGreaterEqual(results["counters"]["hdusVisited"], 2)
+        self.assertEqual(results["counters"]["pixelBytes"], image.array.nbytes)
+        self.assertIsNone(lsst.obs.decam.instrumentation.getMetrics())
+
     def test_readMetadata_raises(self):
         formatter = lsst.obs.decam.DarkEnergyCameraRawFormatter(
             self.fileDescriptor, ref=make_dataset_ref(70)
@@ -126,6 +176,41 @@ class DarkEnergyCameraRawFormatterTestCase(lsst.utils.tests.TestCase):
         expected = lsst.afw.image.ImageI(self.filename, 2)
         self.check_readImage(1, expected)
 
+    def test_readImage_threaded(self):
+        """Test that multi-threaded tile decompression reads the same
+        images as afw.
+        """
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_DECOMPRESS_THREADS": "4"}):
+            self.assertIsNotNone(lsst.obs.decam.tileDecompression.getTileDecompressor())
+            self.test_readImage()
+
+    def test_read_seekTable(self):
+        """Test reading through the seek table gives the same results as
+        reading through afw.
+        """
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_SEEK_TABLE": "1"}):
+            self.test_readMetadata()
+            self.test_readMetadata_raises()
+            self.test_readImage()
+
+    def test_read_parseHeaders(self):
+        """Test that the headers of tile-compressed raws, which are not
+        parsed from their bytes, are read through afw with the same results.
+        """
+        for path in (self.filename,
+                     os.path.join(testDataDirectory, 'rawData/raw/c4d_150227_012718_ori-stripped.fits.fz')):
+            table = lsst.obs.decam.seekTable.FitsSeekTable.fromFile(path)
+            for hdu in range(1, len(table)):
+                with self.assertRaises(lsst.obs.decam.fitsHeader.UnsupportedHeaderError):
+                    table.parseMetadata(hdu)
+
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_PARSE_HEADERS": "1", "OBS_DECAM_METRICS": "1"}):
+            metrics = lsst.obs.decam.instrumentation.getMetrics()
+            metrics.reset()
+            self.test_readMetadata()
+            self.test_readMetadata_raises()
+            self.assertGreater(metrics.toDict()["counters"]["headerParseFallbacks"], 0)
+
     def test_readMetadata_full_file(self):
         """Test reading a file with all HDUs, and with all HDUs in a shuffled
         order.
@@ -157,6 +242,70 @@ class DarkEnergyCameraRawFormatterTestCase(lsst.utils.tests.TestCase):
             # the metadata should be the same in both files.
             self.assertEqual(shuffled_metadata.toDict(), full_metadata.toDict())
 
+        # The shuffled file was scanned once and indexed.
+        shuffled_path = os.path.join(testDataDirectory, shuffled_file)
+        index = lsst.obs.decam.hduIndex.getHduIndexCache().get(shuffled_path)
+        self.assertEqual(len(index), 62)
+        for detector in (1, 25, 62):
+            self.assertEqual(lsst.afw.fits.readMetadata(shuffled_path, index[detector])['CCDNUM'], detector)
+
+    def test_fixDetectorHeader(self):
+        """Test that reusing the exposure-level fix-ups gives the same
+        headers, including the fix-up provenance, as fixing up each detector
+        header independently, without running the translator's fix-ups for
+        each detector.
+        """
+        dateKey = "HIERARCH ASTRO METADATA FIX DATE"
+        translatorClass = astro_metadata_translator.DecamTranslator
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_FIXUP_CACHE_SIZE": "4"}):
+            for path in (self.filename,
+                         os.path.join(testDataDirectory,
+                                      'rawData/raw/c4d_150227_012718_ori-stripped.fits.fz')):
+                nFixHeaderCalls = 0
+                for hdu in range(1, lsst.afw.fits.Fits(path, 'r').countHdus()):
+                    expected = lsst.afw.fits.readMetadata(path, hdu)
+                    astro_metadata_translator.fix_header(expected)
+                    metadata = lsst.afw.fits.readMetadata(path, hdu)
+                    with unittest.mock.patch.object(translatorClass, "fix_header",
+                                                    wraps=translatorClass.fix_header) as fixHeader:
+                        lsst.obs.decam.metadataCache.fixDetectorHeader(path, metadata)
+                    nFixHeaderCalls += fixHeader.call_count
+
+                    self.assertTrue(metadata.exists(dateKey))
+                    del metadata[dateKey]
+                    del expected[dateKey]
+                    self.assertEqual(metadata.toDict(), expected.toDict(), msg=f"{path} HDU {hdu}")
+                # The translator's fix-ups are run at most once per file.
+                self.assertLessEqual(nFixHeaderCalls, 1, msg=path)
+
+    def test_rawReader(self):
+        """Test reading several detectors from one file in a single pass,
+        for files in the usual and in a shuffled HDU order.
+        """
+        for path in ('rawData/raw/c4d_150227_012718_ori-stripped.fits.fz',
+                     'rawData/raw/c4d_150227_012718_ori-stripped-shuffled.fits.fz'):
+            location = lsst.daf.butler.Location(testDataDirectory, path)
+            fileDescriptor = lsst.daf.butler.FileDescriptor(location, storageClass)
+            reader = lsst.obs.decam.DarkEnergyCameraRawReader(os.path.join(testDataDirectory, path))
+            detectors = {1, 25, 62}
+            seen = set()
+            for detector, metadata, image in reader.readDetectors(detectors):
+                seen.add(detector)
+                formatter = lsst.obs.decam.DarkEnergyCameraRawFormatter(
+                    fileDescriptor, ref=make_dataset_ref(detector)
+                )
+                expected = formatter.read(component="metadata")
+                _clean_metadata_provenance(metadata)
+                _clean_metadata_provenance(expected)
+                self.assertEqual(metadata.toDict(), expected.toDict())
+                self.assertImagesEqual(image, formatter.read(component="image"))
+            self.assertEqual(seen, detectors)
+
+    def test_rawReader_raises(self):
+        reader = lsst.obs.decam.DarkEnergyCameraRawReader(self.filename)
+        with self.assertRaisesRegex(ValueError, "detectorId=\\[70\\]"):
+            list(reader.readDetectors([1, 70]))
+
 
 @unittest.skipIf(testDataDirectory is None, "testdata_decam must be set up")
 class DarkEnergyCameraCPCalibFormatterTestCase(lsst.utils.tests.TestCase):
@@ -194,6 +343,54 @@ class DarkEnergyCameraCPCalibFormatterTestCase(lsst.utils.tests.TestCase):
             expected = lsst.afw.fits.readMetadata(self.flatFile, i)
             self.check_readMetadata(i, expected, self.flatDescriptor)
 
+    def test_read_cached(self):
+        """Test that calibrations served from the shared cache are the same
+        as those read directly.
+        """
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_CALIB_CACHE_MB": "2000"}):
+            cache = lsst.obs.decam.calibCache.getCalibCache()
+            cache.clear()
+            for i in (1, 2, 62):
+                expected = lsst.afw.fits.readMetadata(self.flatFile, i)
+                self.check_readMetadata(i, expected, self.flatDescriptor)
+
+                formatter = lsst.obs.decam.DarkEnergyCameraCPCalibFormatter(
+                    self.flatDescriptor, ref=make_dataset_ref(i)
+                )
+                image = formatter.read(component="image")
+                self.assertImagesEqual(image, lsst.afw.image.ImageF(self.flatFile, i))
+                # Callers get their own copy.
+                image.array[:] = 0
+                self.assertImagesEqual(cache.readImage(self.flatFile, i),
+                                       lsst.afw.image.ImageF(self.flatFile, i))
+
+    def test_read_cached_threaded(self):
+        """Test that concurrent reads of one calibration read the file once.
+        """
+        cache = lsst.obs.decam.calibCache.CalibHduCache(2**31)
+        with unittest.mock.patch.object(cache, "_load", side_effect=cache._load) as load:
+            with concurrent.futures.ThreadPoolExecutor(4) as executor:
+                images = list(executor.map(lambda i: cache.readImage(self.flatFile, i), range(1, 9)))
+        self.assertEqual(load.call_count, 1)
+        for i, image in enumerate(images, start=1):
+            self.assertImagesEqual(image, lsst.afw.image.ImageF(self.flatFile, i))
+
+    def test_read_tooLarge(self):
+        """Test that files too large to cache are read directly, and only a
+        bounded number of them are remembered.
+        """
+        cache = lsst.obs.decam.calibCache.CalibHduCache(1)
+        with unittest.mock.patch.object(lsst.obs.decam.calibCache, "MAX_TOO_LARGE", 1):
+            for filename in (self.biasFile, self.flatFile):
+                with unittest.mock.patch.object(lsst.afw.image, "ImageF",
+                                                wraps=lsst.afw.image.ImageF) as imageF:
+                    image = cache.readImage(filename, 1)
+                # Reading for the cache stopped after the first HDU, which
+                # was then read again directly.
+                self.assertEqual(imageF.call_count, 2)
+                self.assertImagesEqual(image, lsst.afw.image.ImageF(filename, 1))
+        self.assertEqual(list(cache._tooLarge), [os.path.abspath(self.flatFile)])
+
 
 def setup_module(module):
     lsst.utils.tests.init()
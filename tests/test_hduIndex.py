@@ -0,0 +1,81 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the persistent detector to HDU index.
+"""
+
+import os
+import tempfile
+import unittest
+
+import lsst.utils.tests
+from lsst.obs.decam.hduIndex import HduIndexCache
+
+
+class HduIndexCacheTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "raw.fits")
+        with open(self.filename, "wb") as f:
+            f.write(b"\0" * 2880)
+        self.dbPath = os.path.join(self.tempdir.name, "index.sqlite3")
+        self.index = {25: 3, 1: 2, 62: 1}
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_memory(self):
+        cache = HduIndexCache()
+        self.assertIsNone(cache.get(self.filename))
+        cache.put(self.filename, self.index)
+        self.assertEqual(cache.get(self.filename), self.index)
+
+    def test_persistent(self):
+        HduIndexCache(self.dbPath).put(self.filename, self.index)
+        # A new cache (e.g. in another process) sees the stored index.
+        self.assertEqual(HduIndexCache(self.dbPath).get(self.filename), self.index)
+
+    def test_modified_file(self):
+        cache = HduIndexCache(self.dbPath)
+        cache.put(self.filename, self.index)
+        with open(self.filename, "ab") as f:
+            f.write(b"\0" * 2880)
+        self.assertIsNone(cache.get(self.filename))
+        self.assertIsNone(HduIndexCache(self.dbPath).get(self.filename))
+
+    def test_clear(self):
+        cache = HduIndexCache(self.dbPath)
+        cache.put(self.filename, self.index)
+        cache.clear()
+        self.assertIsNone(cache.get(self.filename))
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
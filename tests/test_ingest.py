@@ -29,6 +29,8 @@ import lsst.utils.tests
 from lsst.daf.butler import Butler, DataCoordinate
 from lsst.obs.base.ingest_tests import IngestTestBase
 import lsst.obs.decam
+import lsst.obs.decam.hduIndex
+import lsst.afw.fits
 import lsst.afw.cameraGeom.testUtils
 
 testDataPackage = "testdata_decam"
@@ -168,6 +170,23 @@ class DecamIngestShuffledFullFileTestCase(DecamTestBase, lsst.utils.tests.TestCa
         }
 
 
+@unittest.skipIf(testDataDirectory is None, "testdata_decam must be set up")
+class DecamSinglePassIngestShuffledFullFileTestCase(DecamIngestShuffledFullFileTestCase):
+    """Test ingesting a file with detectors in a random order with the
+    DECam-specific ingest task.
+    """
+
+    rawIngestTask = "lsst.obs.decam.DecamRawIngestTask"
+
+    def checkRepo(self, files=None):
+        # The detector to HDU mapping found by ingest was kept.
+        index = lsst.obs.decam.hduIndex.getHduIndexCache().get(self.file)
+        self.assertIsNotNone(index)
+        for dataId in self.dataIds:
+            self.assertEqual(lsst.afw.fits.readMetadata(self.file, index[dataId["detector"]])["CCDNUM"],
+                             dataId["detector"])
+
+
 def setup_module(module):
     lsst.utils.tests.init()
 
@@ -22,9 +22,13 @@
 """Tests of the DarkEnergyCamera instrument class.
 """
 
+import tempfile
 import unittest
+import unittest.mock
 
 import lsst.utils.tests
+from lsst.daf.butler import Butler
+from lsst.daf.butler.registry import ConflictingDefinitionError
 from lsst.obs.base.instrument_tests import InstrumentTests, InstrumentTestData
 import lsst.obs.decam
 
@@ -47,6 +51,64 @@ class TestDarkEnergyCamera(InstrumentTests, lsst.utils.tests.TestCase):
 
         self.instrument = lsst.obs.decam.DarkEnergyCamera()
 
+    def test_register_bulk(self):
+        """Test that registering detectors in bulk is idempotent, and
+        detects and updates changed records like syncDimensionData.
+        """
+        with tempfile.TemporaryDirectory() as root:
+            Butler.makeRepo(root)
+            butler = Butler(root, writeable=True)
+            self.check_register_bulk(butler.registry)
+            self.check_register_race(butler.registry)
+
+    def check_register_bulk(self, registry):
+        self.instrument.register(registry)
+        self.instrument.register(registry)
+        records = {record.id: record for record in
+                   registry.queryDimensionRecords("detector", instrument="DECam")}
+        self.assertEqual(len(records), self.data.nDetectors)
+        self.assertEqual(records[1].full_name, self.data.firstDetectorName)
+
+        changed = records[1].toDict()
+        changed["purpose"] = "WAVEFRONT"
+        registry.insertDimensionData("detector", changed, replace=True)
+        with self.assertRaises(ConflictingDefinitionError):
+            self.instrument.register(registry)
+        self.instrument.register(registry, update=True)
+        record, = registry.queryDimensionRecords("detector", instrument="DECam", detector=1)
+        self.assertEqual(record.purpose, "SCIENCE")
+
+    def check_register_race(self, registry):
+        """Test that detectors inserted by another process between the query
+        and the insert are skipped if they are the same, and detected if
+        they differ.
+        """
+        query = registry.queryDimensionRecords
+
+        def racedQuery(*args, **kwargs):
+            # The first query runs before the other process's insert.
+            racedQuery.calls += 1
+            return [] if racedQuery.calls == 1 else query(*args, **kwargs)
+
+        racedQuery.calls = 0
+        with unittest.mock.patch.object(registry, "queryDimensionRecords", racedQuery):
+            self.instrument.register(registry)
+        self.assertEqual(racedQuery.calls, 2)
+
+        record, = registry.queryDimensionRecords("detector", instrument="DECam", detector=1)
+        changed = record.toDict()
+        changed["purpose"] = "WAVEFRONT"
+        registry.insertDimensionData("detector", changed, replace=True)
+        racedQuery.calls = 0
+        with unittest.mock.patch.object(registry, "queryDimensionRecords", racedQuery):
+            with self.assertRaises(ConflictingDefinitionError):
+                self.instrument.register(registry)
+        racedQuery.calls = 0
+        with unittest.mock.patch.object(registry, "queryDimensionRecords", racedQuery):
+            self.instrument.register(registry, update=True)
+        record, = registry.queryDimensionRecords("detector", instrument="DECam", detector=1)
+        self.assertEqual(record.purpose, "SCIENCE")
+
 
 class MemoryTester(lsst.utils.tests.MemoryTestCase):
     pass
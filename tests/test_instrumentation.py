@@ -0,0 +1,96 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the read-path metrics registry.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.utils.tests
+from lsst.obs.decam.instrumentation import MetricsRegistry, getMetrics, instrumented, timed
+
+
+class MetricsRegistryTestCase(lsst.utils.tests.TestCase):
+    def test_registry(self):
+        metrics = MetricsRegistry(maxEvents=2)
+        for seconds in (0.5, 0.1, 0.3):
+            metrics.addTiming("read", seconds)
+        with self.assertRaises(RuntimeError):
+            with metrics.timer("fail"):
+                raise RuntimeError("timed anyway")
+        metrics.increment("bytes", 10)
+        metrics.increment("bytes", 5)
+        for detector in range(3):
+            metrics.event("scan", detector=detector)
+
+        results = metrics.toDict()
+        self.assertEqual(results["timings"]["read"]["count"], 3)
+        self.assertAlmostEqual(results["timings"]["read"]["total"], 0.9)
+        self.assertEqual(results["timings"]["read"]["min"], 0.1)
+        self.assertEqual(results["timings"]["read"]["max"], 0.5)
+        self.assertEqual(results["timings"]["fail"]["count"], 1)
+        self.assertEqual(results["counters"], {"bytes": 15, "events.scan": 3})
+        # Only the most recent events are kept.
+        self.assertEqual([event["detector"] for event in results["events"]], [1, 2])
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = os.path.join(tempdir, "metrics.json")
+            metrics.dump(filename)
+            with open(filename) as f:
+                self.assertEqual(json.load(f), results)
+
+        metrics.reset()
+        self.assertEqual(metrics.toDict(), {"timings": {}, "counters": {}, "events": []})
+
+    def test_disabled(self):
+        @instrumented("double")
+        def double(x):
+            return 2*x
+
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_METRICS": "0"}):
+            self.assertIsNone(getMetrics())
+            with timed("nothing"):
+                pass
+            self.assertEqual(double(2), 4)
+
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_METRICS": "1"}):
+            metrics = getMetrics()
+            metrics.reset()
+            self.assertEqual(double(2), 4)
+            self.assertEqual(metrics.toDict()["timings"]["double"]["count"], 1)
+            self.assertNotIn("nothing", metrics.toDict()["timings"])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
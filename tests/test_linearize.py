@@ -0,0 +1,105 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the lookup-table linearization of whole DECam CCDs.
+"""
+
+import unittest
+
+import numpy as np
+
+import lsst.afw.image
+import lsst.utils.tests
+from lsst.ip.isr import Linearizer
+from lsst.obs.decam import DarkEnergyCamera
+from lsst.obs.decam.linearize import LookupTableLinearizer, applyLookupTable
+
+
+class LookupTableLinearizerTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        rng = np.random.Generator(np.random.MT19937(3))
+        self.detector = DarkEnergyCamera().getCamera()[10]
+        self.linearizer = Linearizer(table=rng.normal(0.0, 10.0, size=(2, 1000)).astype(np.float32))
+        for i, amp in enumerate(self.detector):
+            self.linearizer.ampNames.append(amp.getName())
+            self.linearizer.linearityType[amp.getName()] = "LookupTable"
+            self.linearizer.linearityCoeffs[amp.getName()] = np.array([1 - i, 5*i])
+            self.linearizer.linearityBBox[amp.getName()] = amp.getBBox()
+        self.linearizer.hasLinearity = True
+        self.image = lsst.afw.image.ImageF(self.detector.getBBox())
+        self.image.array[:] = rng.uniform(-20.0, 1020.0, size=self.image.array.shape)
+        # Exact halves, which lround rounds away from zero.
+        self.image.array[::7, ::5] = np.floor(self.image.array[::7, ::5]) + 0.5
+
+    def test_matchesLinearizer(self):
+        expected = self.image.clone()
+        self.linearizer.applyLinearity(expected, detector=self.detector)
+        for nThreads in (1, 3):
+            with self.subTest(nThreads=nThreads):
+                image = self.image.clone()
+                LookupTableLinearizer(self.linearizer, self.detector).apply(image, nThreads=nThreads,
+                                                                            chunkRows=100)
+                np.testing.assert_array_equal(image.array, expected.array)
+
+    def test_applyRegion(self):
+        expected = self.image.clone()
+        self.linearizer.applyLinearity(expected, detector=self.detector)
+        linearizer = LookupTableLinearizer(self.linearizer, self.detector)
+        image = self.image.clone()
+        for start in range(0, image.getHeight(), 300):
+            for columns in reversed(linearizer.ampColumns):
+                linearizer.applyRegion(image.array, slice(start, start + 300), columns)
+        np.testing.assert_array_equal(image.array, expected.array)
+
+    def test_noLinearity(self):
+        self.linearizer.linearityType[self.detector[0].getName()] = "None"
+        linearizer = LookupTableLinearizer(self.linearizer, self.detector)
+        image = self.image.clone()
+        linearizer.apply(image)
+        columns = linearizer.ampColumns[0]
+        np.testing.assert_array_equal(image.array[:, columns], self.image.array[:, columns])
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            LookupTableLinearizer(self.linearizer, self.detector).apply(
+                lsst.afw.image.ImageI(self.detector.getBBox()))
+        self.linearizer.linearityType[self.detector[0].getName()] = "Polynomial"
+        with self.assertRaises(ValueError):
+            LookupTableLinearizer(self.linearizer, self.detector)
+
+    def test_applyLookupTable(self):
+        values = np.array([-2.5, -0.5, 0.4, 0.5, 1.5, 9.6, np.nan], dtype=np.float32)
+        table = np.arange(12, dtype=np.float32)*10
+        applyLookupTable(values, table, 2)
+        np.testing.assert_array_equal(values, [-2.5, 9.5, 20.4, 30.5, 41.5, 119.6, np.nan])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,83 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of memory-mapped image reads.
+"""
+
+import os
+import tempfile
+import unittest
+
+import astropy.io.fits
+import numpy as np
+
+import lsst.afw.image
+import lsst.utils.tests
+from lsst.obs.decam.mappedImage import mapImageArray, readMappedImage
+
+
+class MappedImageTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "flat.fits")
+        rng = np.random.default_rng(42)
+        hdus = [astropy.io.fits.PrimaryHDU()]
+        for ccdnum in range(1, 4):
+            hdu = astropy.io.fits.ImageHDU(rng.normal(1.0, 0.01, size=(50, 30)).astype(np.float32))
+            hdu.header["CCDNUM"] = ccdnum
+            hdus.append(hdu)
+        # Scaled and compressed HDUs cannot be mapped.
+        scaled = astropy.io.fits.ImageHDU(rng.integers(0, 100, size=(50, 30)).astype(np.int16))
+        scaled.header["BZERO"] = 32768
+        hdus.append(scaled)
+        hdus.append(astropy.io.fits.CompImageHDU(rng.normal(size=(50, 30)).astype(np.float32)))
+        astropy.io.fits.HDUList(hdus).writeto(self.filename)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_mapImageArray(self):
+        with astropy.io.fits.open(self.filename) as hduList:
+            for hdu in range(1, 4):
+                array, header = mapImageArray(self.filename, hdu)
+                self.assertEqual(header["CCDNUM"], hdu)
+                self.assertFalse(array.flags.writeable)
+                np.testing.assert_array_equal(array, hduList[hdu].data)
+        self.assertIsNone(mapImageArray(self.filename, 4)[0])
+        self.assertIsNone(mapImageArray(self.filename, 5)[0])
+
+    def test_readMappedImage(self):
+        for hdu in range(1, 6):
+            image = readMappedImage(self.filename, hdu)
+            self.assertImagesEqual(image, lsst.afw.image.ImageF(self.filename, hdu))
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
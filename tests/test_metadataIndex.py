@@ -0,0 +1,112 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the Parquet index of raw metadata.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.utils.tests
+from lsst.obs.decam.metadataIndex import MetadataIndex
+
+testDataPackage = "testdata_decam"
+try:
+    testDataDirectory = lsst.utils.getPackageDir(testDataPackage)
+except LookupError:
+    testDataDirectory = None
+
+
+@unittest.skipIf(testDataDirectory is None, "testdata_decam must be set up")
+class MetadataIndexTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempDir, ignore_errors=True)
+        raw = os.path.join(testDataDirectory, "rawData", "raw", "c4d_150227_012718_ori-stripped.fits.fz")
+        # Two copies of the same raw.
+        self.files = [os.path.join(self.tempDir, f"raw{i}.fits.fz") for i in range(2)]
+        for filename in self.files:
+            shutil.copy(raw, filename)
+        self.indexDir = os.path.join(self.tempDir, "index")
+
+    def test_update(self):
+        index = MetadataIndex(self.indexDir)
+        self.assertEqual(index.update(self.files), 2)
+        self.assertEqual(len(index.exposures), 2)
+        self.assertEqual(len(index.detectors), 124)
+        self.assertEqual(index.update(self.files), 0)
+
+        # A new instance reads the index back, and only reads files that
+        # have changed or been added since.
+        index = MetadataIndex(self.indexDir)
+        self.assertEqual(index.update(self.files), 0)
+        stat = os.stat(self.files[1])
+        os.utime(self.files[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(index.update(self.files), 1)
+        self.assertEqual(len(index.exposures), 2)
+        self.assertEqual(len(index.detectors), 124)
+
+        os.remove(self.files[0])
+        self.assertEqual(index.update([], prune=True), 0)
+        self.assertEqual(index.exposures["filename"].to_pylist(), [self.files[1]])
+        self.assertEqual(len(MetadataIndex(self.indexDir).detectors), 62)
+
+    def test_query(self):
+        index = MetadataIndex(self.indexDir)
+        index.update(self.files)
+        row = index.exposures.to_pylist()[0]
+        self.assertEqual(index.query(band=row["band"]), sorted(self.files))
+        self.assertEqual(index.query(band="opaque"), [])
+        filters = [row["physical_filter"], "N964 DECam c0008 9645.0 94.0"]
+        self.assertEqual(len(index.query(physical_filter=filters, exposure_time=(row["exposure_time"], None),
+                                         science_program=row["science_program"])), 2)
+        self.assertEqual(index.query(airmass=(None, row["airmass"] - 0.01)), [])
+        detector = index.detectors["detector_num"][0].as_py()
+        self.assertEqual(len(index.query(detector=[detector, 1000])), 2)
+        self.assertEqual(index.query(detector=1000), [])
+        with self.assertRaises(TypeError):
+            index.query(filename=self.files[0])
+
+
+class MetadataIndexImportTestCase(lsst.utils.tests.TestCase):
+    def test_noPyarrow(self):
+        """Test that a missing pyarrow is reported when an index is made.
+        """
+        with unittest.mock.patch.dict(sys.modules, {"pyarrow": None}):
+            with self.assertRaisesRegex(ImportError, "MetadataIndex needs pyarrow"):
+                MetadataIndex("index")
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
@@ -0,0 +1,166 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the FITS HDU seek table.
+"""
+
+import os
+import tempfile
+import unittest
+
+import astropy.io.fits
+import numpy as np
+
+import lsst.afw.fits
+import lsst.afw.image
+import lsst.utils.tests
+from lsst.obs.decam.fitsHeader import UnsupportedHeaderError
+from lsst.obs.decam.seekTable import FitsSeekTable, getSeekTable
+
+
+def assertHeadersEqual(testCase, metadata, expected, msg=None):
+    """Check that two headers have the same cards in the same order, with
+    the same types and comments.
+    """
+    testCase.assertEqual(metadata.getOrderedNames(), expected.getOrderedNames(), msg=msg)
+    testCase.assertEqual(metadata.toDict(), expected.toDict(), msg=msg)
+    for name in expected.getOrderedNames():
+        testCase.assertEqual(metadata.typeOf(name), expected.typeOf(name), msg=f"{msg}: {name}")
+        testCase.assertEqual(metadata.getComment(name), expected.getComment(name), msg=f"{msg}: {name}")
+
+
+class FitsSeekTableTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tempdir.name, "mef.fits")
+        rng = np.random.default_rng(42)
+        hdus = [astropy.io.fits.PrimaryHDU()]
+        hdus[0].header["OBSID"] = "ct4m20150227t012718"
+        self.ccdnums = [3, 1, 2, 5, 4]
+        for i, ccdnum in enumerate(self.ccdnums):
+            data = rng.integers(0, 2**15, size=(60, 40 + i), dtype=np.int32)
+            # Mix compressed and uncompressed HDUs.
+            hdu = astropy.io.fits.CompImageHDU(data) if i % 2 else astropy.io.fits.ImageHDU(data)
+            hdu.header["CCDNUM"] = ccdnum
+            hdus.append(hdu)
+        astropy.io.fits.HDUList(hdus).writeto(self.filename)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_offsets(self):
+        table = FitsSeekTable.fromFile(self.filename)
+        self.assertEqual(len(table), len(self.ccdnums) + 1)
+        with astropy.io.fits.open(self.filename, disable_image_compression=True) as hduList:
+            for hdu in range(len(hduList)):
+                info = hduList.fileinfo(hdu)
+                self.assertEqual(table[hdu].headerOffset, info["hdrLoc"])
+                self.assertEqual(table[hdu].dataOffset, info["datLoc"])
+                self.assertEqual(table[hdu].dataSize, -(-info["datSpan"]//2880)*2880)
+
+    def test_detectorIndex(self):
+        table = getSeekTable(self.filename)
+        self.assertIs(getSeekTable(self.filename), table)
+        self.assertEqual(table.detectorIndex(),
+                         {ccdnum: hdu for hdu, ccdnum in enumerate(self.ccdnums, start=1)})
+
+    def test_read(self):
+        table = getSeekTable(self.filename)
+        for hdu in range(1, len(table)):
+            # The in-memory file of a metadata read has no data for the HDU.
+            assertHeadersEqual(self, table.readMetadata(hdu), lsst.afw.fits.readMetadata(self.filename, hdu),
+                               msg=f"HDU {hdu}")
+            self.assertImagesEqual(table.readImage(hdu), lsst.afw.image.ImageI(self.filename, hdu))
+
+    def test_parseMetadata(self):
+        """Test that headers parsed from their bytes are the same as those
+        read by afw.
+        """
+        hdus = [astropy.io.fits.PrimaryHDU()]
+        hdus[0].header["OBSID"] = ("ct4m20150227t012718", "Observation id")
+        hdus[0].header["EXPTIME"] = (30.0, "[s] Exposure time")
+        hdus[0].header["BIGINT"] = 2**40
+        hdus[0].header["HISTORY"] = "primary history"
+        for inherit in (True, False, None):
+            hdu = astropy.io.fits.ImageHDU(np.zeros((4, 5), dtype=np.int32))
+            header = hdu.header
+            if inherit is not None:
+                header["INHERIT"] = inherit
+            header["CCDNUM"] = (1, "CCD number")
+            header["EXPTIME"] = (15.5, "Overrides the primary value")
+            header["DETSIZE"] = ("[1:29400,1:29050]  ", "Detector size")
+            header["EMPTY"] = ""
+            header["UNDEF"] = (None, "Undefined value")
+            header["LOCKED"] = False
+            header["SMALL"] = -1.5e-300
+            header["COMMENT"] = "A comment"
+            header["COMMENT"] = "Another comment"
+            header.append(("", "Blank keyword"), bottom=True)
+            header["HISTORY"] = "extension history"
+            hdus.append(hdu)
+        filename = os.path.join(self.tempdir.name, "headers.fits")
+        astropy.io.fits.HDUList(hdus).writeto(filename)
+
+        table = FitsSeekTable.fromFile(filename)
+        for hdu in range(1, len(table)):
+            assertHeadersEqual(self, table.parseMetadata(hdu), lsst.afw.fits.readMetadata(filename, hdu),
+                               msg=f"HDU {hdu}")
+        for hdu in range(1, len(self.ccdnums) + 1):
+            if hdu % 2 == 0:
+                # Tile-compressed HDUs are left to afw.
+                with self.assertRaises(UnsupportedHeaderError):
+                    getSeekTable(self.filename).parseMetadata(hdu)
+                continue
+            assertHeadersEqual(self, getSeekTable(self.filename).parseMetadata(hdu),
+                               lsst.afw.fits.readMetadata(self.filename, hdu), msg=f"HDU {hdu}")
+
+    def test_parseMetadata_unsupported(self):
+        """Test that headers that would not be parsed as afw does raise."""
+        for key, value in (("HIERARCH LONG KEYWORD NAME", 1),
+                           ("LONGSTR", "x"*100),
+                           ("QUOTED", "it's"),
+                           ("NOTNUM", "NaN")):
+            hdu = astropy.io.fits.ImageHDU(np.zeros((4, 5), dtype=np.int32))
+            hdu.header[key] = value
+            filename = os.path.join(self.tempdir.name, "unsupported.fits")
+            astropy.io.fits.HDUList([astropy.io.fits.PrimaryHDU(), hdu]).writeto(filename, overwrite=True)
+            with self.assertRaises(UnsupportedHeaderError, msg=key):
+                FitsSeekTable.fromFile(filename).parseMetadata(1)
+
+    def test_notFits(self):
+        filename = os.path.join(self.tempdir.name, "notFits.fits")
+        with open(filename, "wb") as f:
+            f.write(b" "*2880)
+        with self.assertRaises(ValueError):
+            FitsSeekTable.fromFile(filename)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
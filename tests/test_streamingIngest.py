@@ -0,0 +1,181 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of streaming ingest into a local SQLite registry.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import lsst.utils.tests
+from lsst.daf.butler import Butler
+import lsst.obs.decam
+import lsst.obs.decam.instrumentation
+from lsst.obs.decam.streamingIngest import StreamingIngester
+
+testDataPackage = "testdata_decam"
+try:
+    testDataDirectory = lsst.utils.getPackageDir(testDataPackage)
+except LookupError:
+    testDataDirectory = None
+
+
+@unittest.skipIf(testDataDirectory is None, "testdata_decam must be set up")
+class StreamingIngestTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tempdir.name, "repo")
+        self.drop = os.path.join(self.tempdir.name, "drop")
+        os.makedirs(self.drop)
+        Butler.makeRepo(self.root)
+        self.butler = Butler(self.root, writeable=True)
+        lsst.obs.decam.DarkEnergyCamera().register(self.butler.registry)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_serve(self):
+        source = os.path.join(testDataDirectory, "rawData", "raw", "raw.fits")
+
+        async def deliver():
+            await asyncio.sleep(0.1)
+            # Deliver the file under a hidden name, then rename it, as a
+            # transfer service would; other files are ignored.
+            hidden = os.path.join(self.drop, ".raw.fits")
+            shutil.copy(source, hidden)
+            os.rename(hidden, os.path.join(self.drop, "raw.fits"))
+            with open(os.path.join(self.drop, "notes.txt"), "w") as f:
+                f.write("Not a raw.")
+
+        async def run(ingester):
+            await asyncio.gather(ingester.serve(maxFiles=1), deliver())
+
+        with unittest.mock.patch.dict(os.environ, {"OBS_DECAM_METRICS": "1"}):
+            metrics = lsst.obs.decam.instrumentation.getMetrics()
+            metrics.reset()
+            ingester = StreamingIngester(self.butler, self.drop, transfer="copy", pollInterval=0.05,
+                                         settleTime=0.1, queueSize=1)
+            asyncio.run(asyncio.wait_for(run(ingester), 120))
+            timings = metrics.toDict()["timings"]
+
+        self.assertEqual([path for path, _ in ingester.latencies], [os.path.join(self.drop, "raw.fits")])
+        self.assertFalse(ingester.failed)
+        self.assertEqual(timings["streamingIngest.latency"]["count"], 1)
+        refs = set(self.butler.registry.queryDatasets("raw", collections=...))
+        self.assertEqual({ref.dataId["detector"] for ref in refs}, {1, 25})
+
+
+class StreamingPollTestCase(lsst.utils.tests.TestCase):
+    """Tests of how the drop directory is tracked, without ingesting."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        with unittest.mock.patch("lsst.obs.decam.streamingIngest.DecamRawIngestTask"):
+            self.ingester = StreamingIngester(None, self.tempdir.name, pollInterval=0.01, settleTime=0.0,
+                                              maxLatencies=2)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.tempdir.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def land(self, ingest=True):
+        """Return the paths of the files that land in two polls, and mark
+        them as ingested if ``ingest``.
+        """
+        paths = [path for path, _ in self.ingester._poll() + self.ingester._poll()]
+        if ingest:
+            for path in paths:
+                self.ingester._markDone(path)
+        return paths
+
+    def test_retry(self):
+        path = self.write("a.fits", "first")
+        self.assertEqual(self.land(), [path])
+        self.assertEqual(self.land(), [])
+
+        # Failed files are only retried once they change.
+        self.ingester.failed.add(path)
+        self.assertEqual(self.land(), [])
+        self.write("a.fits", "second version")
+        self.assertEqual(self.land(), [path])
+        self.assertNotIn(path, self.ingester.failed)
+
+        # Files that were ingested are not ingested again.
+        self.write("a.fits", "third version")
+        self.assertEqual(self.land(), [])
+
+    def test_notIngested(self):
+        """Test that files that landed but were not ingested before the
+        ingester stopped land again in its next run.
+        """
+        paths = [self.write(f"{i}.fits", "data") for i in range(3)]
+        self.ingester.queueSize = 1
+
+        async def serve():
+            await asyncio.wait_for(self.ingester.serve(maxFiles=1), 10)
+
+        for run in range(3):
+            # Each run is in a new event loop.
+            asyncio.run(serve())
+            self.assertEqual(self.ingester.task.run.call_count, run + 1)
+            self.assertEqual(len(self.ingester._done), run + 1)
+            self.assertEqual(self.ingester._landed, {})
+        ingested = [call.args[0][0] for call in self.ingester.task.run.call_args_list]
+        self.assertEqual(sorted(ingested), paths)
+        for call in self.ingester.task.run.call_args_list:
+            self.assertTrue(call.kwargs["skip_existing_exposures"])
+
+    def test_bounded(self):
+        paths = [self.write(f"{i}.fits", "data") for i in range(3)]
+        self.assertEqual(sorted(self.land()), paths)
+        self.ingester.failed.add(paths[0])
+        for path in paths:
+            os.remove(path)
+        self.ingester._poll()
+        self.assertEqual(self.ingester._done, {})
+        self.assertEqual(self.ingester._seen, {})
+        self.assertEqual(self.ingester.failed, set())
+
+        for path in paths:
+            self.ingester.latencies.append((path, 1.0))
+        self.assertEqual([path for path, _ in self.ingester.latencies], paths[1:])
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()
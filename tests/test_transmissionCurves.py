@@ -0,0 +1,101 @@
+# This file is part of obs_decam.
+#
+# Developed for the LSST Data Management System.
+# This product includes software developed by the LSST Project
+# (http://www.lsst.org).
+# See the COPYRIGHT file at the top-level directory of this distribution
+# for details of code ownership.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests of the lazily made DES transmission curves.
+"""
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import astropy.io.fits
+import numpy as np
+
+import lsst.geom
+import lsst.utils.tests
+from lsst.obs.decam import makeTransmissionCurves
+from lsst.obs.decam.makeTransmissionCurves import DES_SYSTEM_BANDS, getDESSystemTransmission
+
+
+class DESSystemTransmissionTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tempdir.name, "des"))
+        self.wavelengths = np.linspace(4000.0, 5000.0, 11)
+        for band in DES_SYSTEM_BANDS:
+            self.writeTable(band, 0.5)
+        patcher = unittest.mock.patch.object(makeTransmissionCurves, "DATA_DIR", self.tempdir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def writeTable(self, band, scale, mtime=None):
+        throughputs = scale*np.outer(np.linspace(0.1, 1.0, len(self.wavelengths)), np.arange(1, 63))/62
+        columns = [astropy.io.fits.Column(name="lambda", format="E", array=self.wavelengths),
+                   astropy.io.fits.Column(name="throughput_ccd", format="62E", array=throughputs)]
+        filename = os.path.join(self.tempdir.name, "des", f"{band}_band_per_detector_throughput.fits")
+        astropy.io.fits.BinTableHDU.from_columns(columns).writeto(filename, overwrite=True)
+        if mtime is not None:
+            os.utime(filename, ns=(mtime, mtime))
+        return throughputs
+
+    def test_lazy(self):
+        with unittest.mock.patch("astropy.io.fits.getdata", wraps=astropy.io.fits.getdata) as getdata:
+            curves = getDESSystemTransmission()["2012-09-12"]
+            self.assertEqual(len(curves), len(DES_SYSTEM_BANDS))
+            getdata.assert_not_called()
+            detectors = curves["g DECam SDSS c0001 4720.0 1520.0"]
+            curve = detectors[10]
+            self.assertEqual(getdata.call_count, 1)
+            self.assertIs(detectors[10], curve)
+            self.assertEqual(len(detectors), 62)
+            self.assertEqual(list(detectors), list(range(1, 63)))
+            self.assertNotIn(63, detectors)
+            self.assertEqual(getdata.call_count, 1)
+        expected = 0.5*np.linspace(0.1, 1.0, len(self.wavelengths))*10/62
+        np.testing.assert_allclose(curve.sampleAt(lsst.geom.Point2D(0.0, 0.0), self.wavelengths), expected,
+                                   rtol=1e-6)
+
+    def test_invalidation(self):
+        first = getDESSystemTransmission()["2012-09-12"]
+        self.assertIs(getDESSystemTransmission()["2012-09-12"], first)
+        throughputs = self.writeTable("r", 0.25, mtime=10**18)
+        second = getDESSystemTransmission()["2012-09-12"]
+        self.assertIsNot(second, first)
+        curve = second["r DECam SDSS c0002 6415.0 1480.0"][1]
+        np.testing.assert_allclose(curve.sampleAt(lsst.geom.Point2D(0.0, 0.0), self.wavelengths),
+                                   throughputs[:, 0], rtol=1e-6)
+
+
+class MemoryTester(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    lsst.utils.tests.init()
+    unittest.main()